@@ -0,0 +1,126 @@
+"""
+Vector backends as the corpus grows: recall@k against exact search, queries/sec and resident memory.
+
+    python benchmarks/bench_ann.py --sizes 10000 50000 100000 --backends flat hnsw ivf ivfpq chroma
+
+Vectors are synthetic (unit-norm points around random cluster centres, like embeddings of
+papers on a handful of topics). "hnsw", "ivf" and "ivfpq" need faiss-cpu; "chroma" uses the
+installed chromadb. Search parameters can be swept with --ef-search / --nprobe.
+"""
+import argparse
+import gc
+import os
+import shutil
+import sys
+import tempfile
+import time
+import numpy as np
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config.config import Config
+from src.embedding.backends import ChromaBackend, LocalBackend, faiss_available
+
+
+def rss_mb() -> float:
+    """Current resident set size (peak RSS if psutil isn't installed)."""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / 2**20
+    except ImportError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def synthetic_vectors(n: int, dim: int, clusters: int = 64, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((clusters, dim)).astype(np.float32)
+    x = centres[rng.integers(0, clusters, n)] + 0.6 * rng.standard_normal((n, dim)).astype(np.float32)
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+def exact_neighbours(corpus: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    ids = []
+    for start in range(0, len(queries), 256):
+        dist = -2 * queries[start:start + 256] @ corpus.T + (corpus ** 2).sum(axis=1)[None, :]
+        top = np.argpartition(dist, k - 1, axis=1)[:, :k]
+        ids.append(np.take_along_axis(top, np.argsort(np.take_along_axis(dist, top, axis=1), axis=1), axis=1))
+    return np.concatenate(ids)
+
+
+def make(name: str, path: str, args):
+    if name == "chroma":
+        return ChromaBackend("bench", path=path, m=args.m, ef_construction=args.ef_construction,
+                             ef_search=args.ef_search)
+    index_type = "ivf" if name == "ivfpq" else name
+    if index_type != "flat" and not faiss_available():
+        raise ImportError("faiss-cpu is not installed") # LocalBackend would quietly measure flat instead
+    return LocalBackend("bench", path=path, index_type=index_type, m=args.m, ef_construction=args.ef_construction,
+                        ef_search=args.ef_search, nlist=args.nlist, nprobe=args.nprobe,
+                        pq_m=args.pq_m if name == "ivfpq" else 0, min_ann_rows=0)
+
+
+def run(name: str, corpus: np.ndarray, queries: np.ndarray, truth: np.ndarray, args) -> dict:
+    path = tempfile.mkdtemp(prefix="bench_ann_")
+    gc.collect()
+    base_rss = rss_mb()
+    try:
+        backend = make(name, path, args)
+        start = time.perf_counter()
+        for offset in range(0, len(corpus), 5000):  # below Chroma's max batch size
+            batch = corpus[offset:offset + 5000]
+            ids = [str(offset + i) for i in range(len(batch))]
+            backend.upsert(ids, batch, [""] * len(batch), [{"n": offset + i} for i in range(len(batch))])
+        backend.query(queries[:1], args.k)  # local backends build their ANN index on the first query
+        build = time.perf_counter() - start
+
+        start = time.perf_counter()
+        found = []
+        for offset in range(0, len(queries), args.query_batch):
+            results = backend.query(queries[offset:offset + args.query_batch], args.k)
+            found += [[int(i) for i in ids] for ids in results["ids"]]
+        elapsed = time.perf_counter() - start
+        recall = np.mean([len(set(f) & set(t.tolist())) / args.k for f, t in zip(found, truth)])
+        rss = rss_mb() - base_rss
+        del backend
+        return {"build": build, "qps": len(queries) / elapsed, "recall": recall, "rss": rss}
+    finally:
+        gc.collect()
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall, QPS and memory of the vector backends")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 50000])
+    parser.add_argument("--backends", nargs="+", default=["flat", "hnsw", "ivf", "ivfpq", "chroma"],
+                        choices=["flat", "hnsw", "ivf", "ivfpq", "chroma"])
+    parser.add_argument("--dim", type=int, default=384, help="all-MiniLM-L6-v2 embeds into 384 dimensions")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--query-batch", type=int, default=1, help="Queries per search call (1 = interactive use)")
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--m", type=int, default=Config.HNSW_M)
+    parser.add_argument("--ef-construction", type=int, default=Config.HNSW_EF_CONSTRUCTION)
+    parser.add_argument("--ef-search", type=int, default=Config.HNSW_EF_SEARCH)
+    parser.add_argument("--nlist", type=int, default=Config.IVF_NLIST)
+    parser.add_argument("--nprobe", type=int, default=Config.IVF_NPROBE)
+    parser.add_argument("--pq-m", type=int, default=Config.PQ_M or 48, help="Bytes per vector for ivfpq")
+    args = parser.parse_args()
+
+    print(f"dim={args.dim} queries={args.queries} k={args.k} M={args.m} efC={args.ef_construction} "
+          f"ef={args.ef_search} nlist={args.nlist} nprobe={args.nprobe} pq_m={args.pq_m}")
+    print(f"{'size':>8} {'backend':>8} {'build s':>8} {'recall@k':>9} {'qps':>9} {'rss MB':>8}")
+    for size in args.sizes:
+        data = synthetic_vectors(size + args.queries, args.dim)
+        corpus, queries = data[:size], data[size:]
+        truth = exact_neighbours(corpus, queries, args.k)
+        for name in args.backends:
+            try:
+                r = run(name, corpus, queries, truth, args)
+            except ImportError as e:
+                print(f"{size:>8} {name:>8} skipped ({e})")
+                continue
+            print(f"{size:>8} {name:>8} {r['build']:>8.2f} {r['recall']:>9.3f} {r['qps']:>9.0f} {r['rss']:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
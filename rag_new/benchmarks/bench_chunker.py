@@ -0,0 +1,76 @@
+"""
+Recursive (langchain, characters) vs. token (embedding-model tokens, section-aware) chunker:
+chunking throughput, and how much of each chunk's text the embedding model actually sees
+(text past max_seq_length tokens is truncated away when embedding).
+
+    python benchmarks/bench_chunker.py --papers data/papers --repeat 3
+
+PDF text extraction is timed separately, since the two chunkers read pages differently.
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config.config import Config
+from src.models.registry import tokenizer
+from src.processing.processor import CHUNKERS, make_chunker
+
+
+def embedded_fraction(chunks, tok, max_length: int):
+    """(fraction of chunk characters within the first max_length tokens, fraction of chunks truncated, mean tokens)."""
+    total = kept = truncated = tokens = 0
+    for chunk in chunks:
+        text = chunk["text"]
+        encoding = tok(text, truncation=True, max_length=max_length, return_offsets_mapping=True, verbose=False)
+        ends = [end for start, end in encoding["offset_mapping"] if end > start]
+        full = len(tok(text, add_special_tokens=True, verbose=False)["input_ids"])
+        total += len(text)
+        kept += len(text) if full <= max_length else (ends[-1] if ends else 0)
+        truncated += full > max_length
+        tokens += full
+    n = max(1, len(chunks))
+    return kept / max(1, total), truncated / n, tokens / n
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chunker throughput and embedded-text coverage")
+    parser.add_argument("--papers", default=Config.PAPERS_DIR, help="Folder of PDFs")
+    parser.add_argument("--limit", type=int, default=0, help="Use at most this many PDFs (0 = all)")
+    parser.add_argument("--chunkers", nargs="+", default=list(CHUNKERS), choices=list(CHUNKERS))
+    parser.add_argument("--repeat", type=int, default=3, help="Timed chunking passes (best is reported)")
+    parser.add_argument("--max-length", type=int, default=Config.CHUNK_TOKENS, help="Embedding model's max_seq_length")
+    args = parser.parse_args()
+
+    files = sorted(glob.glob(os.path.join(args.papers, "*.pdf")))[:args.limit or None]
+    if not files:
+        sys.exit(f"No PDFs in {args.papers}")
+    tok = tokenizer()
+    print(f"{len(files)} PDFs, tokenizer={Config.EMBEDDING_MODEL_NAME}, max_length={args.max_length}")
+    print(f"{'chunker':>10} {'extract s':>9} {'chunk s':>8} {'MB/s':>6} {'chunks':>7} {'tokens':>7} "
+          f"{'truncated':>9} {'embedded':>9}")
+
+    for name in args.chunkers:
+        chunker = make_chunker(name)
+        start = time.perf_counter()
+        documents = [(fp, list(chunker.pages(fp))) for fp in files]
+        extract = time.perf_counter() - start
+        chars = sum(len(page[1]) for _, pages in documents for page in pages)
+
+        best = float("inf")
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            chunks = [chunk for fp, pages in documents
+                      for chunk in chunker.iter_chunks(pages, {"filepath": fp, "title": os.path.basename(fp)})]
+            best = min(best, time.perf_counter() - start)
+
+        fraction, truncated, mean_tokens = embedded_fraction(chunks, tok, args.max_length)
+        print(f"{name:>10} {extract:>9.2f} {best:>8.2f} {chars / best / 2**20:>6.2f} {len(chunks):>7} "
+              f"{mean_tokens:>7.0f} {truncated:>9.1%} {fraction:>9.1%}")
+
+
+if __name__ == "__main__":
+    main()
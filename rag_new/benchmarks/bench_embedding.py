@@ -0,0 +1,62 @@
+"""
+Embedding throughput vs. batch size on CPU.
+
+    python benchmarks/bench_embedding.py --texts 2000 --batch-sizes 8 16 32 64 128 --threads 4
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config.config import Config
+from src.embedding.vector_store import EmbeddingPipeline
+
+WORDS = ("retrieval augmented generation transformer attention embedding corpus query document "
+         "latency throughput benchmark language model evaluation dataset training inference "
+         "neural network gradient optimization token sequence encoder decoder vector index").split()
+
+
+def synthetic_texts(n: int, chars: int, seed: int = 0):
+    """Chunk-sized pseudo-sentences, deterministic for a given seed."""
+    rng = random.Random(seed)
+    texts = []
+    for _ in range(n):
+        words = []
+        length = 0
+        while length < chars:
+            word = rng.choice(WORDS)
+            words.append(word)
+            length += len(word) + 1
+        texts.append(" ".join(words))
+    return texts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embedding throughput vs. batch size")
+    parser.add_argument("--texts", type=int, default=1000, help="Texts embedded per batch size")
+    parser.add_argument("--chars", type=int, default=Config.CHUNK_SIZE, help="Characters per text")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 16, 32, 64, 128])
+    parser.add_argument("--threads", type=int, default=Config.EMBEDDING_THREADS, help="torch intra-op threads (0 = default)")
+    parser.add_argument("--device", default="cpu")
+    args = parser.parse_args()
+
+    texts = synthetic_texts(args.texts, args.chars)
+    pipeline = EmbeddingPipeline(device=args.device, num_threads=args.threads)
+    pipeline.embed(texts[:8])  # load the model and warm up kernels outside the timed runs
+
+    print(f"model={pipeline.model_name} device={args.device} threads={args.threads or 'default'} "
+          f"texts={args.texts} chars={args.chars}")
+    print(f"{'batch':>6} {'seconds':>9} {'emb/sec':>9}")
+    for batch_size in args.batch_sizes:
+        pipeline.batch_size = batch_size
+        start = time.perf_counter()
+        pipeline.embed(texts)
+        elapsed = time.perf_counter() - start
+        print(f"{batch_size:>6} {elapsed:>9.2f} {len(texts) / elapsed:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,360 @@
+"""
+End-to-end benchmark of indexing and retrieval, reproducible offline: a seeded synthetic corpus
+(or a folder of fixture PDFs), stub embedding / cross-encoder models and a stub Ollama server
+(see stubs.py), all in a throwaway data folder, so results only change when the code does.
+
+Measures indexing throughput (and a no-op re-index), query latency percentiles per strategy,
+rerank cost, and hit rate / MRR against known-relevant chunks. Results are written as JSON:
+
+    python benchmarks/bench_pipeline.py --papers 20 --queries 50
+    python benchmarks/bench_pipeline.py --compare output/benchmarks/pipeline_<old>.json   # run, then diff
+    python benchmarks/bench_pipeline.py --compare old.json new.json                       # diff only
+
+--compare exits non-zero when a metric regresses beyond --tolerance, like bench_startup's budgets.
+Queries are 6 shuffled words from a 16-word window of a stored chunk; the relevant chunks are the
+ones containing the window. With the stub LLM, HyDE restates the query and 'complex' splits it in two.
+"""
+import argparse
+import contextlib
+import glob
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+# Add project root to sys.path
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(PROJECT_ROOT)
+from config.config import Config
+from stubs import StubOllama, install_stub_models, words
+
+# The stub server is on localhost; keep a configured HTTP proxy out of the way.
+os.environ.setdefault("NO_PROXY", "127.0.0.1,localhost")
+
+STRATEGIES = ["naive", "hyde", "complex", "hybrid"]
+SECTIONS = ["Introduction", "Related Work", "Method", "Experiments", "Results", "Discussion", "Conclusion"]
+SYLLABLES = ["ka", "lo", "mi", "ren", "tu", "sa", "vor", "el", "qu", "dan", "pi", "zo", "ne", "tra", "gu", "bel"]
+QUERY_WORDS = 6
+WINDOW_WORDS = 16
+# (metric path, "higher" or "lower" is better) compared by --compare; per-strategy ones get the strategy prefix.
+INDEX_METRICS = [("indexing.docs_per_s", "higher"), ("indexing.chunks_per_s", "higher"), ("indexing.noop_s", "lower")]
+STRATEGY_METRICS = [("latency_ms.p50", "lower"), ("latency_ms.p95", "lower"), ("latency_ms.p99", "lower"),
+                    ("rerank.ms_per_call", "lower"), ("hit_rate", "higher"), ("mrr", "higher")]
+ORIGINAL_OUTPUT_DIR = Config.OUTPUT_DIR
+
+
+def isolate(workdir: str):
+    """Points every data/output path of Config into workdir. Must run before any src module is imported."""
+    data_dir, output_dir = Config.DATA_DIR, Config.OUTPUT_DIR
+    for name in dir(Config):
+        value = getattr(Config, name)
+        if name.isupper() and isinstance(value, str):
+            for old, new in ((data_dir, os.path.join(workdir, "data")), (output_dir, os.path.join(workdir, "output"))):
+                if value == old or value.startswith(old + os.sep):
+                    setattr(Config, name, new + value[len(old):])
+                    break
+
+
+def percentile(values, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+def pseudo_word(rng: random.Random) -> str:
+    return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+
+
+def make_corpus(papers: int, pages: int, seed: int):
+    """Writes seeded synthetic PDFs (one topic vocabulary each, over a shared one) and their catalog records."""
+    import fitz
+    from src.ingestion.catalog import PaperCatalog, paper_filename
+
+    rng = random.Random(seed)
+    common = [pseudo_word(rng) for _ in range(400)]
+    catalog = PaperCatalog(Config.CATALOG_PATH)
+    os.makedirs(Config.PAPERS_DIR, exist_ok=True)
+    for n in range(papers):
+        paper_id = f"2401.{n + 1:05d}"
+        topic = [pseudo_word(rng) for _ in range(60)]
+
+        def sentence() -> str:
+            return " ".join(rng.choice(topic if rng.random() < 0.5 else common) for _ in range(rng.randint(10, 22))) + "."
+
+        doc = fitz.open()
+        for p in range(pages):
+            page = doc.new_page()
+            page.insert_text((72, 72), f"{p + 1} {SECTIONS[p % len(SECTIONS)]}", fontsize=14)
+            body = "\n\n".join(" ".join(sentence() for _ in range(rng.randint(3, 6))) for _ in range(4))
+            page.insert_textbox(fitz.Rect(72, 96, 540, 770), body, fontsize=10)
+        doc.save(os.path.join(Config.PAPERS_DIR, paper_filename(paper_id)))
+        doc.close()
+
+        title = " ".join(topic[:4]).title()
+        catalog.add({
+            "paper_id": paper_id, "title": title, "authors": [pseudo_word(rng).title() for _ in range(rng.randint(1, 4))],
+            "published": f"{2015 + n % 10}-01-01", "year": 2015 + n % 10, "summary": title,
+            "url": f"https://arxiv.org/pdf/{paper_id}", "filename": paper_filename(paper_id),
+        }, topic="benchmark")
+    catalog.save()
+
+
+def copy_corpus(corpus_dir: str):
+    files = sorted(glob.glob(os.path.join(corpus_dir, "*.pdf")))
+    if not files:
+        sys.exit(f"No PDFs in {corpus_dir}")
+    os.makedirs(Config.PAPERS_DIR, exist_ok=True)
+    for filepath in files:
+        shutil.copy(filepath, Config.PAPERS_DIR)
+
+
+def make_queries(ve, n: int, seed: int):
+    """
+    (query, relevant chunk IDs): QUERY_WORDS words drawn in random order from a window of a random
+    stored chunk, so no query is a verbatim phrase; relevant are the chunks containing that window.
+    """
+    documents = [(doc_id, " ".join(words(text))) for doc_id, text, _ in ve.iter_documents()]
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(n * 10):
+        if len(queries) == n:
+            break
+        _, text = rng.choice(documents)
+        tokens = text.split()
+        if len(tokens) < WINDOW_WORDS * 2:
+            continue
+        start = rng.randrange(len(tokens) - WINDOW_WORDS)
+        window = tokens[start:start + WINDOW_WORDS]
+        relevant = [doc_id for doc_id, other in documents if " ".join(window) in other]
+        queries.append((" ".join(rng.sample(window, QUERY_WORDS)), relevant))
+    return queries
+
+
+def child_stages(summary, root: str):
+    """Total and mean ms of the direct children of the root span, by name."""
+    return {
+        row["name"]: {"calls": row["calls"], "total_ms": row["total_ms"], "mean_ms": row["mean_ms"], "counts": row["counts"]}
+        for row in summary if row["depth"] == 1 and row["span"].startswith(root + "/")
+    }
+
+
+def bench_indexing(quiet):
+    from src.embedding.vector_store import VectorEngine
+    from src.indexing.indexer import IncrementalIndexer
+    from src.tracing.tracer import TRACER
+
+    files = glob.glob(os.path.join(Config.PAPERS_DIR, "*.pdf"))
+    size = sum(os.path.getsize(fp) for fp in files)
+    ve = VectorEngine()
+    TRACER.reset()
+    start = time.perf_counter()
+    with quiet():
+        summary = IncrementalIndexer(ve).run(full=True)
+    seconds = time.perf_counter() - start
+    stages = child_stages(TRACER.summary(), "index")
+
+    start = time.perf_counter()
+    with quiet():
+        IncrementalIndexer(ve).run()
+    noop = time.perf_counter() - start
+
+    chunks = ve.count()
+    return ve, {
+        "docs": len(files), "chunks": chunks, "mb": size / 2**20, "failed": len(summary["failed"]),
+        "seconds": seconds, "docs_per_s": len(files) / seconds, "chunks_per_s": chunks / seconds,
+        "mb_per_s": size / 2**20 / seconds, "noop_s": noop, "stages": stages,
+    }
+
+
+def bench_strategy(ve, strategy: str, queries, k: int, repeat: int, quiet):
+    from src.evaluation.evaluator import Evaluator
+    from src.retrieval.retriever import HybridRetriever
+    from src.tracing.tracer import TRACER
+
+    retriever = HybridRetriever(ve)
+    with quiet():
+        retriever.retrieve(queries[0][0], top_k=k, strategy=strategy) # warmup: model load, BM25 mmap, connections
+    TRACER.reset()
+    latencies, results = [], []
+    for _ in range(repeat):
+        retriever.reranker.cache.clear()
+        results = []
+        for query, _ in queries:
+            start = time.perf_counter()
+            with quiet():
+                results.append(retriever.retrieve(query, top_k=k, strategy=strategy))
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    summary = TRACER.summary()
+    rerank = next((row for row in summary if row["span"] == "retrieve/rerank"), None)
+    encoder = next((row for row in summary if row["span"] == "retrieve/rerank/cross_encoder"), None)
+    pairs = encoder["counts"].get("pairs", 0) if encoder else 0
+    relevant = [ids for _, ids in queries]
+    return {
+        "queries": len(latencies),
+        "latency_ms": {"p50": percentile(latencies, 0.50), "p95": percentile(latencies, 0.95),
+                       "p99": percentile(latencies, 0.99), "mean": sum(latencies) / len(latencies)},
+        "qps": 1000 * len(latencies) / sum(latencies),
+        "rerank": {
+            "ms_per_call": rerank["mean_ms"] if rerank else 0.0,
+            "share": rerank["total_ms"] / sum(latencies) if rerank else 0.0,
+            "pairs_per_call": pairs / rerank["calls"] if rerank else 0.0,
+            "ms_per_pair": encoder["total_ms"] / pairs if pairs else 0.0,
+        },
+        "stages_ms": {name: stage["mean_ms"] for name, stage in child_stages(summary, "retrieve").items()},
+        "hit_rate": Evaluator.hit_rate(results, relevant, key="id"),
+        "mrr": Evaluator.mrr(results, relevant, key="id"),
+    }
+
+
+def git_commit() -> dict:
+    def git(*args):
+        return subprocess.run(["git", *args], cwd=PROJECT_ROOT, capture_output=True, text=True).stdout.strip()
+    try:
+        return {"commit": git("rev-parse", "--short", "HEAD"), "dirty": bool(git("status", "--porcelain", "--", "src", "config"))}
+    except OSError:
+        return {"commit": None, "dirty": None}
+
+
+def run(args) -> dict:
+    workdir = args.workdir or tempfile.mkdtemp(prefix="rag_bench_")
+    isolate(workdir)
+    Config.EMBEDDING_CACHE_ENABLED = False # every run must embed, or throughput depends on the previous one
+    Config.LLM_CACHE_ENABLED = False
+    Config.VECTOR_BACKEND = args.backend
+    Config.VECTOR_QUANTIZATION = args.quantization
+    Config.CHUNKER = args.chunker
+    if args.workers:
+        Config.INGEST_WORKERS = args.workers
+    if not args.real_models:
+        install_stub_models()
+    from src.tracing.tracer import TRACER
+    TRACER.enable()
+    quiet = contextlib.nullcontext if args.verbose else (lambda: contextlib.redirect_stdout(io.StringIO()))
+
+    try:
+        with StubOllama(latency_ms=args.llm_latency_ms) as url:
+            Config.OLLAMA_URL = url
+            if args.corpus:
+                copy_corpus(args.corpus)
+            else:
+                make_corpus(args.papers, args.pages, args.seed)
+            ve, indexing = bench_indexing(quiet)
+            print(f"Indexed {indexing['docs']} PDFs ({indexing['mb']:.1f} MB) into {indexing['chunks']} chunks in "
+                  f"{indexing['seconds']:.2f} s: {indexing['docs_per_s']:.1f} docs/s, {indexing['chunks_per_s']:.0f} chunks/s; "
+                  f"no-op re-index {indexing['noop_s']:.2f} s")
+
+            queries = make_queries(ve, args.queries, args.seed)
+            if not queries:
+                sys.exit("Corpus too small to sample queries from.")
+            print(f"\n{len(queries)} queries x {args.repeat}, k={args.k}")
+            print(f"{'strategy':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'qps':>7} {'rerank ms':>9} "
+                  f"{'rerank %':>8} {'hit rate':>8} {'MRR':>6}")
+            strategies = {}
+            for strategy in args.strategies:
+                r = strategies[strategy] = bench_strategy(ve, strategy, queries, args.k, args.repeat, quiet)
+                print(f"{strategy:>9} {r['latency_ms']['p50']:>8.1f} {r['latency_ms']['p95']:>8.1f} "
+                      f"{r['latency_ms']['p99']:>8.1f} {r['qps']:>7.1f} {r['rerank']['ms_per_call']:>9.1f} "
+                      f"{r['rerank']['share']:>8.1%} {r['hit_rate']:>8.3f} {r['mrr']:>6.3f}")
+    finally:
+        if not args.keep and not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        "meta": dict(git_commit(), time=time.strftime("%Y-%m-%dT%H:%M:%S"), python=platform.python_version(),
+                     platform=platform.platform(), cpus=os.cpu_count(), stub_models=not args.real_models,
+                     args={key: value for key, value in vars(args).items() if key not in ("compare", "output")},
+                     config={"backend": Config.VECTOR_BACKEND, "quantization": Config.VECTOR_QUANTIZATION,
+                             "chunker": Config.CHUNKER, "workers": Config.INGEST_WORKERS,
+                             "window": Config.RETRIEVAL_WINDOW_SIZE, "fusion": Config.HYBRID_FUSION,
+                             "cascade_keep": Config.RERANK_CASCADE_KEEP, "dedup": Config.DEDUP_ENABLED}),
+        "corpus": {"source": args.corpus or "synthetic", "docs": indexing["docs"], "chunks": indexing["chunks"],
+                   "mb": indexing["mb"], "queries": len(queries)},
+        "indexing": indexing,
+        "strategies": strategies,
+    }
+
+
+def lookup(result: dict, path: str):
+    for key in path.split("."):
+        if not isinstance(result, dict) or key not in result:
+            return None
+        result = result[key]
+    return result
+
+
+def compare(base: dict, new: dict, tolerance: float) -> list:
+    """Prints per-metric changes; returns the regressed metrics (timings beyond tolerance, any quality drop)."""
+    metrics = list(INDEX_METRICS) + [(f"strategies.{s}.{path}", better) for s in new.get("strategies", {})
+                                     for path, better in STRATEGY_METRICS]
+    print(f"\nbase {base['meta'].get('commit')} vs new {new['meta'].get('commit')} (tolerance {tolerance:.0%})")
+    print(f"{'metric':<38} {'base':>10} {'new':>10} {'change':>8}")
+    regressions = []
+    for path, better in metrics:
+        old, cur = lookup(base, path), lookup(new, path)
+        if old is None or cur is None:
+            continue
+        change = (cur - old) / old if old else 0.0
+        worse = change if better == "lower" else -change
+        quality = path.endswith(("hit_rate", "mrr"))
+        regressed = cur < old - 1e-9 if quality else worse > tolerance
+        if regressed:
+            regressions.append(path)
+        print(f"{path:<38} {old:>10.3f} {cur:>10.3f} {change:>+8.1%}{'  <-- regression' if regressed else ''}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline indexing and retrieval benchmark")
+    parser.add_argument("--papers", type=int, default=20, help="Synthetic PDFs to generate")
+    parser.add_argument("--pages", type=int, default=6, help="Pages per synthetic PDF")
+    parser.add_argument("--corpus", help="Folder of fixture PDFs to index instead of a synthetic corpus")
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--k", type=int, default=Config.TOP_K)
+    parser.add_argument("--repeat", type=int, default=1, help="Passes over the queries per strategy")
+    parser.add_argument("--strategies", nargs="+", default=STRATEGIES, choices=STRATEGIES)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--backend", default=Config.VECTOR_BACKEND, choices=["chroma", "local"])
+    parser.add_argument("--quantization", default=Config.VECTOR_QUANTIZATION, choices=["none", "int8", "binary"])
+    parser.add_argument("--chunker", default=Config.CHUNKER, help="'token' needs the embedding model's tokenizer")
+    parser.add_argument("--workers", type=int, default=0, help="Parsing processes (0 = Config.INGEST_WORKERS)")
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0, help="Delay of every stub LLM response")
+    parser.add_argument("--real-models", action="store_true", help="Load the configured embedding and cross-encoder models")
+    parser.add_argument("--workdir", help="Data folder to use (kept); default: a temporary one")
+    parser.add_argument("--keep", action="store_true", help="Keep the temporary data folder")
+    parser.add_argument("--verbose", action="store_true", help="Show the pipeline's own output")
+    parser.add_argument("--output", help="Result JSON (default: output/benchmarks/pipeline_<commit>_<time>.json)")
+    parser.add_argument("--compare", nargs="+", metavar="RESULT", help="BASE [NEW]: diff NEW (or this run) against BASE")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Relative slowdown that counts as a regression")
+    args = parser.parse_args()
+
+    if args.compare and len(args.compare) > 2:
+        parser.error("--compare takes BASE and optionally NEW")
+    if args.compare and len(args.compare) == 2:
+        with open(args.compare[0], encoding="utf-8") as f_base, open(args.compare[1], encoding="utf-8") as f_new:
+            regressions = compare(json.load(f_base), json.load(f_new), args.tolerance)
+    else:
+        result = run(args)
+        output = args.output or os.path.join(
+            ORIGINAL_OUTPUT_DIR, "benchmarks", f"pipeline_{result['meta']['commit'] or 'nogit'}_{time.strftime('%Y%m%d-%H%M%S')}.json")
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        print(f"\nResults written to {output}")
+        regressions = []
+        if args.compare:
+            with open(args.compare[0], encoding="utf-8") as f:
+                regressions = compare(json.load(f), result, args.tolerance)
+
+    if regressions:
+        print(f"Regressions: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
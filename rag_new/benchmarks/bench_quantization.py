@@ -0,0 +1,117 @@
+"""
+Quantized vector storage (int8 / binary + float rescoring) against the float32 index on the same corpus:
+disk per store, bytes scanned per query, resident memory, queries/sec and recall@k.
+
+    python benchmarks/bench_quantization.py --size 100000 --rescore 1 2 4 8
+    python benchmarks/bench_quantization.py --corpus collection     # vectors of the indexed papers
+
+Each store is searched from a fresh process, so resident memory only counts the pages that the
+searches themselves touch. With --corpus collection, --queries chunks are held out of the corpus
+and their vectors are used as queries.
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config.config import Config
+from src.embedding.backends import LocalBackend, QUANTIZATIONS
+from bench_ann import exact_neighbours, rss_mb, synthetic_vectors
+
+SCANNED_FILES = {"none": ["vectors.f32"], "int8": ["codes.i8", "scales.f32"], "binary": ["codes.b1"]}
+
+
+def collection_vectors() -> np.ndarray:
+    from src.embedding.backends import make_backend
+    store = make_backend(Config.VECTOR_BACKEND, Config.COLLECTION_NAME, "none")
+    pages, offset = [], 0
+    while True:
+        page = store.page(5000, offset, include_embeddings=True)
+        if not len(page["ids"]):
+            break
+        pages.append(np.asarray(page["embeddings"], dtype=np.float32))
+        offset += len(page["ids"])
+    if not pages:
+        sys.exit("The collection is empty: run `python main.py index` first.")
+    return np.concatenate(pages)
+
+
+def mb(path: str, names=None) -> float:
+    names = names or os.listdir(path)
+    return sum(os.path.getsize(os.path.join(path, n)) for n in names if os.path.exists(os.path.join(path, n))) / 2**20
+
+
+def measure(path: str, mode: str, rescore: int, k: int):
+    """Child process: open the store, search every query one at a time, print ids and timings as JSON."""
+    queries = np.load(os.path.join(path, mode, "queries.npy"))
+    base_rss = rss_mb()
+    backend = LocalBackend(mode, path=path, index_type="flat", quantization=mode, rescore=rescore)
+    backend.query(queries[:1], k)  # row list and norms are computed once per data version
+    start = time.perf_counter()
+    found = [[int(i) for i in backend.query(q[None, :], k)["ids"][0]] for q in queries]
+    elapsed = time.perf_counter() - start
+    print(json.dumps({"found": found, "qps": len(queries) / elapsed, "rss": rss_mb() - base_rss}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory, disk and recall of quantized vector storage")
+    parser.add_argument("--corpus", choices=["synthetic", "collection"], default="synthetic")
+    parser.add_argument("--size", type=int, default=50000, help="Synthetic corpus size")
+    parser.add_argument("--dim", type=int, default=384, help="Synthetic vector dimension (all-MiniLM-L6-v2: 384)")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--modes", nargs="+", default=list(QUANTIZATIONS), choices=QUANTIZATIONS)
+    parser.add_argument("--rescore", type=int, nargs="+", default=[Config.RESCORE_FACTOR],
+                        help="Shortlist sizes (x k) rescored on float32 vectors")
+    parser.add_argument("--measure", nargs=3, metavar=("DIR", "MODE", "RESCORE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        measure(args.measure[0], args.measure[1], int(args.measure[2]), args.k)
+        return
+
+    if args.corpus == "collection":
+        data = collection_vectors()
+        data = data[np.random.default_rng(0).permutation(len(data))]
+    else:
+        data = synthetic_vectors(args.size + args.queries, args.dim)
+    corpus, queries = data[args.queries:], data[:args.queries]
+    truth = exact_neighbours(corpus, queries, args.k)
+    print(f"corpus={args.corpus} vectors={len(corpus)} dim={corpus.shape[1]} queries={len(queries)} k={args.k}")
+    print(f"{'mode':>7} {'rescore':>7} {'disk MB':>8} {'scan MB':>8} {'rss MB':>7} {'qps':>7} {'recall@k':>9}")
+
+    root = tempfile.mkdtemp(prefix="bench_quant_")
+    try:
+        for mode in args.modes:
+            backend = LocalBackend(mode, path=root, index_type="flat", quantization=mode)
+            for offset in range(0, len(corpus), 5000):
+                batch = corpus[offset:offset + 5000]
+                backend.upsert([str(offset + i) for i in range(len(batch))], batch, [""] * len(batch), [{}] * len(batch))
+            backend.conn.close()
+            del backend
+            path = os.path.join(root, mode)
+            np.save(os.path.join(path, "queries.npy"), queries)
+            disk = mb(path, [n for n in os.listdir(path) if n != "queries.npy"])
+            scanned = mb(path, SCANNED_FILES[mode])
+
+            for rescore in (args.rescore if mode != "none" else [1]):
+                out = subprocess.run([sys.executable, os.path.abspath(__file__), "-k", str(args.k),
+                                      "--measure", root, mode, str(rescore)],
+                                     capture_output=True, text=True, check=True).stdout
+                result = json.loads(out.strip().splitlines()[-1])
+                recall = np.mean([len(set(f) & set(t.tolist())) / args.k for f, t in zip(result["found"], truth)])
+                print(f"{mode:>7} {rescore if mode != 'none' else '-':>7} {disk:>8.1f} {scanned:>8.1f} "
+                      f"{result['rss']:>7.1f} {result['qps']:>7.0f} {recall:>9.3f}")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
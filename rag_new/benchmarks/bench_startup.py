@@ -0,0 +1,76 @@
+"""
+Startup cost per CLI command: wall time of a fresh interpreter that imports main.py plus the
+modules the command imports, and which heavy libraries that pulls in. Exits non-zero when a
+command exceeds its budget, so it can guard against import-time regressions.
+
+    python benchmarks/bench_startup.py --repeat 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules each command imports in main.py (keep in sync with run_cli).
+COMMAND_IMPORTS = {
+    "--help": [],
+    "ingest": ["src.ingestion.ingestor"],
+    "index": ["src.embedding.vector_store", "src.indexing.indexer"],
+    "retrieve": ["src.embedding.vector_store", "src.retrieval.retriever"],
+    "generate": ["src.embedding.vector_store", "src.retrieval.retriever", "src.generation.generator"],
+    "warmup": ["src.models.registry"],
+    "serve": ["src.service.server"],
+}
+# Seconds; commands not listed here are only reported.
+BUDGETS = {"--help": 1.0, "ingest": 1.0, "warmup": 1.0}
+HEAVY = ("chromadb", "torch", "sentence_transformers", "transformers", "fitz", "arxiv", "langchain_text_splitters")
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import main
+for name in {modules!r}:
+    __import__(name)
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "heavy": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def measure(modules, repeat: int):
+    code = PROBE.format(modules=modules, heavy=HEAVY)
+    times, heavy = [], []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-c", code], cwd=PROJECT_ROOT, capture_output=True, text=True, check=True)
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        times.append(result["seconds"])
+        heavy = result["heavy"]
+    return statistics.median(times), heavy
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import time per CLI command")
+    parser.add_argument("--repeat", type=int, default=3, help="Fresh interpreters per command (median is reported)")
+    parser.add_argument("--commands", nargs="+", default=list(COMMAND_IMPORTS), choices=list(COMMAND_IMPORTS))
+    args = parser.parse_args()
+
+    failed = []
+    print(f"{'command':>10} {'import s':>9} {'budget':>7}  heavy modules")
+    for command in args.commands:
+        seconds, heavy = measure(COMMAND_IMPORTS[command], args.repeat)
+        budget = BUDGETS.get(command)
+        over = budget is not None and seconds > budget
+        if over:
+            failed.append(command)
+        print(f"{command:>10} {seconds:>9.3f} {budget if budget is not None else '-':>7}  "
+              f"{', '.join(heavy) or '-'}{'  <-- over budget' if over else ''}")
+
+    if failed:
+        print(f"Startup regression in: {', '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+"""
+Offline stand-ins for the models and the LLM server, for tests and benchmarks that must run anywhere:
+
+- HashingEmbedder: SentenceTransformer-compatible `encode` over hashed word counts, so lexically
+  similar texts get similar vectors and retrieval quality still means something.
+- OverlapCrossEncoder: CrossEncoder-compatible `predict` scoring the query terms found in the text.
+- StubOllama: a local HTTP server speaking Ollama's /api/generate (plain and streamed) with a
+  fixed latency, so the real LLMClient (pooled session, retries, token accounting) is used.
+- StubArxiv: a local arXiv API (Atom feed) and PDF host honouring Range requests, which can cut
+  a transfer short, so ArxivIngestor's search, resume and dedup run without the network.
+
+install_stub_models() puts the first two in the ModelRegistry under the configured model names.
+"""
+import json
+import os
+import re
+import sys
+import threading
+import time
+import zlib
+from html import escape
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Dict, Optional
+from urllib.parse import parse_qs
+import numpy as np
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config.config import Config
+
+WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def words(text: str) -> List[str]:
+    return WORD_RE.findall(text.lower())
+
+
+class HashingEmbedder:
+    """Feature-hashed, log-scaled word counts (signed buckets), optionally L2-normalized."""
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dim
+
+    def encode(self, texts, batch_size=32, normalize_embeddings=True, convert_to_numpy=True, show_progress_bar=False):
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in words(text):
+                h = zlib.crc32(word.encode("utf-8"))
+                vectors[row, h % self.dim] += 1.0 if h & (1 << 31) else -1.0
+        vectors = np.sign(vectors) * np.log1p(np.abs(vectors))
+        if normalize_embeddings:
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors /= np.where(norms == 0, 1, norms)
+        return vectors
+
+
+class OverlapCrossEncoder:
+    """Fraction of distinct query words that occur in the text, plus a small bonus for the exact phrase."""
+    def predict(self, pairs, batch_size=32, show_progress_bar=False):
+        scores = np.zeros(len(pairs), dtype=np.float32)
+        for i, (query, text) in enumerate(pairs):
+            query_words = set(words(query))
+            text_words = words(text)
+            if query_words:
+                scores[i] = len(query_words & set(text_words)) / len(query_words)
+            if " ".join(words(query)) in " ".join(text_words):
+                scores[i] += 0.5
+        return scores
+
+
+def install_stub_models():
+    """Registers the stub embedder and cross-encoder so VectorEngine / RerankEngine never load real ones."""
+    from src.models.registry import ModelRegistry
+    ModelRegistry.register("embedding", Config.EMBEDDING_MODEL_NAME, HashingEmbedder())
+    ModelRegistry.register("cross_encoder", Config.CROSS_ENCODER_MODEL, OverlapCrossEncoder())
+
+
+def stub_answer(prompt: str) -> str:
+    """Deterministic replies shaped like what each prompt of the pipeline expects."""
+    def between(start: str, end: str) -> str:
+        match = re.search(re.escape(start) + r"(.*?)" + re.escape(end), prompt, re.S)
+        return " ".join(match.group(1).split()) if match else ""
+
+    if "HYPOTHETICAL ANSWER:" in prompt:
+        # HyDE: restate the question, as a model writing an answer full of its keywords would.
+        return between("QUESTION:", "HYPOTHETICAL ANSWER:")
+    if "SUB-QUESTIONS" in prompt:
+        terms = re.findall(r'Complex: "([^"]*)"', prompt)[-1].split()
+        half = max(1, len(terms) // 2)
+        return "\n".join(part for part in (" ".join(terms[:half]), " ".join(terms[half:])) if part)
+    if "RELEVANT SENTENCES:" in prompt:
+        return between("TEXT:", "RELEVANT SENTENCES:") or "IRRELEVANT"
+    if "Faithfulness Score:" in prompt:
+        return ("Faithfulness Reasoning: The claims appear in the context.\nFaithfulness Score: 4\n"
+                "Relevance Reasoning: The answer addresses the query.\nRelevance Score: 4")
+    if "Score:" in prompt:
+        return "Reasoning: The answer is grounded in the context and addresses the query.\nScore: 4"
+    return "Stub review: " + " ".join(between("QUERY:", "CONTEXT:").split()[:20])
+
+
+class _OllamaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1" # keep-alive, as the pooled session expects, and chunked streams
+    disable_nagle_algorithm = True # headers and body go out in separate writes
+
+    def do_POST(self):
+        if self.path != "/api/generate":
+            self.send_error(404)
+            return
+        payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        prompt = payload.get("prompt", "")
+        answer = stub_answer(prompt)
+        with self.server.lock:
+            self.server.requests += 1
+        time.sleep(self.server.latency)
+        counts = {"prompt_eval_count": len(words(prompt)), "eval_count": len(words(answer))}
+        try:
+            if payload.get("stream"):
+                self._stream(answer, counts)
+            else:
+                body = json.dumps(dict(counts, response=answer, done=True)).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass # the client timed out and hung up
+
+    def _stream(self, answer: str, counts: dict):
+        # Like Ollama: chunked transfer, one JSON line per piece, sent as it is produced.
+        pieces = [piece + " " for piece in answer.split(" ")]
+        lines = [json.dumps({"response": piece, "done": False}) for piece in pieces]
+        lines.append(json.dumps(dict(counts, response="", done=True)))
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for i, line in enumerate(lines):
+            if i:
+                time.sleep(self.server.piece_latency)
+            data = (line + "\n").encode("utf-8")
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+            self.wfile.flush()
+        self.wfile.write(b"0\r\n\r\n")
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubOllama:
+    """
+    with StubOllama(latency_ms=20) as url: Config.OLLAMA_URL = url ...
+    Serves on 127.0.0.1 on a free port, in a daemon thread. latency_ms passes before the first
+    token, piece_ms between streamed pieces; `requests` counts the generate calls received.
+    """
+    def __init__(self, latency_ms: float = 0.0, piece_ms: float = 0.0):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _OllamaHandler)
+        self.server.daemon_threads = True
+        self.server.latency = latency_ms / 1000
+        self.server.piece_latency = piece_ms / 1000
+        self.server.requests = 0
+        self.server.lock = threading.Lock()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def __enter__(self) -> str:
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self.url
+
+    @property
+    def requests(self) -> int:
+        return self.server.requests
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+FEED = """<?xml version="1.0" encoding="UTF-8"?>
+<feed xmlns="http://www.w3.org/2005/Atom" xmlns:opensearch="http://a9.com/-/spec/opensearch/1.1/"
+      xmlns:arxiv="http://arxiv.org/schemas/atom">
+  <title>arXiv Query: {query}</title>
+  <opensearch:totalResults>{total}</opensearch:totalResults>
+  <opensearch:startIndex>{start}</opensearch:startIndex>
+  <opensearch:itemsPerPage>{count}</opensearch:itemsPerPage>
+{entries}</feed>
+"""
+
+ENTRY = """  <entry>
+    <id>http://arxiv.org/abs/{entry_id}</id>
+    <updated>2024-01-{day:02d}T00:00:00Z</updated>
+    <published>2024-01-{day:02d}T00:00:00Z</published>
+    <title>Stub paper {paper_id}</title>
+    <summary>Abstract of stub paper {paper_id}.</summary>
+    <author><name>Author {day}</name></author>
+    <link href="{base}/abs/{entry_id}" rel="alternate" type="text/html"/>
+    <link title="pdf" href="{base}/pdf/{paper_id}" rel="related" type="application/pdf"/>
+  </entry>
+"""
+
+
+class _ArxivHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self._route(head=False)
+
+    def do_HEAD(self):
+        self._route(head=True)
+
+    def _route(self, head: bool):
+        stub = self.server.stub
+        path, _, query = self.path.partition("?")
+        if path == "/api/query":
+            self._send(200, stub.feed(parse_qs(query)), {"Content-Type": "application/atom+xml"}, head)
+        elif path.startswith("/pdf/") and path[len("/pdf/"):] in stub.pdfs:
+            self._pdf(path[len("/pdf/"):], head)
+        else:
+            self._send(404, b"", {}, head)
+
+    def _pdf(self, paper_id: str, head: bool):
+        stub = self.server.stub
+        data = stub.pdfs[paper_id]
+        requested = self.headers.get("Range")
+        match = re.fullmatch(r"bytes=(\d+)-", requested or "")
+        start = int(match.group(1)) if match else 0
+        with stub.lock:
+            if not head:
+                stub.requests.append((paper_id, requested))
+            cut = None if head else stub.cut_after.pop(paper_id, None)
+        headers = {"Content-Type": "application/pdf", "Accept-Ranges": "bytes"}
+        if start >= len(data):
+            self._send(416, b"", dict(headers, **{"Content-Range": f"bytes */{len(data)}"}), head)
+            return
+        if match:
+            headers["Content-Range"] = f"bytes {start}-{len(data) - 1}/{len(data)}"
+        self._send(206 if match else 200, data[start:], headers, head, cut)
+
+    def _send(self, status: int, body: bytes, headers: Dict, head: bool, cut: Optional[int] = None):
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if head:
+            return
+        try:
+            self.wfile.write(body if cut is None else body[:cut])
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        if cut is not None:
+            self.close_connection = True # hang up mid-transfer
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubArxiv:
+    """
+    with StubArxiv({"2401.00001": pdf_bytes, ...}) as url: Config.ARXIV_API_URL = url + "/api/query" ...
+    The feed lists `entries` (versioned arXiv IDs, default every paper as v1, e.g. "2401.00001v2")
+    whatever the query; each links to its PDF at /pdf/<paper_id>. cut_after={paper_id: n} drops
+    the connection after n bytes of that paper's next transfer. `requests` records
+    (paper_id, Range header) for every PDF request.
+    """
+    def __init__(self, pdfs: Dict[str, bytes], entries: Optional[List[str]] = None,
+                 cut_after: Optional[Dict[str, int]] = None):
+        self.pdfs = dict(pdfs)
+        self.entries = entries or [paper_id + "v1" for paper_id in self.pdfs]
+        self.cut_after = dict(cut_after or {})
+        self.requests = []
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _ArxivHandler)
+        self.server.daemon_threads = True
+        self.server.stub = self
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def feed(self, params: Dict[str, List[str]]) -> bytes:
+        start = int(params.get("start", ["0"])[0])
+        count = int(params.get("max_results", [str(len(self.entries))])[0])
+        page = self.entries[start:start + count]
+        entries = "".join(ENTRY.format(entry_id=entry_id, paper_id=entry_id.rsplit("v", 1)[0], day=i % 28 + 1, base=self.url)
+                          for i, entry_id in enumerate(page, start))
+        return FEED.format(query=escape(params.get("search_query", [""])[0]), total=len(self.entries), start=start,
+                           count=len(page), entries=entries).encode("utf-8")
+
+    def __enter__(self) -> str:
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self.url
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
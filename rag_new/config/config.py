@@ -10,33 +10,118 @@ class Config:
     
     # Ingestion
     MAX_PAPERS = 5
+    CATALOG_PATH = os.path.join(DATA_DIR, "catalog.json") # Every downloaded paper, keyed by arXiv ID
+    ARXIV_API_URL = os.environ.get("ARXIV_API_URL", "https://export.arxiv.org/api/query") # Point at a local stand-in for tests
+    DOWNLOAD_WORKERS = 4 # Concurrent PDF downloads
+    DOWNLOAD_CHUNK_SIZE = 1 << 16 # Bytes written per chunk while streaming a PDF
+    DOWNLOAD_TIMEOUT = (10, 60) # (connect, read) seconds
     
     # Chunking
+    CHUNKER = "recursive" # "recursive" (langchain, sized in characters) or "token" (sized in embedding-model tokens, section-aware)
     CHUNK_SIZE = 1000
     CHUNK_OVERLAP = 200
+    CHUNK_TOKENS = 256 # "token" chunker: all-MiniLM-L6-v2 embeds at most 256 tokens (special tokens included)
+    CHUNK_OVERLAP_TOKENS = 32
     
     # Embedding
     EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"  # Easy to run locally
     CROSS_ENCODER_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+    EMBEDDING_DEVICE = None # None = auto (cuda/mps if available), or "cpu", "cuda", ...
+    EMBEDDING_BATCH_SIZE = 32 # Texts per forward pass
+    EMBEDDING_THREADS = 0 # torch intra-op threads, 0 = library default
+    NORMALIZE_EMBEDDINGS = True # Unit vectors: L2 distance then ranks like cosine
+    UPSERT_BATCH_SIZE = 256 # Chunks embedded and written to the vector DB per round trip
+    EMBEDDING_CACHE_ENABLED = True
+    EMBEDDING_CACHE_DIR = os.path.join(DATA_DIR, "embedding_cache")
+    EMBEDDING_CACHE_MAX_ENTRIES = 200_000 # LRU-evicted beyond this (~300 MB at 384 dims)
     
     # Vector DB
     COLLECTION_NAME = "rag_papers"
+    VECTOR_BACKEND = "chroma" # "chroma" or "local" (memory-mapped matrix + FAISS/NumPy search)
+    LOCAL_INDEX_DIR = os.path.join(DATA_DIR, "local_index")
+    LOCAL_INDEX_TYPE = "hnsw" # local backend: "flat" (exact, NumPy only), "hnsw" or "ivf" (need faiss-cpu, else flat is used)
+    HNSW_M = 16 # Graph degree: higher = better recall, more memory
+    HNSW_EF_CONSTRUCTION = 100
+    HNSW_EF_SEARCH = 100 # Candidates explored per query: higher = better recall, slower
+    IVF_NLIST = 1024 # Inverted lists (capped by corpus size)
+    IVF_NPROBE = 16 # Lists scanned per query: higher = better recall, slower
+    PQ_M = 0 # IVF only: product-quantize vectors into PQ_M bytes (must divide the dimension, 0 = off)
+    VECTOR_QUANTIZATION = "none" # local backend: "none" (float32), "int8" (4x smaller) or "binary" (32x smaller) scans
+    RESCORE_FACTOR = 4 # Quantized/PQ search shortlists RESCORE_FACTOR x k candidates, rescored on float32 vectors
+    
+    # Indexing
+    INDEX_MANIFEST_PATH = os.path.join(DATA_DIR, "index_manifest.json")
+    INGEST_WORKERS = min(4, os.cpu_count() or 1) # Processes for PDF parsing/chunking (1 = in-process)
+    WORKER_MEMORY_LIMIT_MB = 2048 # Address-space cap per worker (POSIX only, 0 = unlimited)
+    DEDUP_ENABLED = True # Store duplicate / near-duplicate chunks once (boilerplate, re-ingested papers)
+    DEDUP_INDEX_PATH = os.path.join(DATA_DIR, "dedup_index.json") # + dedup_index.npy (MinHash signatures)
+    DEDUP_THRESHOLD = 0.9 # Estimated Jaccard similarity of word shingles above which chunks are near-duplicates
+    DEDUP_NUM_PERM = 64 # MinHash permutations per chunk
+    DEDUP_SHINGLE_WORDS = 5
     
     # Retrieval
     TOP_K = 5
     RETRIEVAL_WINDOW_SIZE = 50 # Fetch more candidates for re-ranking
+    SPARSE_INDEX_DIR = os.path.join(DATA_DIR, "sparse_index") # BM25 inverted index, rebuilt by `index`
+    HYBRID_FUSION = "rrf" # "rrf" (reciprocal rank fusion) or "weighted" (alpha * vector + (1 - alpha) * bm25)
+    RRF_K = 60
+    RERANK_BATCH_SIZE = 32 # Query-chunk pairs per cross-encoder forward pass
+    RERANK_MAX_LENGTH = 512 # Tokens per pair; longer chunks are truncated
+    RERANK_CACHE_SIZE = 10_000 # (query, chunk id) scores kept in memory
+    RERANK_CASCADE_KEEP = 0 # >0: only this many best first-stage candidates reach the cross-encoder
     
     # Generation
     LLM_PROVIDER = "ollama" # or "openai"
     OLLAMA_MODEL = "mistral" # Make sure you have this pulled: `ollama pull mistral`
     OPENAI_MODEL = "gpt-4o-mini"
+    OLLAMA_URL = os.environ.get("OLLAMA_URL", "http://localhost:11434")
+    OLLAMA_OPTIONS = {} # Sampling options passed to Ollama (e.g. {"temperature": 0.3})
+    OPENAI_BASE_URL = os.environ.get("OPENAI_BASE_URL") # None = api.openai.com
+    OPENAI_TEMPERATURE = 0.3
+    LLM_CONNECT_TIMEOUT = 5 # seconds
+    LLM_READ_TIMEOUT = 300 # seconds; local models can be slow on long prompts
+    LLM_MAX_RETRIES = 2 # Retries on connection errors and 429/5xx (not read timeouts), with exponential backoff
+    LLM_RETRY_BACKOFF = 0.5
+    LLM_POOL_SIZE = 8 # Pooled HTTP connections / default concurrency for batched calls
+    REFINE_CONCURRENCY = 4 # Parallel LLM calls when refining retrieved chunks
+
+    # LLM Response Cache
+    LLM_CACHE_ENABLED = True
+    LLM_CACHE_PATH = os.path.join(DATA_DIR, "llm_cache.sqlite3")
+    LLM_CACHE_MAX_ENTRIES = 20_000 # Least recently used responses are evicted beyond this
+    LLM_CACHE_TTL_SECONDS = 7 * 24 * 3600 # 0 = never expire
+    HYDE_SEMANTIC_CACHE = False # Reuse the HyDE answer of a near-duplicate earlier query
+    SEMANTIC_CACHE_THRESHOLD = 0.95 # Cosine similarity needed to count as a near-duplicate
+    SEMANTIC_CACHE_MAX_ENTRIES = 5_000
+    
+    # Resident Service (python main.py serve)
+    SERVICE_HOST = os.environ.get("RAG_SERVICE_HOST", "127.0.0.1")
+    SERVICE_PORT = int(os.environ.get("RAG_SERVICE_PORT", "8765"))
+    SERVICE_URL = os.environ.get("RAG_SERVICE_URL", f"http://{SERVICE_HOST}:{SERVICE_PORT}")
+    SERVICE_MAX_BATCH = 64 # Inputs per shared embedding / cross-encoder call
+    SERVICE_BATCH_WAIT_MS = 5 # How long a batch waits for concurrent requests to join
+    SERVICE_LATENCY_WINDOW = 10_000 # Recent requests kept per endpoint for percentiles
+    
+    # Evaluation (python main.py evaluate --queries FILE)
+    EVAL_KS = [1, 3, 5, 10] # Cutoffs for hit@k, recall@k, precision@k, nDCG@k, MRR@k and MAP@k
+    EVAL_WORKERS = 4 # Queries retrieved concurrently, sharing embedding / cross-encoder forward passes (1 = one at a time)
+    
+    # LLM-as-a-Judge (G-Eval faithfulness / relevance)
+    JUDGE_WORKERS = 4 # Triples judged concurrently (capped at LLM_POOL_SIZE connections)
+    JUDGE_CONTEXT_TOKENS = 3000 # Context shown to the judge; longer context keeps the sentences closest to the answer (0 = all)
+    JUDGE_COMBINED = True # Score faithfulness and relevance in one call instead of two
+    JUDGE_CACHE_ENABLED = True
+    JUDGE_CACHE_PATH = os.path.join(DATA_DIR, "judge_cache.sqlite3") # Verdicts keyed by a hash of query, answer, context and judge settings
+    
+    # Tracing (python main.py <command> --profile)
+    TRACE_DIR = os.path.join(OUTPUT_DIR, "traces") # JSON traces (span tree + Chrome trace events)
+    TRACE_MAX_ROOTS = 10_000 # Top-level spans kept in memory; a profiled service drops the oldest
     
     # For OpenAI, ensure OPENAI_API_KEY is in env vars
     
     @staticmethod
     def ensure_dirs():
+        """Creates the data/output folders. Called by the commands that write to them, not on import."""
         os.makedirs(Config.PAPERS_DIR, exist_ok=True)
         os.makedirs(Config.DB_DIR, exist_ok=True)
         os.makedirs(Config.OUTPUT_DIR, exist_ok=True)
-
-Config.ensure_dirs()
@@ -1,118 +1,221 @@
 import argparse
+import json
 import sys
 import os
-import glob
+import time
 
 # Add project root to sys.path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from config.config import Config
-from src.ingestion.ingestor import ArxivIngestor
-from src.processing.processor import PDFProcessor, Chunker
-from src.embedding.vector_store import VectorEngine
-from src.retrieval.retriever import HybridRetriever
-from src.generation.generator import RAGGenerator
+# Pipeline modules pull in chromadb, torch, PyMuPDF, arxiv, ... so each command imports only what it uses.
 
-def main():
+STRATEGIES = ["hyde", "complex", "naive", "hybrid"]
+# Interactive menu choice -> strategy name, as the retriever and the service know them.
+MENU_STRATEGIES = {"1": "hyde", "2": "complex", "3": "naive", "4": "hybrid"}
+
+def add_filter_arguments(parser):
+    parser.add_argument("--year-min", type=int, help="Only papers published in or after this year")
+    parser.add_argument("--year-max", type=int, help="Only papers published in or before this year")
+    parser.add_argument("--author", help="Only papers with an author whose name contains this text")
+    parser.add_argument("--paper-id", nargs="+", help="Only these arXiv IDs")
+
+def filters_from_args(args):
+    return {"year_min": args.year_min, "year_max": args.year_max, "author": args.author, "paper_id": args.paper_id}
+
+def profile_arguments():
+    """--profile / --trace, accepted by every subcommand."""
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("--profile", action="store_true", help="Trace every pipeline stage and print a per-stage summary")
+    parser.add_argument("--trace", help=f"Where to write the JSON trace (default: a new file in {Config.TRACE_DIR})")
+    return parser
+
+def run_cli():
     parser = argparse.ArgumentParser(description="RAG Pipeline CLI")
     subparsers = parser.add_subparsers(dest="command", help="Available commands")
+    common = [profile_arguments()]
     
     # Ingest Command
-    ingest_parser = subparsers.add_parser("ingest", help="Search and download papers")
+    ingest_parser = subparsers.add_parser("ingest", parents=common, help="Search and download papers")
     ingest_parser.add_argument("--query", required=True, help="Search query for arXiv")
     ingest_parser.add_argument("--max", type=int, default=Config.MAX_PAPERS, help="Max papers to download")
+    ingest_parser.add_argument("--workers", type=int, default=Config.DOWNLOAD_WORKERS, help="Concurrent downloads")
     
     # Index Command
-    index_parser = subparsers.add_parser("index", help="Parse and index downloaded papers")
+    index_parser = subparsers.add_parser("index", parents=common, help="Parse and index downloaded papers")
+    index_parser.add_argument("--full", action="store_true", help="Drop the collection and re-embed every PDF")
+    index_parser.add_argument("--workers", type=int, default=Config.INGEST_WORKERS, help="Processes for PDF parsing/chunking")
     
     # Retrieve Command
-    retrieve_parser = subparsers.add_parser("retrieve", help="Retrieve relevant chunks")
+    retrieve_parser = subparsers.add_parser("retrieve", parents=common, help="Retrieve relevant chunks")
     retrieve_parser.add_argument("--query", required=True, help="Query for retrieval")
     retrieve_parser.add_argument("--k", type=int, default=Config.TOP_K, help="Number of chunks")
+    retrieve_parser.add_argument("--strategy", default="hyde", choices=STRATEGIES, help="Retrieval strategy")
+    add_filter_arguments(retrieve_parser)
     
     # Generate Command
-    generate_parser = subparsers.add_parser("generate", help="Generate Literature Review")
+    generate_parser = subparsers.add_parser("generate", parents=common, help="Generate Literature Review")
     generate_parser.add_argument("--topic", required=True, help="Topic for review")
+    generate_parser.add_argument("--strategy", default="hyde", choices=STRATEGIES, help="Retrieval strategy")
+    generate_parser.add_argument("--stream", action="store_true", help="Print the review as it is generated")
+    add_filter_arguments(generate_parser)
     
     # Evaluate Command
-    eval_parser = subparsers.add_parser("evaluate", help="Run evaluation metrics")
-    eval_parser.add_argument("--query", required=True, help="Test query")
+    eval_parser = subparsers.add_parser("evaluate", parents=common, help="Run evaluation metrics")
+    eval_mode = eval_parser.add_mutually_exclusive_group(required=True)
+    eval_mode.add_argument("--query", help="Test query: retrieve, generate and judge one answer")
+    eval_mode.add_argument("--queries", help="Query set (JSON or JSONL of {id, query, relevant}) for batch retrieval metrics")
+    eval_parser.add_argument("--qrels", help="TREC qrels file (query_id 0 doc_id grade) for --queries")
+    eval_parser.add_argument("--strategies", nargs="+", default=STRATEGIES, choices=STRATEGIES, help="Strategies to compare")
+    eval_parser.add_argument("--k", type=int, nargs="+", default=Config.EVAL_KS, help="Metric cutoffs")
+    eval_parser.add_argument("--key", default="id", help="What relevant IDs refer to: 'id' (chunk IDs) or 'paper_id'")
+    eval_parser.add_argument("--workers", type=int, default=Config.EVAL_WORKERS, help="Queries retrieved concurrently")
+    eval_parser.add_argument("--output", help="Report JSON (default: output/evaluation_<query set>.json)")
+    
+    # Judge Command
+    judge_parser = subparsers.add_parser("judge", parents=common, help="Score many (query, answer, context) triples with the LLM judge")
+    judge_parser.add_argument("--input", required=True, help="JSON or JSONL of {id, query, answer, context: [text, ...]}")
+    judge_parser.add_argument("--workers", type=int, default=Config.JUDGE_WORKERS, help="Triples judged concurrently")
+    judge_parser.add_argument("--context-tokens", type=int, default=Config.JUDGE_CONTEXT_TOKENS, help="Context budget per judgment (0 = all)")
+    judge_parser.add_argument("--separate", action="store_true", help="One call per metric instead of a combined call")
+    judge_parser.add_argument("--no-cache", action="store_true", help="Re-judge even if a verdict is cached")
+    judge_parser.add_argument("--output", help="Verdicts JSONL (default: output/judgments_<input name>.jsonl)")
+    
+    # Warm-up Command
+    subparsers.add_parser("warmup", parents=common, help="Load the embedding and re-ranking models and report load times")
+    
+    # Serve Command
+    serve_parser = subparsers.add_parser("serve", parents=common, help="Run a resident HTTP service with models and indexes kept warm")
+    serve_parser.add_argument("--host", default=Config.SERVICE_HOST, help="Interface to bind")
+    serve_parser.add_argument("--port", type=int, default=Config.SERVICE_PORT, help="Port to listen on")
     
     # Run All Command
-    run_parser = subparsers.add_parser("run_all", help="Run full pipeline (Ingest -> Index -> Generate -> Eval)")
+    run_parser = subparsers.add_parser("run_all", parents=common, help="Run full pipeline (Ingest -> Index -> Generate -> Eval)")
     run_parser.add_argument("--query", required=True, help="Topic/Query for the pipeline")
     run_parser.add_argument("--max", type=int, default=Config.MAX_PAPERS, help="Max papers")
+    run_parser.add_argument("--strategy", default="hyde", choices=STRATEGIES, help="Retrieval strategy")
     
     args = parser.parse_args()
-    
+    if not args.command:
+        parser.print_help()
+        return
+    Config.ensure_dirs()
+    if not (args.profile or args.trace):
+        run_command(args)
+        return
+
+    from src.tracing.tracer import TRACER, span
+    TRACER.enable()
+    try:
+        with span(args.command):
+            run_command(args)
+    finally:
+        trace_path = args.trace or os.path.join(Config.TRACE_DIR, f"{args.command}_{time.strftime('%Y%m%d_%H%M%S')}.json")
+        TRACER.export(trace_path, command=args.command, argv=sys.argv[1:])
+        print(f"\n--- Profile ---\n{TRACER.format_summary()}")
+        print(f"Trace written to: {trace_path}")
+
+def run_command(args):
     if args.command == "ingest":
         print("--- Mode: Ingestion ---")
-        ingestor = ArxivIngestor(max_results=args.max)
+        from src.ingestion.ingestor import ArxivIngestor
+        ingestor = ArxivIngestor(max_results=args.max, workers=args.workers)
         papers = ingestor.search_and_download(args.query)
         print(f"Downloaded {len(papers)} papers.")
         
     elif args.command == "index":
         print("--- Mode: Indexing ---")
-        processor = PDFProcessor()
-        chunker = Chunker()
+        from src.embedding.vector_store import VectorEngine
+        from src.indexing.indexer import IncrementalIndexer
         ve = VectorEngine()
-        
-        # Reset DB to ensure sync with current papers
-        ve.reset_collection()
-        
-        pdf_files = glob.glob(os.path.join(Config.PAPERS_DIR, "*.pdf"))
-        print(f"Found {len(pdf_files)} PDFs to process.")
-        
-        for filepath in pdf_files:
-            try:
-                print(f"Processing: {os.path.basename(filepath)}")
-                text = processor.parse_pdf(filepath)
-                # Simple metadata
-                metadata = {"filepath": filepath, "title": os.path.basename(filepath)}
-                chunks = chunker.chunk_text(text, metadata)
-                ve.add_chunks(chunks)
-            except Exception as e:
-                print(f"Error processing {filepath}: {e}")
-        print("Indexing Complete.")
+        indexer = IncrementalIndexer(ve, workers=args.workers)
+        summary = indexer.run(full=args.full)
+        print(f"Indexing Complete. {summary['added']} added, {summary['updated']} updated, "
+              f"{summary['removed']} removed, {summary['skipped']} unchanged.")
+        stats = ve.embedder.cache_stats()
+        print(f"Embedding cache: {stats['hits']} hits, {stats['misses']} misses, {stats['entries']} entries.")
+        if indexer.dedup is not None:
+            dup, total = summary["duplicates"], indexer.dedup_stats()
+            print(f"Dedup: {dup['exact']} exact and {dup['near']} near-duplicate chunks of {dup['chunks']} skipped this run; "
+                  f"the index stores {total['stored']} of {total['chunks']} chunks ({total['shrink']:.1%} smaller).")
         
     elif args.command == "retrieve":
         print("--- Mode: Retrieval ---")
+        from src.embedding.vector_store import VectorEngine
+        from src.retrieval.retriever import HybridRetriever
         ve = VectorEngine()
         retriever = HybridRetriever(ve)
         
-        results = retriever.retrieve(args.query, top_k=args.k)
+        results = retriever.retrieve(args.query, top_k=args.k, strategy=args.strategy, filters=filters_from_args(args))
         for i, res in enumerate(results):
             print(f"\n[Result {i+1}] (Score: {res.get('rerank_score', 'N/A')})")
-            print(f"Source: {res['metadata'].get('title')}")
+            print(f"Source: {res['metadata'].get('title')} ({res['metadata'].get('year', 'n.d.')})")
             print(f"Text Snippet: {res['text'][:200]}...")
             
     elif args.command == "generate":
         print("--- Mode: Generation ---")
+        from src.embedding.vector_store import VectorEngine
+        from src.retrieval.retriever import HybridRetriever
+        from src.generation.generator import RAGGenerator
         ve = VectorEngine()
         retriever = HybridRetriever(ve)
         rag = RAGGenerator()
         
         print(f"Retrieving context for topic: {args.topic}...")
-        context = retriever.retrieve(args.topic, top_k=5)
+        context = retriever.retrieve(args.topic, top_k=5, strategy=args.strategy, filters=filters_from_args(args))
         
         print("Generating Review with LLM...")
-        review = rag.generate_review(args.topic, context)
+        on_token = (lambda piece: print(piece, end="", flush=True)) if args.stream else None
+        review = rag.generate_review(args.topic, context, on_token=on_token)
         
         output_path = os.path.join(Config.OUTPUT_DIR, "literature_review.md")
         with open(output_path, "w", encoding="utf-8") as f:
             f.write(f"# Literature Review: {args.topic}\\n\\n")
             f.write(review)
             
+        if args.stream:
+            print()
+        else:
+            print("\n--- Preview ---")
+            print(review[:500] + "...")
         print(f"Review saved to: {output_path}")
-        print("\n--- Preview ---")
-        print(review[:500] + "...")
+        last = rag.llm.calls[-1] if rag.llm.calls else None
+        if last:
+            print(f"LLM latency: first token {last['ttft']:.2f}s, total {last['total']:.2f}s")
+        
+    elif args.command == "warmup":
+        print("--- Mode: Warm-up ---")
+        from src.models.registry import warm_up
+        for model, seconds in warm_up().items():
+            print(f"{model}: {seconds:.2f}s")
+        
+    elif args.command == "serve":
+        print("--- Mode: Service ---")
+        from src.service.server import serve
+        serve(args.host, args.port)
         
     elif args.command == "evaluate":
         print("--- Mode: Evaluation ---")
-        from src.evaluation.evaluator import Evaluator
-        from src.generation.generator import LLMClient
+        from src.embedding.vector_store import VectorEngine
+        from src.retrieval.retriever import HybridRetriever
         ve = VectorEngine()
         retriever = HybridRetriever(ve)
-        llm = LLMClient()
+        
+        if args.queries:
+            from src.evaluation.batch import BatchEvaluator, load_query_set
+            queries = load_query_set(args.queries, args.qrels)
+            evaluator = BatchEvaluator(retriever, ks=args.k, key=args.key, workers=args.workers)
+            report = evaluator.run(queries, args.strategies)
+            print("\n" + BatchEvaluator.format_report(report))
+            
+            name = os.path.splitext(os.path.basename(args.queries))[0]
+            output_path = args.output or os.path.join(Config.OUTPUT_DIR, f"evaluation_{name}.json")
+            with open(output_path, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+            print(f"\nReport saved: {output_path}")
+            return
+        
+        from src.generation.generator import RAGGenerator
+        from src.evaluation.judge import JudgeRunner
         
         print(f"Evaluating Query: {args.query}")
         
@@ -125,49 +228,75 @@ def main():
         response = rag.generate_review(args.query, context)
         print("Generated response.")
         
+        # 3. Judge
+        verdict = JudgeRunner().judge(args.query, response, context)
+        faith_result, rel_result = verdict["faithfulness"], verdict["relevance"]
+        
+        print(f"\nFaithfulness Score: {faith_result['score']}/5")
+        print(f"Reasoning: {faith_result['reasoning'][:200]}...")
         print(f"\nRelevance Score:    {rel_result['score']}/5")
         print(f"Reasoning: {rel_result['reasoning'][:200]}...")
         
-def run_interactive_pipeline(topic: str, retrieval_strategy: str):
-    """Executes the pipeline with the chosen parameters."""
+    elif args.command == "judge":
+        print("--- Mode: Judge ---")
+        from src.evaluation.judge import JudgeRunner, load_triples
+        triples = load_triples(args.input)
+        judge = JudgeRunner(workers=args.workers, context_tokens=args.context_tokens,
+                            combined=not args.separate, use_cache=not args.no_cache)
+        print(f"Judging {len(triples)} answers with {judge.workers} workers...")
+        verdicts = judge.judge_many(triples)
+        
+        name = os.path.splitext(os.path.basename(args.input))[0]
+        output_path = args.output or os.path.join(Config.OUTPUT_DIR, f"judgments_{name}.jsonl")
+        with open(output_path, "w", encoding="utf-8") as f:
+            for triple, verdict in zip(triples, verdicts):
+                f.write(json.dumps(dict(verdict, id=triple["id"])) + "\n")
+        
+        stats, summary = judge.stats(), JudgeRunner.summarize(verdicts)
+        print(f"{stats['judgments']} judgments in {stats['seconds']:.1f}s ({stats['judgments_per_min']:.1f}/min): "
+              f"{stats['llm_calls']} LLM calls, {stats['cache_hits']} cached, {stats['failed']} unparsed.")
+        if summary["scored"]:
+            print(f"Faithfulness: {summary['faithfulness']:.2f}/5  Relevance: {summary['relevance']:.2f}/5  "
+                  f"Accuracy: {summary['accuracy']:.0%}")
+        print(f"Verdicts saved: {output_path}")
+        
+    elif args.command == "run_all":
+        print("--- Mode: Full Pipeline ---")
+        run_pipeline(args.query, args.strategy, max_papers=args.max)
+        
+def run_pipeline(topic: str, retrieval_strategy: str, max_papers: int = 3):
+    """Ingest -> Index -> Retrieve & Generate -> Evaluate for one topic (`run_all` and menu option 1)."""
     print(f"\n--- Running Pipeline: {topic} (Strategy: {retrieval_strategy}) ---")
+    from src.ingestion.ingestor import ArxivIngestor
+    from src.embedding.vector_store import VectorEngine
+    from src.indexing.indexer import IncrementalIndexer
+    from src.retrieval.retriever import HybridRetriever
+    from src.generation.generator import RAGGenerator
+    from src.evaluation.judge import JudgeRunner
+    Config.ensure_dirs()
     
     # 1. Ingest
     print(f"\n[1/4] Ingesting papers...")
-    ingestor = ArxivIngestor(max_results=3)
+    ingestor = ArxivIngestor(max_results=max_papers)
     papers = ingestor.search_and_download(topic)
     
     # 2. Index
     print(f"\n[2/4] Indexing...")
-    processor = PDFProcessor()
-    chunker = Chunker()
     ve = VectorEngine()
-    ve.reset_collection()
-    
-    pdf_files = glob.glob(os.path.join(Config.PAPERS_DIR, "*.pdf"))
-    for filepath in pdf_files:
-        try:
-            text = processor.parse_pdf(filepath)
-            metadata = {"filepath": filepath, "title": os.path.basename(filepath)}
-            chunks = chunker.chunk_text(text, metadata)
-            ve.add_chunks(chunks)
-        except Exception as e:
-            print(f"Index Error: {e}")
+    IncrementalIndexer(ve).run()
             
     # 3. Retrieve & Generate
     print(f"\n[3/4] Retrieving & Generating...")
-    from src.evaluation.evaluator import Evaluator
-    from src.generation.generator import LLMClient
-    
     retriever = HybridRetriever(ve)
     rag = RAGGenerator()
-    llm = LLMClient()
     
     context = retriever.retrieve(topic, top_k=5, strategy=retrieval_strategy)
     
     print("Refining context...")
     refined_context = rag.refine_contexts(topic, context)
-    review = rag.generate_review(topic, refined_context)
+    print("\n--- Review ---")
+    review = rag.generate_review(topic, refined_context, on_token=lambda piece: print(piece, end="", flush=True))
+    print()
     
     output_path = os.path.join(Config.OUTPUT_DIR, f"review_{topic.replace(' ', '_')}.md")
     with open(output_path, "w", encoding="utf-8") as f:
@@ -176,13 +305,17 @@ def run_interactive_pipeline(topic: str, retrieval_strategy: str):
     
     # 4. Evaluate
     print(f"\n[4/4] Evaluating...")
-    faith_result = Evaluator.evaluate_faithfulness(topic, review, context, llm)
-    rel_result = Evaluator.evaluate_relevance(topic, review, llm)
+    verdict = JudgeRunner().judge(topic, review, context)
+    faith_result, rel_result = verdict["faithfulness"], verdict["relevance"]
     
     print("\n=== Final Quality Report ===")
     print(f"Faithfulness: {faith_result['score']}/5")
     print(f"Relevance:    {rel_result['score']}/5")
     print("============================")
+
+def run_interactive_pipeline(topic: str, retrieval_strategy: str):
+    """Executes the pipeline with the chosen parameters."""
+    run_pipeline(topic, retrieval_strategy)
     input("\nPress Enter to continue...")
 
 def print_menu():
@@ -206,12 +339,11 @@ def main():
             print("\nSelect Retrieval Strategy:")
             print("1. HyDE (Best for general queries)")
             print("2. Decomposition (Best for complex/comparison queries)")
-            print("3. Standard (Fastest)")
-            strat_choice = input("Strategy (1-3): ").strip()
+            print("3. Naive vector search (Fastest)")
+            print("4. Hybrid (Vector + BM25 keywords)")
+            strat_choice = input("Strategy (1-4): ").strip()
             
-            strategy = "hyde"
-            if strat_choice == "2": strategy = "complex"
-            elif strat_choice == "3": strategy = "standard"
+            strategy = MENU_STRATEGIES.get(strat_choice, "hyde")
             
             run_interactive_pipeline(topic, strategy)
             
@@ -230,4 +362,8 @@ def main():
             print("Invalid option.")
 
 if __name__ == "__main__":
-    main()
+    # Subcommands go to the CLI, a bare `python main.py` opens the interactive menu.
+    if len(sys.argv) > 1:
+        run_cli()
+    else:
+        main()
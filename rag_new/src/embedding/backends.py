@@ -0,0 +1,566 @@
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import List, Dict, Iterator, Optional, Tuple
+import numpy as np
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from config.config import Config
+from src.models.registry import chroma_client
+
+RESULT_KEYS = ("ids", "documents", "metadatas", "distances")
+QUANTIZATIONS = ("none", "int8", "binary")
+
+
+def popcount(x: np.ndarray) -> np.ndarray:
+    """Set bits per uint8 element."""
+    if hasattr(np, "bitwise_count"): # NumPy >= 2.0
+        return np.bitwise_count(x)
+    return _POPCOUNT[x]
+
+
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def faiss_available() -> bool:
+    try:
+        import faiss
+        return True
+    except ImportError:
+        return False
+
+
+class VectorBackend(ABC):
+    """
+    Storage and search of chunk vectors behind VectorEngine.
+    Embeddings are always supplied by the caller; distances are squared L2 (Chroma's default),
+    and query results use Chroma's layout: one inner list per query under each of RESULT_KEYS.
+    """
+    name = ""
+
+    @abstractmethod
+    def upsert(self, ids: List[str], embeddings: np.ndarray, documents: List[str], metadatas: List[Dict]):
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete(self, ids: List[str]):
+        raise NotImplementedError
+
+    @abstractmethod
+    def get(self, ids: List[str]) -> Dict:
+        raise NotImplementedError
+
+    @abstractmethod
+    def count(self) -> int:
+        raise NotImplementedError
+
+    @abstractmethod
+    def page(self, limit: int, offset: int, include_embeddings: bool = False) -> Dict:
+        raise NotImplementedError
+
+    @abstractmethod
+    def query(self, embeddings: np.ndarray, n_results: int, where: Optional[Dict] = None) -> Dict:
+        raise NotImplementedError
+
+    @abstractmethod
+    def reset(self):
+        raise NotImplementedError
+
+
+class ChromaBackend(VectorBackend):
+    """Chroma's persistent HNSW collection; M and ef are applied when the collection is created."""
+    def __init__(self, collection_name: str = Config.COLLECTION_NAME, path: str = Config.DB_DIR,
+                 m: int = Config.HNSW_M, ef_construction: int = Config.HNSW_EF_CONSTRUCTION,
+                 ef_search: int = Config.HNSW_EF_SEARCH):
+        self.name = collection_name
+        self.client = chroma_client(path)
+        self.hnsw = {"hnsw:space": "l2", "hnsw:M": m, "hnsw:construction_ef": ef_construction, "hnsw:search_ef": ef_search}
+        self.collection = self._create(get=True)
+
+    def _create(self, get: bool = False):
+        create = self.client.get_or_create_collection if get else self.client.create_collection
+        return create(name=self.name, embedding_function=None, metadata=self.hnsw)
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        self.collection.upsert(ids=ids, embeddings=np.asarray(embeddings).tolist(), documents=documents, metadatas=metadatas)
+
+    def delete(self, ids):
+        self.collection.delete(ids=ids)
+
+    def get(self, ids):
+        return self.collection.get(ids=ids, include=["documents", "metadatas"])
+
+    def count(self):
+        return self.collection.count()
+
+    def page(self, limit, offset, include_embeddings=False):
+        include = ["documents", "metadatas"] + (["embeddings"] if include_embeddings else [])
+        return self.collection.get(include=include, limit=limit, offset=offset)
+
+    def query(self, embeddings, n_results, where=None):
+        return self.collection.query(query_embeddings=np.asarray(embeddings).tolist(), n_results=n_results, where=where)
+
+    def reset(self):
+        self.client.delete_collection(self.name)
+        self.collection = self._create()
+
+
+def where_sql(where: Dict) -> Tuple[str, list]:
+    """Translates a Chroma `where` clause into SQL over a JSON metadata column."""
+    comparisons = {"$eq": "=", "$ne": "!=", "$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<="}
+    clauses, params = [], []
+    for key, condition in where.items():
+        if key in ("$and", "$or"):
+            parts = [where_sql(sub) for sub in condition]
+            clauses.append("(" + f" {key[1:].upper()} ".join(sql for sql, _ in parts) + ")")
+            params.extend(p for _, sub_params in parts for p in sub_params)
+            continue
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        for op, value in condition.items():
+            field = "json_extract(metadata, ?)"
+            params.append(f'$."{key}"')
+            if op in ("$in", "$nin"):
+                clauses.append(f"{field} {'IN' if op == '$in' else 'NOT IN'} ({', '.join('?' * len(value))})")
+                params.extend(value)
+            elif op in comparisons:
+                clauses.append(f"{field} {comparisons[op]} ?")
+                params.append(value)
+            else:
+                raise ValueError(f"Unsupported where operator: {op}")
+    return " AND ".join(clauses) or "1", params
+
+
+class LocalBackend(VectorBackend):
+    """
+    In-process index over a memory-mapped float32 matrix (vectors.f32, one row per chunk), with chunk
+    text and metadata in SQLite next to it.
+
+    index_type:
+      "flat": exact search with NumPy, no extra dependency.
+      "hnsw": FAISS HNSW graph (m, ef_construction at build, ef_search at query time).
+      "ivf":  FAISS inverted lists (nlist at build, nprobe at query time), with product quantization
+              into pq_m sub-vectors of up to 8 bits when pq_m > 0 (pq_m must divide the dimension);
+              PQ candidates (rescore x k of them) are rescored exactly against the float matrix.
+    Without faiss installed, "hnsw" and "ivf" fall back to "flat" with a warning.
+    The ANN index is rebuilt from the matrix on the first query after the data changed, and saved.
+    Filtered queries only scan the rows matching the `where` clause.
+
+    quantization ("none", "int8", "binary") applies to the scans of flat and filtered queries: they
+    read a compact copy of the matrix instead (codes.i8 + scales.f32: one int8 per dimension and a
+    scale per row, 4x smaller; or codes.b1: one sign bit per dimension, 32x smaller, compared by
+    Hamming distance), and only the rescore x k best candidates are rescored against the float rows.
+    The float matrix stays on disk for that, and only the shortlisted rows are read from it.
+    It applies to the ANN index too, which then holds codes instead of float32 vectors: 8-bit
+    scalar quantization (IndexHNSWSQ, IndexIVFScalarQuantizer) for "int8", and a Hamming index
+    over the sign bits (IndexBinaryHNSW, IndexBinaryIVF) for "binary"; its candidates are rescored
+    the same way. With pq_m > 0, IVF-PQ codes are used whatever the quantization.
+    """
+    def __init__(self, collection_name: str = Config.COLLECTION_NAME, path: str = Config.LOCAL_INDEX_DIR,
+                 index_type: str = Config.LOCAL_INDEX_TYPE, m: int = Config.HNSW_M,
+                 ef_construction: int = Config.HNSW_EF_CONSTRUCTION, ef_search: int = Config.HNSW_EF_SEARCH,
+                 nlist: int = Config.IVF_NLIST, nprobe: int = Config.IVF_NPROBE, pq_m: int = Config.PQ_M,
+                 quantization: str = Config.VECTOR_QUANTIZATION, rescore: int = Config.RESCORE_FACTOR,
+                 min_ann_rows: int = 1024):
+        if index_type not in ("flat", "hnsw", "ivf"):
+            raise ValueError(f"Unknown local index type: {index_type}")
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f"Unknown quantization: {quantization}")
+        if index_type != "flat" and not faiss_available():
+            print(f"Warning: index type '{index_type}' needs faiss-cpu, which is not installed; using exact 'flat' search.")
+            index_type = "flat"
+        self.name = collection_name
+        self.dir = os.path.join(path, collection_name)
+        self.index_type = index_type
+        self.m, self.ef_construction, self.ef_search = m, ef_construction, ef_search
+        self.nlist, self.nprobe, self.pq_m = nlist, nprobe, pq_m
+        self.quantization, self.rescore = quantization, rescore
+        self.min_ann_rows = min_ann_rows # below this, exact search is as fast as an ANN index
+        self.lock = threading.RLock()
+        self._open()
+
+    # --- storage -------------------------------------------------------------------------------
+
+    def _open(self):
+        os.makedirs(self.dir, exist_ok=True)
+        self.vectors_path = os.path.join(self.dir, "vectors.f32")
+        self.conn = sqlite3.connect(os.path.join(self.dir, "store.sqlite3"), check_same_thread=False)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS chunks (id TEXT PRIMARY KEY, row INTEGER UNIQUE, document TEXT, metadata TEXT);
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+        """)
+        meta = dict(self.conn.execute("SELECT key, value FROM meta").fetchall())
+        self.dim = int(meta["dim"]) if "dim" in meta else None
+        self.capacity = int(meta.get("capacity", 0))
+        self.generation = int(meta.get("generation", 0))
+        used = {row for (row,) in self.conn.execute("SELECT row FROM chunks")}
+        self.next_row = max(used) + 1 if used else 0
+        self.free = sorted(set(range(self.next_row)) - used, reverse=True)
+        self.vectors = self.codes = self.scales = None
+        if self.dim:
+            self._map(self.capacity)
+        self._live_rows = None # (generation, sorted row array)
+        self._norms = None # (generation, of codes?, squared norm per row)
+        self._ann = None # (generation, faiss index, row of each ANN position)
+        if self.dim and meta.get("quantization", "none") != self.quantization:
+            # Quantization switched on (or changed) for an existing store: encode what's there.
+            rows = self.live_rows()
+            for start in range(0, len(rows), 65536):
+                self._encode(rows[start:start + 65536], self._gather(rows[start:start + 65536]))
+            self._save_meta()
+            self.conn.commit()
+
+    @staticmethod
+    def _memmap(path: str, dtype, shape: Tuple[int, ...]) -> np.memmap:
+        size = int(np.prod(shape)) * np.dtype(dtype).itemsize
+        with open(path, "ab") as f:
+            if f.tell() < size:
+                f.truncate(size)
+        return np.memmap(path, dtype=dtype, mode="r+", shape=shape)
+
+    def _map(self, capacity: int):
+        self.vectors = self._memmap(self.vectors_path, np.float32, (capacity, self.dim))
+        if self.quantization == "int8":
+            self.codes = self._memmap(os.path.join(self.dir, "codes.i8"), np.int8, (capacity, self.dim))
+            self.scales = self._memmap(os.path.join(self.dir, "scales.f32"), np.float32, (capacity,))
+        elif self.quantization == "binary":
+            self.codes = self._memmap(os.path.join(self.dir, "codes.b1"), np.uint8, (capacity, (self.dim + 7) // 8))
+        self.capacity = capacity
+
+    def _encode(self, rows: np.ndarray, vectors: np.ndarray):
+        """Writes the quantized codes of `vectors` into `rows`."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if self.quantization == "int8":
+            scales = np.abs(vectors).max(axis=1) / 127
+            scales[scales == 0] = 1
+            self.codes[rows] = np.round(vectors / scales[:, None]).astype(np.int8)
+            self.scales[rows] = scales
+        elif self.quantization == "binary":
+            self.codes[rows] = np.packbits(vectors > 0, axis=1)
+
+    def _save_meta(self):
+        self.conn.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                              [("dim", str(self.dim)), ("capacity", str(self.capacity)), ("generation", str(self.generation)),
+                               ("quantization", self.quantization)])
+
+    def _allocate(self) -> int:
+        if self.free:
+            return self.free.pop()
+        if self.next_row >= self.capacity:
+            self._map(max(1024, self.capacity * 2))
+        self.next_row += 1
+        return self.next_row - 1
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        last = {doc_id: i for i, doc_id in enumerate(ids)}
+        if len(last) < len(ids): # an id repeated within the batch: its last entry wins, in a single row
+            keep = sorted(last.values())
+            ids, embeddings = [ids[i] for i in keep], embeddings[keep]
+            documents, metadatas = [documents[i] for i in keep], [metadatas[i] for i in keep]
+        with self.lock:
+            if self.dim is None:
+                self.dim = embeddings.shape[1]
+                self._map(1024)
+            existing = dict(self._rows_of(ids))
+            records = []
+            for doc_id, vector, document, metadata in zip(ids, embeddings, documents, metadatas):
+                row = existing.get(doc_id)
+                if row is None:
+                    row = self._allocate()
+                self.vectors[row] = vector
+                records.append((doc_id, row, document, json.dumps(metadata or {})))
+            if self.codes is not None:
+                self._encode(np.array([r[1] for r in records], dtype=np.int64), embeddings[:len(records)])
+                self.codes.flush()
+            self.vectors.flush()
+            self.conn.executemany("INSERT OR REPLACE INTO chunks (id, row, document, metadata) VALUES (?, ?, ?, ?)", records)
+            self.generation += 1
+            self._save_meta()
+            self.conn.commit()
+
+    def _rows_of(self, ids: List[str]) -> List[Tuple[str, int]]:
+        pairs = []
+        for start in range(0, len(ids), 900): # SQLite's bound-parameter limit
+            batch = ids[start:start + 900]
+            pairs += self.conn.execute(f"SELECT id, row FROM chunks WHERE id IN ({', '.join('?' * len(batch))})", batch).fetchall()
+        return pairs
+
+    def delete(self, ids):
+        with self.lock:
+            pairs = self._rows_of(ids)
+            self.conn.executemany("DELETE FROM chunks WHERE id = ?", [(doc_id,) for doc_id, _ in pairs])
+            self.free.extend(row for _, row in pairs)
+            self.generation += 1
+            self._save_meta()
+            self.conn.commit()
+
+    def _records(self, sql: str, params: list) -> Dict:
+        rows = self.conn.execute(sql, params).fetchall()
+        return {"ids": [r[0] for r in rows], "documents": [r[1] for r in rows], "metadatas": [json.loads(r[2]) for r in rows]}
+
+    def get(self, ids):
+        with self.lock:
+            found = {"ids": [], "documents": [], "metadatas": []}
+            for start in range(0, len(ids), 900):
+                batch = ids[start:start + 900]
+                part = self._records(f"SELECT id, document, metadata FROM chunks WHERE id IN ({', '.join('?' * len(batch))})", batch)
+                for key in found:
+                    found[key] += part[key]
+            return found
+
+    def count(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def page(self, limit, offset, include_embeddings=False):
+        with self.lock:
+            if not include_embeddings:
+                return self._records("SELECT id, document, metadata FROM chunks ORDER BY row LIMIT ? OFFSET ?", [limit, offset])
+            rows = self.conn.execute("SELECT id, document, metadata, row FROM chunks ORDER BY row LIMIT ? OFFSET ?",
+                                     [limit, offset]).fetchall()
+            return {"ids": [r[0] for r in rows], "documents": [r[1] for r in rows], "metadatas": [json.loads(r[2]) for r in rows],
+                    "embeddings": np.array(self.vectors[[r[3] for r in rows]]) if rows else np.empty((0, self.dim or 0), np.float32)}
+
+    def reset(self):
+        with self.lock:
+            self.conn.close()
+            shutil.rmtree(self.dir, ignore_errors=True)
+            self._open()
+
+    # --- search --------------------------------------------------------------------------------
+
+    def live_rows(self) -> np.ndarray:
+        with self.lock:
+            if self._live_rows is None or self._live_rows[0] != self.generation:
+                rows = np.array([row for (row,) in self.conn.execute("SELECT row FROM chunks ORDER BY row")], dtype=np.int64)
+                self._live_rows = (self.generation, rows)
+            return self._live_rows[1]
+
+    def _squared_norms(self, codes: bool = False) -> np.ndarray:
+        """Squared norm per row of the float vectors (or of the dequantized int8 codes), cached per data version."""
+        with self.lock:
+            if self._norms is None or self._norms[:2] != (self.generation, codes):
+                rows = self.live_rows()
+                norms = np.zeros(self.capacity, dtype=np.float32)
+                for start in range(0, len(rows), 65536):
+                    block_rows = rows[start:start + 65536]
+                    if codes:
+                        x = np.asarray(self._gather_codes(block_rows), dtype=np.float32) * self.scales[block_rows][:, None]
+                    else:
+                        x = np.asarray(self._gather(block_rows))
+                    norms[block_rows] = (x ** 2).sum(axis=1)
+                self._norms = (self.generation, codes, norms)
+            return self._norms[2]
+
+    def _gather(self, rows: np.ndarray) -> np.ndarray:
+        """Vectors of `rows`; a run of consecutive rows is a slice of the memmap, not a copy."""
+        if len(rows) and rows[-1] - rows[0] + 1 == len(rows):
+            return self.vectors[rows[0]:rows[-1] + 1]
+        return self.vectors[rows]
+
+    @staticmethod
+    def _top_k(n_queries: int, rows: np.ndarray, k: int, distances, block: int):
+        """Top-k rows by `distances(block_rows)` (n_queries x len(block_rows)), scanning `rows` block by block."""
+        best_rows = np.empty((n_queries, 0), dtype=np.int64)
+        best_dist = np.empty((n_queries, 0), dtype=np.float32)
+        for start in range(0, len(rows), block):
+            block_rows = rows[start:start + block]
+            dist = distances(block_rows)
+            cand_rows = np.concatenate([best_rows, np.broadcast_to(block_rows, (n_queries, len(block_rows)))], axis=1)
+            cand_dist = np.concatenate([best_dist, dist.astype(np.float32)], axis=1)
+            keep = min(k, cand_dist.shape[1])
+            top = np.argpartition(cand_dist, keep - 1, axis=1)[:, :keep]
+            best_rows = np.take_along_axis(cand_rows, top, axis=1)
+            best_dist = np.take_along_axis(cand_dist, top, axis=1)
+        order = np.argsort(best_dist, axis=1)
+        return np.take_along_axis(best_rows, order, axis=1), np.take_along_axis(best_dist, order, axis=1)
+
+    def _exact(self, queries: np.ndarray, rows: np.ndarray, k: int):
+        """Top-k rows by squared L2 distance to the float vectors."""
+        q_norms = (queries ** 2).sum(axis=1)[:, None]
+        norms = self._squared_norms()
+        def distances(block_rows):
+            return q_norms - 2 * queries @ np.asarray(self._gather(block_rows)).T + norms[block_rows][None, :]
+        found, dist = self._top_k(len(queries), rows, k, distances, block=65536)
+        return found, np.maximum(dist, 0)
+
+    def _quantized(self, queries: np.ndarray, rows: np.ndarray, k: int):
+        """Top-k rows by approximate distance to the quantized codes (ranking only, not L2 values)."""
+        if self.quantization == "int8":
+            norms = self._squared_norms(codes=True)
+            def distances(block_rows):
+                x = np.asarray(self._gather_codes(block_rows), dtype=np.float32)
+                # |q - x|^2 without the |q|^2 term, which doesn't change the ranking
+                return norms[block_rows][None, :] - 2 * (queries @ x.T) * self.scales[block_rows]
+        else:
+            query_bits = np.packbits(queries > 0, axis=1)
+            def distances(block_rows):
+                x = np.asarray(self._gather_codes(block_rows))
+                return popcount(query_bits[:, None, :] ^ x[None, :, :]).sum(axis=2, dtype=np.float32)
+        # small blocks: the float32 copy of each block of codes stays in cache
+        return self._top_k(len(queries), rows, k, distances, block=4096)
+
+    def _read_rows(self, rows: np.ndarray) -> np.ndarray:
+        """
+        Float vectors of a few scattered rows, read from the file rather than through the memmap: page
+        faults on the map would pull neighbouring pages into this process's memory as well.
+        """
+        row_bytes = self.dim * 4
+        chunks = []
+        with open(self.vectors_path, "rb") as f:
+            for row in rows:
+                f.seek(int(row) * row_bytes)
+                chunks.append(f.read(row_bytes))
+        return np.frombuffer(b"".join(chunks), dtype=np.float32).reshape(len(rows), self.dim)
+
+    def _gather_codes(self, rows: np.ndarray) -> np.ndarray:
+        if len(rows) and rows[-1] - rows[0] + 1 == len(rows):
+            return self.codes[rows[0]:rows[-1] + 1]
+        return self.codes[rows]
+
+    def _scan(self, queries: np.ndarray, rows: np.ndarray, k: int):
+        """Brute-force search over `rows`: exact, or a quantized shortlist rescored on the float vectors."""
+        if self.quantization == "none":
+            return self._exact(queries, rows, k)
+        shortlist, _ = self._quantized(queries, rows, k * self.rescore)
+        return self._rescore(queries, shortlist, k)
+
+    def _ann_paths(self):
+        return os.path.join(self.dir, "ann.faiss"), os.path.join(self.dir, "ann_rows.npy"), os.path.join(self.dir, "ann.json")
+
+    def _ann_params(self) -> Dict:
+        return {"index_type": self.index_type, "m": self.m, "ef_construction": self.ef_construction,
+                "nlist": self.nlist, "pq_m": self.pq_m, "quantization": self.quantization}
+
+    def _ann_binary(self) -> bool:
+        return self.quantization == "binary" and not (self.index_type == "ivf" and self.pq_m)
+
+    def ann_index(self):
+        """Returns (faiss index, row per position), loading or rebuilding it if the data changed."""
+        import faiss
+        with self.lock:
+            if self._ann is not None and self._ann[0] == self.generation:
+                return self._ann[1], self._ann[2]
+            index_path, rows_path, info_path = self._ann_paths()
+            if os.path.exists(info_path):
+                with open(info_path, "r", encoding="utf-8") as f:
+                    info = json.load(f)
+                if info.get("generation") == self.generation and info.get("params") == self._ann_params():
+                    read = faiss.read_index_binary if self._ann_binary() else faiss.read_index
+                    self._ann = (self.generation, read(index_path), np.load(rows_path))
+                    return self._ann[1], self._ann[2]
+
+            start = time.perf_counter()
+            rows = self.live_rows()
+            nlist = max(1, min(self.nlist, len(rows) // 39)) # FAISS wants ~39 training points per list
+            if self._ann_binary():
+                # Sign bits, as the binary scan compares them: the float matrix is never loaded.
+                x = np.ascontiguousarray(self._gather_codes(rows))
+                bits = x.shape[1] * 8
+                if self.index_type == "hnsw":
+                    index = faiss.IndexBinaryHNSW(bits, self.m)
+                    index.hnsw.efConstruction = self.ef_construction
+                else:
+                    index = faiss.IndexBinaryIVF(faiss.IndexBinaryFlat(bits), bits, nlist)
+                    index.train(x)
+            else:
+                x = np.ascontiguousarray(self._gather(rows))
+                sq8 = self.quantization == "int8"
+                if self.index_type == "hnsw":
+                    index = (faiss.IndexHNSWSQ(self.dim, faiss.ScalarQuantizer.QT_8bit, self.m) if sq8
+                             else faiss.IndexHNSWFlat(self.dim, self.m))
+                    index.hnsw.efConstruction = self.ef_construction
+                else:
+                    quantizer = faiss.IndexFlatL2(self.dim)
+                    # PQ codebooks want ~39 training points per centroid too: fewer bits on small corpora
+                    nbits = int(max(1, min(8, np.log2(max(2, len(rows) // 39)))))
+                    if self.pq_m:
+                        index = faiss.IndexIVFPQ(quantizer, self.dim, nlist, self.pq_m, nbits)
+                    elif sq8:
+                        index = faiss.IndexIVFScalarQuantizer(quantizer, self.dim, nlist, faiss.ScalarQuantizer.QT_8bit)
+                    else:
+                        index = faiss.IndexIVFFlat(quantizer, self.dim, nlist)
+                index.train(x) # no-op for HNSWFlat; SQ learns its value ranges, IVF its centroids
+            index.add(x)
+            (faiss.write_index_binary if self._ann_binary() else faiss.write_index)(index, index_path)
+            np.save(rows_path, rows)
+            with open(info_path, "w", encoding="utf-8") as f:
+                json.dump({"generation": self.generation, "params": self._ann_params()}, f)
+            print(f"Built {self.index_type} index over {len(rows)} vectors in {time.perf_counter() - start:.1f}s.")
+            self._ann = (self.generation, index, rows)
+            return index, rows
+
+    def _search(self, queries: np.ndarray, k: int, where: Optional[Dict]):
+        if where:
+            sql, params = where_sql(where)
+            with self.lock:
+                rows = np.array([r for (r,) in self.conn.execute(f"SELECT row FROM chunks WHERE {sql}", params)], dtype=np.int64)
+            return self._scan(queries, rows, k) if len(rows) else (np.empty((len(queries), 0), np.int64), None)
+
+        rows = self.live_rows()
+        if self.index_type == "flat" or len(rows) < self.min_ann_rows:
+            return self._scan(queries, rows, k)
+        index, positions = self.ann_index()
+        if self.index_type == "hnsw":
+            index.hnsw.efSearch = max(self.ef_search, k)
+        else:
+            index.nprobe = self.nprobe
+        quantized = self.quantization != "none" or (self.index_type == "ivf" and self.pq_m)
+        x = np.packbits(queries > 0, axis=1) if self._ann_binary() else queries
+        dist, found = index.search(np.ascontiguousarray(x), k * self.rescore if quantized else k)
+        found = np.where(found >= 0, positions[np.maximum(found, 0)], -1)
+        return self._rescore(queries, found, k) if quantized else (found, dist)
+
+    def _rescore(self, queries: np.ndarray, candidates: np.ndarray, k: int):
+        """Exact distances for each query's candidate rows (-1 = none), keeping the k closest."""
+        valid = candidates >= 0
+        safe = np.where(valid, candidates, 0)
+        unique = np.unique(safe)
+        x = self._read_rows(unique)[np.searchsorted(unique, safe)]
+        dist = ((x - queries[:, None, :]) ** 2).sum(axis=2)
+        dist = np.where(valid, dist, np.inf)
+        order = np.argsort(dist, axis=1)[:, :k]
+        rows = np.take_along_axis(np.where(valid, candidates, -1), order, axis=1)
+        return rows, np.maximum(np.take_along_axis(dist, order, axis=1), 0)
+
+    def query(self, embeddings, n_results, where=None):
+        queries = np.asarray(embeddings, dtype=np.float32)
+        results = {key: [[] for _ in range(len(queries))] for key in RESULT_KEYS}
+        if self.dim is None or not len(queries):
+            return results
+        rows, dist = self._search(queries, n_results, where)
+        wanted = sorted({int(r) for r in rows.ravel() if r >= 0})
+        with self.lock:
+            records = {}
+            for start in range(0, len(wanted), 900):
+                batch = wanted[start:start + 900]
+                for row, doc_id, document, metadata in self.conn.execute(
+                        f"SELECT row, id, document, metadata FROM chunks WHERE row IN ({', '.join('?' * len(batch))})", batch):
+                    records[row] = (doc_id, document, json.loads(metadata))
+        for q in range(len(queries)):
+            for row, d in zip(rows[q], dist[q] if dist is not None else []):
+                if int(row) in records:
+                    doc_id, document, metadata = records[int(row)]
+                    results["ids"][q].append(doc_id)
+                    results["documents"][q].append(document)
+                    results["metadatas"][q].append(metadata)
+                    results["distances"][q].append(float(d))
+        return results
+
+
+def make_backend(kind: str = Config.VECTOR_BACKEND, collection_name: str = Config.COLLECTION_NAME,
+                 quantization: str = Config.VECTOR_QUANTIZATION) -> VectorBackend:
+    if kind == "chroma":
+        if quantization != "none":
+            raise ValueError("Quantized vector storage needs VECTOR_BACKEND = 'local' (Chroma stores float32).")
+        return ChromaBackend(collection_name)
+    if kind == "local":
+        return LocalBackend(collection_name, quantization=quantization)
+    raise ValueError(f"Unknown vector backend: {kind}")
@@ -0,0 +1,151 @@
+import atexit
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import List, Optional
+import numpy as np
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from config.config import Config
+
+
+class EmbeddingCache:
+    """
+    Disk-backed embedding cache keyed by (model, normalized text hash).
+
+    Vectors live in a memory-mapped float32 matrix (vectors.f32), one row per slot, next to a
+    uint64 fingerprint per slot (keys.u64) so a row is only trusted if it still belongs to the key.
+    The key -> slot map is kept in LRU order and evicts the least recently used entry once
+    max_entries is reached.
+    """
+    def __init__(self, model_key: str, cache_dir: str = Config.EMBEDDING_CACHE_DIR,
+                 max_entries: int = Config.EMBEDDING_CACHE_MAX_ENTRIES):
+        self.model_key = model_key
+        self.max_entries = max_entries
+        self.dir = os.path.join(cache_dir, re.sub(r"[^A-Za-z0-9._-]+", "_", model_key))
+        os.makedirs(self.dir, exist_ok=True)
+        self.index_path = os.path.join(self.dir, "index.json")
+        self.vectors_path = os.path.join(self.dir, "vectors.f32")
+        self.keys_path = os.path.join(self.dir, "keys.u64")
+
+        self.lock = threading.Lock()
+        self.slots = OrderedDict()  # key -> slot, least recently used first
+        self.free = []
+        self.dim = None
+        self.capacity = 0
+        self.vectors = None
+        self.fingerprints = None
+        self.dirty = False
+        self.hits = 0
+        self.misses = 0
+        self._load()
+        atexit.register(self.flush)
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Whitespace and Unicode form don't change the meaning of a chunk or query."""
+        return " ".join(unicodedata.normalize("NFC", text).split())
+
+    def key(self, text: str) -> str:
+        return hashlib.sha1(f"{self.model_key}\0{self.normalize(text)}".encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _fingerprint(key: str) -> int:
+        return int(key[:16], 16) or 1  # 0 marks an empty slot
+
+    def _load(self):
+        if not os.path.exists(self.index_path):
+            return
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+            self._open(index["dim"], index["capacity"])
+            self.slots = OrderedDict((key, slot) for key, slot in index["entries"])
+            used = set(self.slots.values())
+            self.free = [slot for slot in range(self.capacity) if slot not in used]
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Embedding cache at {self.dir} is unreadable ({e}); starting empty.")
+            self.slots, self.free, self.dim, self.capacity = OrderedDict(), [], None, 0
+            self.vectors = self.fingerprints = None
+
+    def _open(self, dim: int, capacity: int):
+        """(Re)maps the backing files, growing them to hold `capacity` rows."""
+        for path, row_bytes in ((self.vectors_path, dim * 4), (self.keys_path, 8)):
+            with open(path, "ab") as f:
+                if f.tell() < capacity * row_bytes:
+                    f.truncate(capacity * row_bytes)
+        self.vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r+", shape=(capacity, dim))
+        self.fingerprints = np.memmap(self.keys_path, dtype=np.uint64, mode="r+", shape=(capacity,))
+        self.free.extend(range(self.capacity, capacity))
+        self.dim, self.capacity = dim, capacity
+
+    def _allocate(self) -> int:
+        if self.free:
+            return self.free.pop()
+        if self.capacity < self.max_entries:
+            self._open(self.dim, min(self.max_entries, max(1024, self.capacity * 2)))
+            return self.free.pop()
+        _, slot = self.slots.popitem(last=False)  # evict least recently used
+        return slot
+
+    def get_many(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """Returns a vector per text, or None for a miss. Hits become most recently used."""
+        results = []
+        with self.lock:
+            for text in texts:
+                key = self.key(text)
+                slot = self.slots.get(key)
+                if slot is not None and int(self.fingerprints[slot]) == self._fingerprint(key):
+                    self.slots.move_to_end(key)
+                    self.dirty = True
+                    results.append(np.array(self.vectors[slot]))
+                    self.hits += 1
+                else:
+                    results.append(None)
+                    self.misses += 1
+        return results
+
+    def put_many(self, texts: List[str], vectors: np.ndarray):
+        if not texts or self.max_entries <= 0:
+            return
+        with self.lock:
+            if self.dim is None:
+                self._open(vectors.shape[1], min(self.max_entries, 1024))
+            for text, vector in zip(texts, vectors):
+                key = self.key(text)
+                slot = self.slots.get(key)
+                if slot is None:
+                    slot = self._allocate()
+                self.vectors[slot] = vector
+                self.fingerprints[slot] = self._fingerprint(key)
+                self.slots[key] = slot
+                self.slots.move_to_end(key)
+            self.dirty = True
+
+    def flush(self):
+        """Persists vectors and the LRU index. Called automatically at exit."""
+        with self.lock:
+            if not self.dirty or self.vectors is None:
+                return
+            self.vectors.flush()
+            self.fingerprints.flush()
+            tmp_path = self.index_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"dim": self.dim, "capacity": self.capacity, "entries": list(self.slots.items())}, f)
+            os.replace(tmp_path, self.index_path)
+            self.dirty = False
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self.slots),
+        }
@@ -1,67 +1,190 @@
-import chromadb
-from chromadb.utils import embedding_functions
 import os
 import sys
-from typing import List, Dict
+import time
+from typing import List, Dict, Optional
+import numpy as np
 
 # Add project root to sys.path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 from config.config import Config
+from src.embedding.cache import EmbeddingCache
+from src.models.registry import ModelRegistry, embedding_model
+from src.embedding.backends import VectorBackend, make_backend
+from src.tracing.tracer import span
 
-class VectorEngine:
-    def __init__(self, collection_name=Config.COLLECTION_NAME):
-        self.client = chromadb.PersistentClient(path=Config.DB_DIR)
-        
-        # Use SentenceTransformers embedding function
-        self.embedding_fn = embedding_functions.SentenceTransformerEmbeddingFunction(
-            model_name=Config.EMBEDDING_MODEL_NAME
-        )
-        
-        self.collection = self.client.get_or_create_collection(
-            name=collection_name,
-            embedding_function=self.embedding_fn
+class EmbeddingPipeline:
+    """
+    Embeds texts with an explicit batch size, thread count, device and normalization,
+    instead of leaving those to Chroma's embedding function. Keeps running throughput stats.
+    Texts found in the embedding cache skip the model entirely.
+    The model and the cache are shared process-wide through the ModelRegistry.
+    """
+    def __init__(self, model_name=Config.EMBEDDING_MODEL_NAME, batch_size=Config.EMBEDDING_BATCH_SIZE,
+                 num_threads=Config.EMBEDDING_THREADS, device=Config.EMBEDDING_DEVICE,
+                 normalize=Config.NORMALIZE_EMBEDDINGS, use_cache=Config.EMBEDDING_CACHE_ENABLED):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.num_threads = num_threads
+        self.device = device
+        self.normalize = normalize
+        self.cache = ModelRegistry.get(
+            "embedding_cache", self.signature(), lambda: EmbeddingCache(self.signature())
+        ) if use_cache else None
+        self.embedded = 0
+        self.seconds = 0.0
+
+    def signature(self) -> str:
+        """Identifies the vector space: same model with and without normalization gives different vectors."""
+        return f"{self.model_name}|normalize={self.normalize}"
+
+    @property
+    def model(self):
+        return embedding_model(self.model_name, device=self.device, num_threads=self.num_threads)
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """Returns a float32 matrix with one row per text."""
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        with span("embed") as s:
+            s.add(texts=len(texts), chars=sum(len(text) for text in texts))
+            if self.cache is None:
+                s.add(encoded=len(texts))
+                return self._encode(texts)
+
+            cached = self.cache.get_many(texts)
+            missing = list(dict.fromkeys(text for text, vector in zip(texts, cached) if vector is None))
+            s.add(cache_hits=len(texts) - sum(vector is None for vector in cached), encoded=len(missing))
+            if missing:
+                fresh = self._encode(missing)
+                self.cache.put_many(missing, fresh)
+                by_text = dict(zip(missing, fresh))
+                cached = [by_text[text] if vector is None else vector for text, vector in zip(texts, cached)]
+            return np.vstack(cached).astype(np.float32, copy=False)
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        start = time.perf_counter()
+        vectors = self.model.encode(
+            texts,
+            batch_size=self.batch_size,
+            normalize_embeddings=self.normalize,
+            convert_to_numpy=True,
+            show_progress_bar=False
         )
+        self.seconds += time.perf_counter() - start
+        self.embedded += len(texts)
+        return vectors.astype(np.float32, copy=False)
+
+    def throughput(self) -> float:
+        """Embeddings per second over everything the model embedded so far."""
+        return self.embedded / self.seconds if self.seconds else 0.0
+
+    def cache_stats(self) -> Dict:
+        return self.cache.stats() if self.cache else {"hits": 0, "misses": 0, "hit_rate": 0.0, "entries": 0}
+
+    def flush(self):
+        if self.cache:
+            self.cache.flush()
+
+class VectorEngine:
+    """
+    Chunk storage and semantic search. Vectors are stored and searched by a backend
+    (Config.VECTOR_BACKEND: Chroma, or a local memory-mapped index, see src.embedding.backends).
+    quantization="int8" / "binary" (local backend only) searches compact codes of the vectors and
+    rescores the shortlist on the float32 vectors, instead of scanning float32 for every query.
+    """
+    def __init__(self, collection_name=Config.COLLECTION_NAME, embedder: EmbeddingPipeline = None,
+                 backend: VectorBackend = None, quantization: str = Config.VECTOR_QUANTIZATION):
+        # Vectors are always computed by the pipeline and passed in, so the store never embeds on its own.
+        self.embedder = embedder or EmbeddingPipeline()
+        self.store = backend or make_backend(Config.VECTOR_BACKEND, collection_name, quantization)
         
     def reset_collection(self):
         """Deletes and recreates the collection."""
         try:
-            self.client.delete_collection(self.collection.name)
-            self.collection = self.client.create_collection(
-                name=self.collection.name,
-                embedding_function=self.embedding_fn
-            )
-            print(f"Collection '{self.collection.name}' reset.")
+            self.store.reset()
+            print(f"Collection '{self.store.name}' reset.")
         except Exception as e:
             print(f"Error resetting collection: {e}")
 
-    def add_chunks(self, chunks: List[Dict]):
+    def add_chunks(self, chunks: List[Dict], batch_size=Config.UPSERT_BATCH_SIZE):
         """
-        Adds chunks to the ChromaDB collection.
+        Adds chunks to the collection.
         chunks: List of specific dict format from Chunker.
+        Embeds and upserts in bounded batches so memory doesn't grow with the chunk count.
         """
         if not chunks:
             return
             
-        ids = [chunk['id'] for chunk in chunks]
-        documents = [chunk['text'] for chunk in chunks]
-        metadatas = [chunk['metadata'] for chunk in chunks]
-        
-        self.collection.upsert(
-            ids=ids,
-            documents=documents,
-            metadatas=metadatas
-        )
-        print(f"Upserted {len(chunks)} chunks to collection '{self.collection.name}'.")
+        embedded_before, seconds_before = self.embedder.embedded, self.embedder.seconds
+        with span("upsert", backend=self.store.name) as s:
+            s.add(chunks=len(chunks))
+            for start in range(0, len(chunks), batch_size):
+                batch = chunks[start:start + batch_size]
+                documents = [chunk['text'] for chunk in batch]
+                embeddings = self.embedder.embed(documents)
+                with span("write", rows=len(batch)):
+                    self.store.upsert(
+                        ids=[chunk['id'] for chunk in batch],
+                        embeddings=embeddings,
+                        documents=documents,
+                        metadatas=[chunk['metadata'] for chunk in batch]
+                    )
+        seconds = self.embedder.seconds - seconds_before
+        rate = (self.embedder.embedded - embedded_before) / seconds if seconds else 0.0
+        print(f"Upserted {len(chunks)} chunks to collection '{self.store.name}' ({rate:.1f} embeddings/sec).")
+
+    def delete_chunks(self, ids: List[str]):
+        """Removes chunks from the collection by ID."""
+        if not ids:
+            return
+        self.store.delete(ids)
+        print(f"Deleted {len(ids)} chunks from collection '{self.store.name}'.")
+
+    def count(self) -> int:
+        """Number of chunks currently stored in the collection."""
+        return self.store.count()
+
+    def get_chunks(self, ids: List[str]) -> List[Dict]:
+        """Fetches stored chunks by ID, in the order requested (unknown IDs are skipped)."""
+        if not ids:
+            return []
+        results = self.store.get(ids)
+        found = {
+            doc_id: {"id": doc_id, "text": text, "metadata": meta}
+            for doc_id, text, meta in zip(results['ids'], results['documents'], results['metadatas'])
+        }
+        return [found[doc_id] for doc_id in ids if doc_id in found]
+
+    def iter_documents(self, batch_size=Config.UPSERT_BATCH_SIZE * 4):
+        """Yields (id, text, metadata) for every stored chunk, paging through the collection."""
+        offset = 0
+        while True:
+            results = self.store.page(batch_size, offset)
+            if not results['ids']:
+                break
+            yield from zip(results['ids'], results['documents'], results['metadatas'])
+            offset += len(results['ids'])
         
-    def query(self, query_text: str, n_results=Config.TOP_K):
+    def query(self, query_text: str, n_results=Config.TOP_K, where: Optional[Dict] = None):
         """
         Performs semantic search.
+        where: Chroma-style metadata clause (see src.retrieval.filters.chroma_where), applied by the store.
         """
-        results = self.collection.query(
-            query_texts=[query_text],
-            n_results=n_results
-        )
-        return results
+        return self.query_many([query_text], n_results=n_results, where=where)
+
+    def query_many(self, query_texts: List[str], n_results=Config.TOP_K, where: Optional[Dict] = None):
+        """
+        Searches several queries at once: one batched embedding call and one search round trip.
+        Results keep Chroma's layout, with one inner list per query.
+        With a `where` clause only the matching chunks are scanned.
+        """
+        with span("vector_search", backend=self.store.name, filtered=bool(where)) as s:
+            s.add(queries=len(query_texts))
+            embeddings = self.embedder.embed(query_texts)
+            with span("search"):
+                results = self.store.query(embeddings, n_results=n_results, where=where)
+            s.add(results=sum(len(ids) for ids in results['ids']))
+            return results
 
 if __name__ == "__main__":
     ve = VectorEngine()
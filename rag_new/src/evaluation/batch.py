@@ -0,0 +1,148 @@
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Optional
+import numpy as np
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from config.config import Config
+from src.evaluation.evaluator import Evaluator
+from src.evaluation.metrics import cutoffs, evaluate_rankings
+from src.tracing.tracer import span
+
+METRICS = ["hit", "recall", "precision", "ndcg", "mrr", "map"]
+
+
+def read_records(path: str) -> List[Dict]:
+    """Records from a JSON list or a JSONL file (one object per line)."""
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+    if text.lstrip().startswith("["):
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+def load_query_set(path: str, qrels_path: Optional[str] = None) -> List[Dict]:
+    """
+    Reads a query set as [{"id", "query", "qrels": {doc_id: grade}, "filters"}].
+    path: JSON list or JSONL of {"id"?, "query", "relevant"?: [doc_id, ...] or {doc_id: grade}, "filters"?}.
+    qrels_path: TREC qrels ("query_id 0 doc_id grade" per line), added to the queries' own judgments.
+    Queries without any judgment are dropped, since no metric can be computed for them.
+    """
+    entries = read_records(path)
+    queries = []
+    for i, entry in enumerate(entries):
+        relevant = entry.get("relevant") or {}
+        qrels = {doc_id: 1.0 for doc_id in relevant} if isinstance(relevant, list) else {k: float(v) for k, v in relevant.items()}
+        queries.append({"id": str(entry.get("id", i)), "query": entry["query"], "qrels": qrels, "filters": entry.get("filters")})
+
+    if qrels_path:
+        by_id = {q["id"]: q for q in queries}
+        with open(qrels_path, "r", encoding="utf-8") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 4 and parts[0] in by_id:
+                    by_id[parts[0]]["qrels"][parts[2]] = float(parts[3])
+
+    judged = [q for q in queries if any(grade > 0 for grade in q["qrels"].values())]
+    if len(judged) < len(queries):
+        print(f"Skipping {len(queries) - len(judged)} queries without relevant documents.")
+    return judged
+
+
+def latency_summary(seconds: List[float]) -> Dict:
+    if not seconds:
+        return {"count": 0}
+    p50, p95, p99 = np.percentile(np.asarray(seconds) * 1000, [50, 95, 99])
+    return {"count": len(seconds), "mean_ms": float(np.mean(seconds) * 1000),
+            "p50_ms": float(p50), "p95_ms": float(p95), "p99_ms": float(p99)}
+
+
+class BatchEvaluator:
+    """
+    Runs every query of a query set through HybridRetriever.retrieve for each strategy, timing
+    each call, and scores all rankings at once with src.evaluation.metrics (every metric at
+    every cutoff in ks).
+    key: what the qrels IDs are, 'id' (chunk IDs) or a metadata field such as 'paper_id'; a
+    paper then counts once, at the rank of its best chunk.
+    With workers > 1 queries run concurrently and, as in the service, share embedding and
+    cross-encoder forward passes; per-query latency then includes that queueing.
+    """
+    def __init__(self, retriever, ks: List[int] = Config.EVAL_KS, key: str = "id", workers: int = Config.EVAL_WORKERS):
+        self.retriever = retriever
+        self.ks = cutoffs(ks)
+        self.key = key
+        self.workers = max(1, workers)
+        # Chunk-level metrics need max(ks) chunks; paper-level ones take the whole reranked window,
+        # which costs nothing extra since the cross-encoder scores all of it anyway.
+        self.depth = self.ks[-1] if key == "id" else max(self.ks[-1], Config.RETRIEVAL_WINDOW_SIZE)
+        if self.workers > 1:
+            self._share_forward_passes()
+
+    @staticmethod
+    def _share_forward_passes():
+        from src.models.registry import ModelRegistry, embedding_model, cross_encoder
+        from src.service.batching import BatchedModel
+        for kind, model, method, name in (("embedding", embedding_model(), "encode", Config.EMBEDDING_MODEL_NAME),
+                                          ("cross_encoder", cross_encoder(), "predict", Config.CROSS_ENCODER_MODEL)):
+            if not isinstance(model, BatchedModel):
+                ModelRegistry.register(kind, name, BatchedModel(model, method))
+
+    def _run_query(self, query: Dict, strategy: str, parent) -> Dict:
+        start = time.perf_counter()
+        try:
+            with span("query", parent=parent, query_id=query["id"]):
+                chunks = self.retriever.retrieve(query["query"], top_k=self.depth, strategy=strategy, filters=query["filters"])
+            error = None
+        except Exception as e:
+            chunks, error = [], str(e)
+        return {"id": query["id"], "seconds": time.perf_counter() - start, "error": error,
+                "ranking": Evaluator._retrieved_ids(chunks, self.key)}
+
+    def run_strategy(self, queries: List[Dict], strategy: str) -> Dict:
+        with span("evaluate", strategy=strategy, queries=len(queries)) as s:
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                results = list(pool.map(lambda query: self._run_query(query, strategy, s), queries))
+            wall = time.perf_counter() - start
+
+        errors = [r for r in results if r["error"]]
+        for r in errors[:3]:
+            print(f"Query {r['id']} failed: {r['error']}")
+        return {
+            "strategy": strategy,
+            "queries": len(queries),
+            "errors": len(errors),
+            "wall_seconds": wall,
+            "qps": len(queries) / wall if wall else 0.0,
+            "latency": latency_summary([r["seconds"] for r in results]),
+            "metrics": evaluate_rankings([r["ranking"] for r in results], [q["qrels"] for q in queries], self.ks),
+            "per_query": [{"id": r["id"], "latency_ms": r["seconds"] * 1000, "ranking": r["ranking"][:self.ks[-1]],
+                           "error": r["error"]} for r in results],
+        }
+
+    def run(self, queries: List[Dict], strategies: List[str]) -> Dict:
+        report = {"ks": self.ks, "key": self.key, "workers": self.workers, "queries": len(queries), "strategies": {}}
+        for strategy in strategies:
+            print(f"Evaluating '{strategy}' on {len(queries)} queries...")
+            report["strategies"][strategy] = self.run_strategy(queries, strategy)
+        return report
+
+    @staticmethod
+    def format_report(report: Dict) -> str:
+        ks = report["ks"]
+        lines = [f"{'strategy':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'qps':>7} {'errors':>6}"]
+        for name, result in report["strategies"].items():
+            lat = result["latency"]
+            lines.append(f"{name:>9} {lat.get('p50_ms', 0):>8.1f} {lat.get('p95_ms', 0):>8.1f} {lat.get('p99_ms', 0):>8.1f} "
+                         f"{result['qps']:>7.2f} {result['errors']:>6}")
+        lines.append("")
+        lines.append(f"{'strategy':>9} {'metric':>9} " + " ".join(f"{'@' + str(k):>7}" for k in ks))
+        for name, result in report["strategies"].items():
+            for i, metric in enumerate(METRICS):
+                values = " ".join(f"{result['metrics'][f'{metric}@{k}']:>7.3f}" for k in ks)
+                lines.append(f"{name if i == 0 else '':>9} {metric:>9} {values}")
+        return "\n".join(lines)
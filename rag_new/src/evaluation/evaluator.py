@@ -1,49 +1,88 @@
+import os
+import re
+import sys
 from typing import List, Dict
-import numpy as np
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from config.config import Config
+from src.evaluation.metrics import evaluate_rankings
+from src.tracing.tracer import span
+
+CHARS_PER_TOKEN = 4 # rough estimate for English text; the judge LLM's own tokenizer is not available here
+WORD_RE = re.compile(r"\w+")
+SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
 
 class Evaluator:
     @staticmethod
-    def hit_rate(retrieved_chunks_list: List[List[Dict]], relevant_ids_list: List[List[str]]) -> float:
+    def _retrieved_ids(retrieved: List[Dict], key: str) -> List[str]:
+        """
+        'id' is the chunk ID; any other key is read from the chunk metadata (e.g. 'paper_id'),
+        keeping each value once at its best rank, as several chunks of one paper can be retrieved.
+        """
+        if key == 'id':
+            return [r.get('id', '') for r in retrieved]
+        return list(dict.fromkeys(r['metadata'].get(key, '') for r in retrieved))
+
+    @staticmethod
+    def _at_depth(metric: str, retrieved_chunks_list: List[List[Dict]], relevant_ids_list: List[List[str]], key: str) -> float:
+        rankings = [Evaluator._retrieved_ids(retrieved, key) for retrieved in retrieved_chunks_list]
+        depth = max((len(ids) for ids in rankings), default=0)
+        if not depth:
+            return 0.0
+        return evaluate_rankings(rankings, relevant_ids_list, ks=[depth])[f"{metric}@{depth}"]
+
+    @staticmethod
+    def hit_rate(retrieved_chunks_list: List[List[Dict]], relevant_ids_list: List[List[str]], key: str = "id") -> float:
         """
         Calculates Hit Rate: Proportion of queries where at least one relevant document is retrieved in top-k.
-        relevant_ids_list: List of relevant document IDs (filenames or specific chunk IDs) for each query.
+        relevant_ids_list: List of relevant chunk IDs for each query (or values of metadata[key], e.g. paper IDs).
+        For several metrics or cutoffs at once, use src.evaluation.metrics.evaluate_rankings.
         """
-        hits = 0
-        for retrieved, relevant in zip(retrieved_chunks_list, relevant_ids_list):
-            # Check if any retrieved doc matches any relevant doc ID
-            # Assuming 'id' or 'filepath' in metadata can be used for matching
-            retrieved_ids = [r['metadata'].get('title', '') for r in retrieved]
-            if any(rel in retrieved_ids for rel in relevant):
-                hits += 1
-        return hits / len(retrieved_chunks_list) if retrieved_chunks_list else 0.0
+        return Evaluator._at_depth("hit", retrieved_chunks_list, relevant_ids_list, key)
 
     @staticmethod
-    def mrr(retrieved_chunks_list: List[List[Dict]], relevant_ids_list: List[List[str]]) -> float:
+    def mrr(retrieved_chunks_list: List[List[Dict]], relevant_ids_list: List[List[str]], key: str = "id") -> float:
         """
-        Calculates Mean Reciprocal Rank (MRR).
+        Calculates Mean Reciprocal Rank (MRR), matching on chunk IDs (or metadata[key]) like hit_rate.
         """
-        reciprocal_ranks = []
-        for retrieved, relevant in zip(retrieved_chunks_list, relevant_ids_list):
-            retrieved_ids = [r['metadata'].get('title', '') for r in retrieved]
-            rank = 0
-            for i, rid in enumerate(retrieved_ids):
-                if rid in relevant:
-                    rank = i + 1
-                    break
-            if rank > 0:
-                reciprocal_ranks.append(1.0 / rank)
-            else:
-                reciprocal_ranks.append(0.0)
-        return np.mean(reciprocal_ranks) if reciprocal_ranks else 0.0
+        return Evaluator._at_depth("mrr", retrieved_chunks_list, relevant_ids_list, key)
 
     @staticmethod
-    def evaluate_faithfulness(query: str, response: str, context: List[Dict], llm_client) -> Dict:
+    def fit_context(context: List, answer: str, max_tokens: int = Config.JUDGE_CONTEXT_TOKENS) -> str:
         """
-        G-Eval Faithfulness: Calculates a score (1-5) with reasoning.
-        Is the answer derived from the context?
+        Joins the chunk texts (dicts with 'text', or strings) within about max_tokens tokens
+        (~4 characters each; 0 = no limit). Longer context is compressed: the budget is split
+        evenly over the chunks (short ones pass their leftover on), and each chunk keeps the
+        sentences sharing the most words with the answer, in their original order.
         """
-        context_text = "\n".join([c['text'] for c in context])
-        prompt = f"""
+        texts = [c['text'] if isinstance(c, dict) else str(c) for c in context]
+        budget = max_tokens * CHARS_PER_TOKEN
+        if not max_tokens or sum(len(t) + 1 for t in texts) <= budget:
+            return "\n".join(texts)
+
+        answer_words = set(WORD_RE.findall(answer.lower()))
+        kept = [""] * len(texts)
+        remaining = len(texts)
+        for i in sorted(range(len(texts)), key=lambda i: len(texts[i])):
+            share = budget // remaining # each kept text costs its length plus a line break
+            remaining -= 1
+            if share < 2:
+                continue # budget spent: no room for this chunk
+            sentences = SENTENCE_RE.split(texts[i])
+            overlap = [len(answer_words & set(WORD_RE.findall(sentence.lower()))) for sentence in sentences]
+            chosen, used = [], 0
+            for j in sorted(range(len(sentences)), key=lambda j: -overlap[j]):
+                if used + len(sentences[j]) + 1 <= share:
+                    chosen.append(j)
+                    used += len(sentences[j]) + 1
+            kept[i] = " ".join(sentences[j] for j in sorted(chosen)) if chosen else texts[i][:share - 1]
+            budget -= len(kept[i]) + 1
+        return "\n".join(text for text in kept if text)
+
+    @staticmethod
+    def faithfulness_prompt(response: str, context_text: str) -> str:
+        return f"""
         You are an impartial judge evaluating a RAG system.
         Task: Evaluate the Faithfulness of the ANSWER to the provided CONTEXT.
         
@@ -66,16 +105,10 @@ class Evaluator:
         Reasoning: [Your step-by-step reasoning]
         Score: [1-5]
         """
-        eval_output = llm_client.generate(prompt).strip()
-        return Evaluator._parse_geval_output(eval_output)
 
     @staticmethod
-    def evaluate_relevance(query: str, response: str, llm_client) -> Dict:
-        """
-        G-Eval Relevance: Calculates a score (1-5) with reasoning.
-        Does the answer address the query?
-        """
-        prompt = f"""
+    def relevance_prompt(query: str, response: str) -> str:
+        return f"""
         You are an impartial judge evaluating a RAG system.
         Task: Evaluate the Relevance of the ANSWER to the QUERY.
         
@@ -98,12 +131,76 @@ class Evaluator:
         Reasoning: [Your step-by-step reasoning]
         Score: [1-5]
         """
-        eval_output = llm_client.generate(prompt).strip()
+
+    @staticmethod
+    def combined_prompt(query: str, response: str, context_text: str) -> str:
+        """Faithfulness and relevance in one call: the answer is sent (and read by the model) once."""
+        return f"""
+        You are an impartial judge evaluating a RAG system.
+        Task: Evaluate the Faithfulness of the ANSWER to the provided CONTEXT, and the Relevance of the ANSWER to the QUERY.
+        
+        QUERY:
+        {query}
+        
+        CONTEXT:
+        {context_text}
+        
+        ANSWER:
+        {response}
+        
+        INSTRUCTIONS:
+        1. Faithfulness: identify any claims in the Answer that contradict or are unsupported by the Context. Score from 1 to 5:
+           - 1: Entirely hallucinated or contradicts context.
+           - 3: Mostly supported but has minor unverified details.
+           - 5: Fully supported by context.
+        2. Relevance: determine if the Answer directly addresses the intent of the Query. Score from 1 to 5:
+           - 1: Completely irrelevant or off-topic.
+           - 3: Partially relevant but misses key aspects.
+           - 5: Highly relevant and comprehensive.
+        3. Think step by step.
+        
+        OUTPUT FORMAT:
+        Faithfulness Reasoning: [Your step-by-step reasoning]
+        Faithfulness Score: [1-5]
+        Relevance Reasoning: [Your step-by-step reasoning]
+        Relevance Score: [1-5]
+        """
+
+    @staticmethod
+    def evaluate_faithfulness(query: str, response: str, context: List[Dict], llm_client,
+                              max_context_tokens: int = Config.JUDGE_CONTEXT_TOKENS) -> Dict:
+        """
+        G-Eval Faithfulness: Calculates a score (1-5) with reasoning.
+        Is the answer derived from the context? The context is fitted to max_context_tokens (see fit_context).
+        """
+        context_text = Evaluator.fit_context(context, response, max_context_tokens)
+        with span("judge", metric="faithfulness"):
+            eval_output = llm_client.generate(Evaluator.faithfulness_prompt(response, context_text)).strip()
+        return Evaluator._parse_geval_output(eval_output)
+
+    @staticmethod
+    def evaluate_relevance(query: str, response: str, llm_client) -> Dict:
+        """
+        G-Eval Relevance: Calculates a score (1-5) with reasoning.
+        Does the answer address the query?
+        """
+        with span("judge", metric="relevance"):
+            eval_output = llm_client.generate(Evaluator.relevance_prompt(query, response)).strip()
         return Evaluator._parse_geval_output(eval_output)
 
     @staticmethod
     def _parse_geval_output(text: str) -> Dict:
-        import re
         score_match = re.search(r"Score:\s*(\d+)", text)
         score = int(score_match.group(1)) if score_match else 0
         return {"reasoning": text, "score": score}
+
+    @staticmethod
+    def _parse_combined_output(text: str) -> Dict:
+        """{"faithfulness": {...}, "relevance": {...}} from a combined_prompt reply; a missing score is 0."""
+        results = {}
+        for metric, label in (("faithfulness", "Faithfulness"), ("relevance", "Relevance")):
+            score_match = re.search(label + r"\s+Score:\s*(\d+)", text)
+            reasoning_match = re.search(label + r"\s+Reasoning:\s*(.*?)(?:" + label + r"\s+Score:|$)", text, re.S)
+            results[metric] = {"reasoning": reasoning_match.group(1).strip() if reasoning_match else text,
+                               "score": int(score_match.group(1)) if score_match else 0}
+        return results
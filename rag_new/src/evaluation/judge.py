@@ -0,0 +1,138 @@
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Optional
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from config.config import Config
+from src.evaluation.batch import read_records
+from src.evaluation.evaluator import Evaluator
+from src.generation.llm_client import LLMClient
+from src.generation.response_cache import ResponseCache
+from src.tracing.tracer import span
+
+JUDGE_VERSION = 1 # bump when the prompts or the parsing change, so cached verdicts are not reused
+
+
+def load_triples(path: str) -> List[Dict]:
+    """Reads [{"id", "query", "answer", "context": [text or {"text"}, ...]}] from JSON or JSONL."""
+    return [dict(record, id=str(record.get("id", i)), context=record.get("context") or [])
+            for i, record in enumerate(read_records(path))]
+
+
+class JudgeRunner:
+    """
+    G-Eval faithfulness and relevance for many (query, answer, context) triples at once.
+
+    - Triples are judged concurrently by a bounded pool over the shared LLM connection pool.
+    - The context is fitted to context_tokens (Evaluator.fit_context) instead of pasted whole.
+    - combined=True asks for both scores in one call, which halves the calls per triple.
+    - Verdicts are cached on disk by a hash of the content (query, answer, fitted context) and
+      the judge settings, so re-running a regression set only judges what changed.
+    """
+    def __init__(self, llm_client: Optional[LLMClient] = None, workers: int = Config.JUDGE_WORKERS,
+                 context_tokens: int = Config.JUDGE_CONTEXT_TOKENS, combined: bool = Config.JUDGE_COMBINED,
+                 use_cache: bool = Config.JUDGE_CACHE_ENABLED, cache_path: str = Config.JUDGE_CACHE_PATH):
+        # Verdicts are cached here, so the prompts themselves need not go into the LLM response cache.
+        self.llm = llm_client or LLMClient(use_cache=False)
+        self.workers = max(1, min(workers, Config.LLM_POOL_SIZE))
+        self.context_tokens = context_tokens
+        self.combined = combined
+        self.cache = ResponseCache(cache_path, ttl_seconds=0) if use_cache else None
+        self.lock = threading.Lock()
+        self.judgments = 0
+        self.llm_calls = 0
+        self.cache_hits = 0
+        self.failed = 0
+        self.seconds = 0.0
+
+    def _key(self, query: str, answer: str, context_text: str) -> str:
+        payload = json.dumps([JUDGE_VERSION, self.combined, self.llm.provider, self.llm.model, self.llm.sampling_params(),
+                              query, answer, context_text], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _ask(self, query: str, answer: str, context_text: str) -> Dict:
+        if self.combined:
+            output = self.llm.generate(Evaluator.combined_prompt(query, answer, context_text)).strip()
+            outputs = [output]
+            verdict = Evaluator._parse_combined_output(output)
+        else:
+            outputs = [o.strip() for o in self.llm.generate_many([Evaluator.faithfulness_prompt(answer, context_text),
+                                                                   Evaluator.relevance_prompt(query, answer)], max_workers=2)]
+            verdict = {"faithfulness": Evaluator._parse_geval_output(outputs[0]),
+                       "relevance": Evaluator._parse_geval_output(outputs[1])}
+        with self.lock:
+            self.llm_calls += len(outputs)
+        verdict["ok"] = not any(LLMClient._is_error(o) for o in outputs) and all(v["score"] for v in verdict.values())
+        return verdict
+
+    def judge(self, query: str, answer: str, context: List) -> Dict:
+        """
+        {"faithfulness": {"score", "reasoning"}, "relevance": {...}, "ok", "cached"}.
+        Scores are 0 when the judge's reply could not be parsed (such verdicts are not cached).
+        """
+        start = time.perf_counter()
+        verdict = self._judge(query, answer, context)
+        with self.lock:
+            self.seconds += time.perf_counter() - start
+        return verdict
+
+    def _judge(self, query: str, answer: str, context: List, parent=None) -> Dict:
+        context_text = Evaluator.fit_context(context, answer, self.context_tokens)
+        key = self._key(query, answer, context_text)
+        cached = self.cache.get(key) if self.cache else None
+        if cached is not None:
+            with self.lock:
+                self.judgments += 1
+                self.cache_hits += 1
+            return dict(json.loads(cached), cached=True)
+
+        with span("judge", parent=parent, combined=self.combined) as s:
+            s.add(context_chars=len(context_text))
+            verdict = self._ask(query, answer, context_text)
+        if self.cache and verdict["ok"]:
+            self.cache.put(key, json.dumps(verdict))
+        with self.lock:
+            self.judgments += 1
+            self.failed += not verdict["ok"]
+        return dict(verdict, cached=False)
+
+    def judge_many(self, triples: List[Dict]) -> List[Dict]:
+        """Judges [{"query", "answer", "context"}] concurrently; verdicts keep the input order."""
+        if not triples:
+            return []
+        start = time.perf_counter()
+        with span("judge_many", triples=len(triples)) as s:
+            with ThreadPoolExecutor(max_workers=min(self.workers, len(triples))) as pool:
+                verdicts = list(pool.map(lambda t: self._judge(t["query"], t["answer"], t["context"], parent=s), triples))
+        with self.lock:
+            self.seconds += time.perf_counter() - start
+        return verdicts
+
+    def stats(self) -> Dict:
+        """Counts and throughput (wall-clock judgments per minute) of every judge / judge_many call so far."""
+        with self.lock:
+            return {
+                "judgments": self.judgments,
+                "llm_calls": self.llm_calls,
+                "cache_hits": self.cache_hits,
+                "failed": self.failed,
+                "seconds": self.seconds,
+                "judgments_per_min": 60 * self.judgments / self.seconds if self.seconds else 0.0,
+            }
+
+    @staticmethod
+    def summarize(verdicts: List[Dict]) -> Dict:
+        """Mean scores over the parsed verdicts, and the README's accuracy: (faithfulness + relevance) / 10."""
+        scored = [v for v in verdicts if v["ok"]]
+        if not scored:
+            return {"scored": 0}
+        faithfulness = sum(v["faithfulness"]["score"] for v in scored) / len(scored)
+        relevance = sum(v["relevance"]["score"] for v in scored) / len(scored)
+        return {"scored": len(scored), "faithfulness": faithfulness, "relevance": relevance,
+                "accuracy": (faithfulness + relevance) / 10}
@@ -0,0 +1,80 @@
+from typing import List, Dict, Iterable
+import numpy as np
+
+
+def cutoffs(ks: Iterable[int]) -> List[int]:
+    """The distinct cutoffs, ascending; raises ValueError unless they are all positive integers."""
+    ks = sorted(set(ks))
+    if not ks or any(isinstance(k, bool) or int(k) != k or k < 1 for k in ks):
+        raise ValueError(f"Cutoffs must be positive integers, got {ks}")
+    return [int(k) for k in ks]
+
+
+def gain_matrix(retrieved: List[List[str]], qrels: List[Dict[str, float]], depth: int):
+    """
+    (gains, ideal, n_relevant) as arrays: gains[q, i] is the relevance grade of the i-th retrieved
+    ID of query q (0 if unjudged), ideal[q] the query's grades sorted best first, n_relevant[q]
+    the number of IDs with a grade > 0. Rankings shorter than depth are padded with zeros.
+    """
+    n = len(retrieved)
+    gains = np.zeros((n, depth), dtype=np.float64)
+    ideal = np.zeros((n, depth), dtype=np.float64)
+    n_relevant = np.zeros(n, dtype=np.float64)
+    for row, (ids, judged) in enumerate(zip(retrieved, qrels)):
+        if not judged:
+            continue
+        found = [judged.get(doc_id, 0.0) for doc_id in ids[:depth]]
+        gains[row, :len(found)] = found
+        grades = sorted((g for g in judged.values() if g > 0), reverse=True)
+        ideal[row, :min(depth, len(grades))] = grades[:depth]
+        n_relevant[row] = len(grades)
+    return gains, ideal, n_relevant
+
+
+def ranking_metrics(gains: np.ndarray, ideal: np.ndarray, n_relevant: np.ndarray, ks: Iterable[int]) -> Dict[str, np.ndarray]:
+    """
+    Per-query hit@k, recall@k, precision@k, nDCG@k, MRR@k and AP@k for every k in ks at once,
+    as {"hit": array (queries, len(ks)), ...}. All of them come from cumulative sums over the
+    rank axis, so the cost does not grow with the number of cutoffs.
+    nDCG uses exponential gains (2^grade - 1); a query without relevant IDs scores 0 everywhere.
+    """
+    ks = np.asarray(cutoffs(ks))
+    cols = ks - 1
+    depth = gains.shape[1]
+    ranks = np.arange(1, depth + 1, dtype=np.float64)
+    relevant = gains > 0
+    n_rel = n_relevant[:, None]
+
+    found = np.cumsum(relevant, axis=1) # relevant IDs within the top i
+    first = np.where(relevant.any(axis=1), relevant.argmax(axis=1) + 1, depth + 1)[:, None]
+    discount = 1.0 / np.log2(ranks + 1)
+    dcg = np.cumsum((np.exp2(gains) - 1) * discount, axis=1)[:, cols]
+    idcg = np.cumsum((np.exp2(ideal) - 1) * discount, axis=1)[:, cols]
+    precision_sum = np.cumsum(relevant * (found / ranks), axis=1)[:, cols] # sum of precision at each relevant rank
+    ap_norm = np.minimum(n_rel, ks)
+
+    zeros = np.zeros((len(gains), len(ks)), dtype=np.float64)
+    return {
+        "hit": (found[:, cols] > 0).astype(np.float64),
+        "recall": np.divide(found[:, cols], n_rel, out=zeros.copy(), where=n_rel > 0),
+        "precision": found[:, cols] / ks,
+        "ndcg": np.divide(dcg, idcg, out=zeros.copy(), where=idcg > 0),
+        "mrr": np.where(first <= ks, 1.0 / first, 0.0),
+        "map": np.divide(precision_sum, ap_norm, out=zeros.copy(), where=ap_norm > 0),
+    }
+
+
+def evaluate_rankings(retrieved: List[List[str]], qrels: List[Dict[str, float]], ks: Iterable[int] = (1, 3, 5, 10)) -> Dict[str, float]:
+    """
+    Mean metrics over queries, as {"hit@5": ..., "recall@10": ..., "ndcg@5": ..., "mrr@10": ..., "map@10": ...}.
+    retrieved: ranked IDs per query. qrels: {id: grade} per query (grade > 0 = relevant; a list of
+    IDs counts as grade 1 each).
+    """
+    ks = cutoffs(ks)
+    qrels = [dict.fromkeys(judged, 1.0) if isinstance(judged, (list, tuple, set)) else judged for judged in qrels]
+    per_query = ranking_metrics(*gain_matrix(retrieved, qrels, ks[-1]), ks)
+    means = {}
+    for name, values in per_query.items():
+        averages = values.mean(axis=0) if len(values) else np.zeros(len(ks))
+        means.update({f"{name}@{k}": float(avg) for k, avg in zip(ks, averages)})
+    return means
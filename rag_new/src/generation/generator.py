@@ -1,65 +1,25 @@
 import os
 import sys
-from typing import List, Dict
-import requests
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Optional, Callable
 
 # Add project root to sys.path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 from config.config import Config
-
-class LLMClient:
-    def __init__(self, provider=Config.LLM_PROVIDER):
-        self.provider = provider
-        
-    def generate(self, prompt: str) -> str:
-        if self.provider == "ollama":
-            return self._generate_ollama(prompt)
-        elif self.provider == "openai":
-            return self._generate_openai(prompt)
-        else:
-            raise ValueError(f"Unknown LLM provider: {self.provider}")
-
-    def _generate_ollama(self, prompt: str) -> str:
-        url = "http://localhost:11434/api/generate"
-        payload = {
-            "model": Config.OLLAMA_MODEL,
-            "prompt": prompt,
-            "stream": False
-        }
-        try:
-            response = requests.post(url, json=payload)
-            response.raise_for_status()
-            return response.json()['response']
-        except Exception as e:
-            return f"Error calling Ollama: {str(e)}\nEnsure Ollama is running and model '{Config.OLLAMA_MODEL}' is pulled."
-
-    def _generate_openai(self, prompt: str) -> str:
-        # Simplified OpenAI call
-        from openai import OpenAI
-        client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
-        try:
-            response = client.chat.completions.create(
-                model=Config.OPENAI_MODEL,
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.3
-            )
-            return response.choices[0].message.content
-        except Exception as e:
-            return f"Error calling OpenAI: {str(e)}"
+from src.generation.llm_client import LLMClient
+from src.tracing.tracer import span
 
 class RAGGenerator:
     def __init__(self):
         self.llm = LLMClient()
         
-    def refine_contexts(self, query: str, context_chunks: List[Dict]) -> List[Dict]:
+    def _refine_one(self, query: str, chunk: Dict, parent=None) -> Optional[Dict]:
         """
-        Refines the retrieved contexts by asking the LLM to extract relevant information.
-        This reduces noise and context window usage.
+        Returns a refined copy of the chunk, or None if the LLM judged it irrelevant. If the LLM call
+        failed, the chunk comes back as it was, not marked 'refined', so a later call retries it.
         """
-        refined_chunks = []
-        for chunk in context_chunks:
-            text = chunk['text']
-            prompt = f"""
+        text = chunk['text']
+        prompt = f"""
             You are a helpful assistant. 
             Extract only the sentences from the following text that are directly relevant to the query: "{query}"
             If the text contains no relevant information, output "IRRELEVANT".
@@ -69,20 +29,46 @@ class RAGGenerator:
             
             RELEVANT SENTENCES:
             """
-            refined_text = self.llm.generate(prompt).strip()
+        refined_text = self.llm.generate(prompt, parent=parent).strip()
+        if refined_text.startswith("Error calling"):
+            return chunk
+        
+        if "IRRELEVANT" not in refined_text and len(refined_text) > 10:
+            refined_chunk = chunk.copy()
+            refined_chunk['text'] = refined_text
+            refined_chunk['refined'] = True
+            return refined_chunk
+        return None
+
+    def refine_contexts(self, query: str, context_chunks: List[Dict], max_workers: int = Config.REFINE_CONCURRENCY) -> List[Dict]:
+        """
+        Refines the retrieved contexts by asking the LLM to extract relevant information.
+        This reduces noise and context window usage.
+        Chunks are refined concurrently (at most max_workers LLM calls in flight) and come back
+        in their original order. Chunks already marked 'refined' are passed through untouched.
+        """
+        if context_chunks and all(chunk.get('refined') for chunk in context_chunks):
+            return context_chunks
+            
+        pending = [chunk for chunk in context_chunks if not chunk.get('refined')]
+        workers = max(1, min(max_workers, len(pending)))
+        with span("refine", workers=workers) as s:
+            # Pool threads have no span of their own, so their LLM calls are traced under this one.
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(lambda chunk: self._refine_one(query, chunk, s), pending))
+            s.add(chunks=len(pending), kept=sum(result is not None for result in results))
+        outputs = iter(results)
             
-            if "IRRELEVANT" not in refined_text and len(refined_text) > 10:
-                refined_chunk = chunk.copy()
-                refined_chunk['text'] = refined_text
-                refined_chunks.append(refined_chunk)
-            else:
-                 # Keep original method if refinement fails or is too aggressive (optional fallback)
-                 # For now, we only keep if relevant.
-                 pass
+        refined_chunks = []
+        for chunk in context_chunks:
+            result = chunk if chunk.get('refined') else next(outputs)
+            if result is not None:
+                refined_chunks.append(result)
                  
         # Fallback: If refinement filters everything, return original top k
+        # (marked as refined so a later call doesn't send them to the LLM again).
         if not refined_chunks:
-            return context_chunks
+            return [dict(chunk, refined=True) for chunk in context_chunks]
             
         return refined_chunks
 
@@ -111,11 +97,22 @@ class RAGGenerator:
         """
         return prompt
         
-    def generate_review(self, query: str, context_chunks: List[Dict]) -> str:
-        print("Refining retrieved context...")
-        refined_contexts = self.refine_contexts(query, context_chunks)
-        print(f"Refined {len(context_chunks)} chunks into {len(refined_contexts)} relevant segments.")
-        
-        prompt = self.assemble_prompt(query, refined_contexts)
-        response = self.llm.generate(prompt)
-        return response
+    def generate_review(self, query: str, context_chunks: List[Dict], on_token: Optional[Callable[[str], None]] = None) -> str:
+        """
+        Writes the review. With on_token, the answer is streamed and each piece is passed to
+        on_token as it arrives (e.g. to print it live); the full text is still returned.
+        """
+        with span("generate", chunks=len(context_chunks), stream=on_token is not None):
+            refined_contexts = self.refine_contexts(query, context_chunks)
+            if refined_contexts is not context_chunks:
+                print(f"Refined {len(context_chunks)} chunks into {len(refined_contexts)} relevant segments.")
+            
+            prompt = self.assemble_prompt(query, refined_contexts)
+            if on_token is None:
+                return self.llm.generate(prompt)
+                
+            pieces = []
+            for piece in self.llm.stream(prompt):
+                on_token(piece)
+                pieces.append(piece)
+            return "".join(pieces)
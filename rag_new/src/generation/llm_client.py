@@ -0,0 +1,285 @@
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Iterator, Optional
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from config.config import Config
+from src.generation.response_cache import ResponseCache
+from src.tracing.tracer import span, current_span
+
+
+class LLMClient:
+    """
+    Thin client over Ollama / OpenAI.
+
+    HTTP connections come from one pooled requests.Session per process (with retries and backoff
+    on connection errors and 429/5xx, never after a read timeout), and the OpenAI client is created once and reused.
+    Every call records its time-to-first-token and total latency in `calls`.
+    Responses are kept in a persistent cache keyed by provider, model, prompt and sampling
+    parameters, so repeated HyDE, decomposition, refinement and judge prompts skip the model.
+    Failures are returned as an "Error calling ..." string, as callers expect text back, and are never cached.
+    """
+    _session = None
+    _openai_client = None
+    _response_cache = None
+    _lock = threading.Lock()
+
+    def __init__(self, provider=Config.LLM_PROVIDER, base_url: Optional[str] = None,
+                 use_cache: bool = Config.LLM_CACHE_ENABLED):
+        self.provider = provider
+        self.base_url = (base_url or Config.OLLAMA_URL).rstrip("/")
+        self.timeout = (Config.LLM_CONNECT_TIMEOUT, Config.LLM_READ_TIMEOUT)
+        self.use_cache = use_cache
+        self.calls = deque(maxlen=Config.SERVICE_LATENCY_WINDOW) # {"ttft", "total", "prompt_tokens", "completion_tokens"} per recent call
+        self.cache_hits = 0
+
+    @property
+    def model(self) -> str:
+        return Config.OLLAMA_MODEL if self.provider == "ollama" else Config.OPENAI_MODEL
+
+    @classmethod
+    def session(cls) -> requests.Session:
+        with cls._lock:
+            if cls._session is None:
+                retry = Retry(
+                    total=Config.LLM_MAX_RETRIES,
+                    read=0, # a read timeout means the model is still busy: resending would queue the prompt twice
+                    backoff_factor=Config.LLM_RETRY_BACKOFF,
+                    status_forcelist=(429, 500, 502, 503, 504),
+                    allowed_methods=None, # POSTs are retried only when the server refused or never got them
+                    raise_on_status=False
+                )
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=Config.LLM_POOL_SIZE, max_retries=retry)
+                session = requests.Session()
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                cls._session = session
+            return cls._session
+
+    @classmethod
+    def openai_client(cls):
+        with cls._lock:
+            if cls._openai_client is None:
+                from openai import OpenAI
+                cls._openai_client = OpenAI(
+                    api_key=os.environ.get("OPENAI_API_KEY"),
+                    base_url=Config.OPENAI_BASE_URL,
+                    timeout=Config.LLM_READ_TIMEOUT,
+                    max_retries=Config.LLM_MAX_RETRIES
+                )
+            return cls._openai_client
+
+    @classmethod
+    def response_cache(cls) -> ResponseCache:
+        with cls._lock:
+            if cls._response_cache is None:
+                cls._response_cache = ResponseCache()
+            return cls._response_cache
+
+    def sampling_params(self) -> Dict:
+        if self.provider == "ollama":
+            return dict(Config.OLLAMA_OPTIONS)
+        return {"temperature": Config.OPENAI_TEMPERATURE}
+
+    def _cache_key(self, prompt: str) -> Optional[str]:
+        if not self.use_cache:
+            return None
+        return ResponseCache.key(self.provider, self.model, prompt, self.sampling_params())
+
+    @staticmethod
+    def _is_error(text: str) -> bool:
+        return text.startswith("Error calling")
+
+    def _record(self, start: float, first_token: Optional[float], prompt_tokens=None, completion_tokens=None):
+        end = time.perf_counter()
+        self.calls.append({
+            "ttft": (first_token or end) - start,
+            "total": end - start,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+        })
+        # Token counts go to the span of the stage that made the call (llm, or generate when streaming).
+        current_span().add(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+        if first_token is not None:
+            current_span().set(ttft_ms=(first_token - start) * 1000)
+
+    def generate(self, prompt: str, parent=None) -> str:
+        """parent: span to trace the call under when running on a pool thread (see generate_many)."""
+        with span("llm", parent=parent, provider=self.provider, model=self.model) as s:
+            s.add(calls=1, prompt_chars=len(prompt))
+            key = self._cache_key(prompt)
+            if key:
+                cached = self.response_cache().get(key)
+                if cached is not None:
+                    self.cache_hits += 1
+                    s.add(cache_hits=1)
+                    return cached
+
+            if self.provider == "ollama":
+                response = self._generate_ollama(prompt)
+            elif self.provider == "openai":
+                response = self._generate_openai(prompt)
+            else:
+                raise ValueError(f"Unknown LLM provider: {self.provider}")
+
+            if key and response and not self._is_error(response):
+                self.response_cache().put(key, response)
+            elif self._is_error(response):
+                s.add(errors=1)
+            return response
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        """Yields the response piece by piece as the model produces it (all at once on a cache hit)."""
+        if self.provider == "ollama":
+            pieces = self._stream_ollama
+        elif self.provider == "openai":
+            pieces = self._stream_openai
+        else:
+            raise ValueError(f"Unknown LLM provider: {self.provider}")
+        return self._cached_stream(prompt, pieces)
+
+    def _cached_stream(self, prompt: str, pieces) -> Iterator[str]:
+        key = self._cache_key(prompt)
+        if key:
+            cached = self.response_cache().get(key)
+            if cached is not None:
+                self.cache_hits += 1
+                yield cached
+                return
+
+        parts, failed = [], False
+        for piece in pieces(prompt):
+            failed = failed or self._is_error(piece)
+            parts.append(piece)
+            yield piece
+        if key and parts and not failed:
+            self.response_cache().put(key, "".join(parts))
+
+    def generate_many(self, prompts: List[str], max_workers: int = Config.LLM_POOL_SIZE) -> List[str]:
+        """Runs several prompts concurrently from synchronous code; results keep the prompt order."""
+        if not prompts:
+            return []
+        parent = current_span()
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(prompts)))) as pool:
+            return list(pool.map(lambda prompt: self.generate(prompt, parent=parent), prompts))
+
+    async def agenerate(self, prompt: str) -> str:
+        """asyncio interface: the blocking call runs in a worker thread over the shared pool."""
+        return await asyncio.to_thread(self.generate, prompt, current_span())
+
+    async def agenerate_many(self, prompts: List[str], concurrency: int = Config.LLM_POOL_SIZE) -> List[str]:
+        """Runs prompts concurrently with at most `concurrency` requests in flight."""
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def run(prompt: str) -> str:
+            async with semaphore:
+                return await self.agenerate(prompt)
+
+        return await asyncio.gather(*(run(p) for p in prompts))
+
+    def latency_summary(self) -> Dict:
+        calls = list(self.calls) # snapshot: requests may append while this runs
+        if not calls:
+            return {"calls": 0, "cache_hits": self.cache_hits}
+        totals = sorted(c["total"] for c in calls)
+        ttfts = sorted(c["ttft"] for c in calls)
+        return {
+            "calls": len(totals),
+            "mean_total_s": sum(totals) / len(totals),
+            "p50_total_s": totals[len(totals) // 2],
+            "p50_ttft_s": ttfts[len(ttfts) // 2],
+            "cache_hits": self.cache_hits,
+        }
+
+    def _ollama_payload(self, prompt: str, stream: bool) -> Dict:
+        payload = {
+            "model": Config.OLLAMA_MODEL,
+            "prompt": prompt,
+            "stream": stream
+        }
+        if Config.OLLAMA_OPTIONS:
+            payload["options"] = Config.OLLAMA_OPTIONS
+        return payload
+
+    def _ollama_error(self, e: Exception) -> str:
+        return f"Error calling Ollama: {str(e)}\nEnsure Ollama is running and model '{Config.OLLAMA_MODEL}' is pulled."
+
+    def _generate_ollama(self, prompt: str) -> str:
+        url = f"{self.base_url}/api/generate"
+        start = time.perf_counter()
+        try:
+            response = self.session().post(url, json=self._ollama_payload(prompt, stream=False), timeout=self.timeout)
+            response.raise_for_status()
+            body = response.json()
+            self._record(start, None, body.get("prompt_eval_count"), body.get("eval_count"))
+            return body['response']
+        except Exception as e:
+            return self._ollama_error(e)
+
+    def _stream_ollama(self, prompt: str) -> Iterator[str]:
+        url = f"{self.base_url}/api/generate"
+        start = time.perf_counter()
+        first_token = None
+        try:
+            with self.session().post(url, json=self._ollama_payload(prompt, stream=True),
+                                     timeout=self.timeout, stream=True) as response:
+                response.raise_for_status()
+                # Ollama streams one JSON object per line; the last one has done=true and token counts.
+                for line in response.iter_lines(chunk_size=None):
+                    if not line:
+                        continue
+                    event = json.loads(line)
+                    piece = event.get("response", "")
+                    if piece:
+                        if first_token is None:
+                            first_token = time.perf_counter()
+                        yield piece
+                    if event.get("done"):
+                        self._record(start, first_token, event.get("prompt_eval_count"), event.get("eval_count"))
+                        return
+        except Exception as e:
+            yield self._ollama_error(e)
+
+    def _generate_openai(self, prompt: str) -> str:
+        start = time.perf_counter()
+        try:
+            response = self.openai_client().chat.completions.create(
+                model=Config.OPENAI_MODEL,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=Config.OPENAI_TEMPERATURE
+            )
+            usage = response.usage
+            self._record(start, None, getattr(usage, "prompt_tokens", None), getattr(usage, "completion_tokens", None))
+            return response.choices[0].message.content
+        except Exception as e:
+            return f"Error calling OpenAI: {str(e)}"
+
+    def _stream_openai(self, prompt: str) -> Iterator[str]:
+        start = time.perf_counter()
+        first_token = None
+        try:
+            stream = self.openai_client().chat.completions.create(
+                model=Config.OPENAI_MODEL,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=Config.OPENAI_TEMPERATURE,
+                stream=True
+            )
+            for event in stream:
+                piece = event.choices[0].delta.content if event.choices else None
+                if piece:
+                    if first_token is None:
+                        first_token = time.perf_counter()
+                    yield piece
+            self._record(start, first_token)
+        except Exception as e:
+            yield f"Error calling OpenAI: {str(e)}"
@@ -0,0 +1,173 @@
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from typing import Callable, Dict, Optional
+import numpy as np
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from config.config import Config
+
+
+class _SqliteStore:
+    """One SQLite connection shared by threads behind a lock; WAL lets several processes read and write."""
+    def __init__(self, path: str, schema: str):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(schema)
+        self.conn.commit()
+
+
+class ResponseCache(_SqliteStore):
+    """
+    Persistent LLM response cache keyed by (provider, model, prompt, sampling params).
+    Entries older than ttl_seconds are ignored and purged; beyond max_entries the least
+    recently used are evicted. `clock` returns the current time in seconds (time.time by default).
+    """
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS responses (
+            key TEXT PRIMARY KEY,
+            response TEXT NOT NULL,
+            created REAL NOT NULL,
+            accessed REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed);
+    """
+
+    def __init__(self, path: str = Config.LLM_CACHE_PATH, max_entries: int = Config.LLM_CACHE_MAX_ENTRIES,
+                 ttl_seconds: float = Config.LLM_CACHE_TTL_SECONDS, clock: Callable[[], float] = time.time):
+        super().__init__(path, self.SCHEMA)
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(provider: str, model: str, prompt: str, params: Dict) -> str:
+        payload = json.dumps([provider, model, prompt, params], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        now = self.clock()
+        with self.lock:
+            row = self.conn.execute("SELECT response, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None or (self.ttl_seconds and now - row[1] > self.ttl_seconds):
+                if row is not None:
+                    self.conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self.conn.commit()
+                self.misses += 1
+                return None
+            self.conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            self.conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, response: str):
+        now = self.clock()
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, response, now, now)
+            )
+            if self.ttl_seconds:
+                self.conn.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl_seconds,))
+            overflow = self.conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0] - self.max_entries
+            if overflow > 0:
+                self.conn.execute(
+                    "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY accessed LIMIT ?)",
+                    (overflow,)
+                )
+            self.conn.commit()
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / lookups if lookups else 0.0}
+
+
+class SemanticCache(_SqliteStore):
+    """
+    Reuses a response for inputs whose embeddings are near-duplicates (cosine >= threshold),
+    e.g. a HyDE answer for a lightly rephrased query. Vectors of a namespace are held in memory
+    as one matrix, so a lookup is a single matrix-vector product.
+    """
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS semantic (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            namespace TEXT NOT NULL,
+            embedding BLOB NOT NULL,
+            response TEXT NOT NULL,
+            created REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS semantic_namespace ON semantic (namespace, created);
+    """
+
+    def __init__(self, path: str = Config.LLM_CACHE_PATH, threshold: float = Config.SEMANTIC_CACHE_THRESHOLD,
+                 max_entries: int = Config.SEMANTIC_CACHE_MAX_ENTRIES, ttl_seconds: float = Config.LLM_CACHE_TTL_SECONDS):
+        super().__init__(path, self.SCHEMA)
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._matrices = {} # namespace -> (ids, unit vectors)
+        self.hits = 0
+        self.misses = 0
+
+    def _matrix(self, namespace: str):
+        if namespace not in self._matrices:
+            cutoff = time.time() - self.ttl_seconds if self.ttl_seconds else 0
+            rows = self.conn.execute(
+                "SELECT id, embedding FROM semantic WHERE namespace = ? AND created >= ?", (namespace, cutoff)
+            ).fetchall()
+            ids = [row[0] for row in rows]
+            vectors = np.vstack([np.frombuffer(row[1], dtype=np.float32) for row in rows]) if rows else None
+            self._matrices[namespace] = (ids, vectors)
+        return self._matrices[namespace]
+
+    @staticmethod
+    def _unit(vector: np.ndarray) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(self, namespace: str, vector: np.ndarray) -> Optional[str]:
+        with self.lock:
+            ids, vectors = self._matrix(namespace)
+            if vectors is not None and vectors.shape[1] == len(vector):
+                similarities = vectors @ self._unit(vector)
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.threshold:
+                    row = self.conn.execute("SELECT response FROM semantic WHERE id = ?", (ids[best],)).fetchone()
+                    if row:
+                        self.hits += 1
+                        return row[0]
+            self.misses += 1
+            return None
+
+    def put(self, namespace: str, vector: np.ndarray, response: str):
+        unit = self._unit(vector)
+        with self.lock:
+            self.conn.execute(
+                "INSERT INTO semantic (namespace, embedding, response, created) VALUES (?, ?, ?, ?)",
+                (namespace, unit.tobytes(), response, time.time())
+            )
+            overflow = self.conn.execute("SELECT COUNT(*) FROM semantic").fetchone()[0] - self.max_entries
+            if overflow > 0:
+                self.conn.execute(
+                    "DELETE FROM semantic WHERE id IN (SELECT id FROM semantic ORDER BY created LIMIT ?)", (overflow,)
+                )
+                self._matrices.clear()
+            self.conn.commit()
+            if namespace in self._matrices:
+                ids, vectors = self._matrices[namespace]
+                row_id = self.conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+                if vectors is None:
+                    self._matrices[namespace] = ([row_id], unit[None, :])
+                elif vectors.shape[1] == len(unit):
+                    self._matrices[namespace] = (ids + [row_id], np.vstack([vectors, unit]))
@@ -0,0 +1,328 @@
+import glob
+import hashlib
+import json
+import os
+import sys
+from collections import defaultdict
+from typing import List, Dict, Iterable, Optional
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from config.config import Config
+from src.processing.processor import Chunker, make_chunker
+from src.processing.parallel import ParallelChunker
+from src.processing.dedup import ChunkDeduplicator
+from src.retrieval.sparse_index import SparseIndex
+from src.ingestion.catalog import PaperCatalog
+from src.tracing.tracer import span
+
+MANIFEST_VERSION = 1
+
+
+def file_sha256(filepath: str, block_size: int = 1 << 20) -> str:
+    """Hashes a file in fixed-size blocks so large PDFs are never fully buffered."""
+    digest = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class IncrementalIndexer:
+    """
+    Keeps the vector collection in sync with PAPERS_DIR using a per-document manifest.
+    Only new or changed PDFs are parsed and embedded, chunks of removed PDFs are deleted,
+    and everything else is skipped. Chunk IDs are deterministic, so the result matches a full rebuild.
+
+    With dedup, a chunk whose text duplicates (exactly or nearly) a stored chunk is not stored
+    again: the manifest records it as an alias of the stored one, whose "source_papers" metadata
+    lists every document it appears in. Documents whose aliases point at chunks that are being
+    removed are re-indexed along with them.
+    """
+    def __init__(self, vector_engine, chunker: Optional[Chunker] = None, manifest_path: str = Config.INDEX_MANIFEST_PATH,
+                 workers: int = Config.INGEST_WORKERS, sparse_index_dir: str = Config.SPARSE_INDEX_DIR,
+                 catalog_path: str = Config.CATALOG_PATH, dedup: bool = Config.DEDUP_ENABLED,
+                 dedup_path: str = Config.DEDUP_INDEX_PATH):
+        self.vector_engine = vector_engine
+        self.catalog_path = catalog_path
+        self.catalog = PaperCatalog(catalog_path)
+        self.sparse_index_dir = sparse_index_dir
+        self.chunker = chunker or make_chunker()
+        self.workers = workers
+        self.manifest_path = manifest_path
+        self.manifest = self._load_manifest()
+        self.dedup = ChunkDeduplicator(dedup_path) if dedup else None
+
+    def settings(self) -> Dict:
+        """Everything besides file content that changes the chunks or vectors of a document."""
+        return {
+            "chunker": self.chunker.strategy,
+            "chunk_size": self.chunker.chunk_size,
+            "chunk_overlap": self.chunker.chunk_overlap,
+            "embedding_model": Config.EMBEDDING_MODEL_NAME,
+            "normalize_embeddings": Config.NORMALIZE_EMBEDDINGS,
+            "dedup": self.dedup.settings() if self.dedup is not None else None,
+        }
+
+    def _load_manifest(self) -> Dict:
+        empty = {"version": MANIFEST_VERSION, "documents": {}}
+        if not os.path.exists(self.manifest_path):
+            return empty
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable index manifest ({e}).")
+            return empty
+        if manifest.get("version") != MANIFEST_VERSION:
+            return empty
+        return manifest
+
+    def _save_manifest(self):
+        """Writes the manifest atomically so an interrupted run never leaves it half-written."""
+        os.makedirs(os.path.dirname(self.manifest_path), exist_ok=True)
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _fingerprint(self, filepath: str) -> Dict:
+        """Size/mtime short-circuit: the content hash is only recomputed when the file was touched."""
+        stat = os.stat(filepath)
+        previous = self.manifest["documents"].get(os.path.basename(filepath))
+        if previous and previous.get("size") == stat.st_size and previous.get("mtime") == stat.st_mtime:
+            sha = previous["sha256"]
+        else:
+            sha = file_sha256(filepath)
+        return {"sha256": sha, "size": stat.st_size, "mtime": stat.st_mtime}
+
+    def _document_metadata(self, filepath: str) -> Dict:
+        """
+        The document fields stored with each of its chunks: paper_id (the arXiv ID when the catalog
+        knows the PDF, downloads are named by it; else the file name) and year, so searches can filter
+        inside the index. Title, authors and url stay in the catalog and are joined into search
+        results (see PaperMetadata), so the index doesn't grow with them.
+        """
+        record = self.catalog.by_filename(filepath)
+        if record is None:
+            return {"paper_id": os.path.splitext(os.path.basename(filepath))[0]}
+        metadata = {"paper_id": record["paper_id"], "year": record.get("year")}
+        return {key: value for key, value in metadata.items() if value is not None}
+
+    def plan(self, pdf_files: List[str]) -> Dict:
+        """
+        Compares the PDFs on disk with the manifest.
+        Returns {"add": [...], "update": [...], "remove": [...], "skip": [...], "fingerprints": {...}}.
+        """
+        settings = self.settings()
+        documents = self.manifest["documents"]
+        plan = {"add": [], "update": [], "remove": [], "skip": [], "fingerprints": {}}
+
+        on_disk = {os.path.basename(fp): fp for fp in pdf_files}
+        for name, filepath in sorted(on_disk.items()):
+            fingerprint = self._fingerprint(filepath)
+            plan["fingerprints"][name] = fingerprint
+            entry = documents.get(name)
+            if entry is None:
+                plan["add"].append(filepath)
+            elif (entry["sha256"] != fingerprint["sha256"] or entry.get("settings") != settings
+                  or entry.get("metadata") != self._document_metadata(filepath)):
+                # A new paper_id or year also re-indexes (other catalog fields are joined at query time);
+                # the embedding cache keeps that from re-embedding.
+                plan["update"].append(filepath)
+            else:
+                plan["skip"].append(filepath)
+
+        plan["remove"] = sorted(name for name in documents if name not in on_disk)
+
+        dependents = set(self._dependents(plan["remove"] + [os.path.basename(fp) for fp in plan["update"]]))
+        plan["dependents"] = sorted(dependents)
+        plan["update"] += [fp for fp in plan["skip"] if os.path.basename(fp) in dependents]
+        plan["skip"] = [fp for fp in plan["skip"] if os.path.basename(fp) not in dependents]
+        return plan
+
+    def _dependents(self, names: List[str]) -> List[str]:
+        """
+        Other documents that alias chunks of `names`. Those chunks are deleted with their documents,
+        so the dependents must be re-indexed too (and, in turn, whatever aliases their chunks).
+        """
+        documents = self.manifest["documents"]
+        affected = set(names)
+        removed = {cid for name in affected for cid in documents.get(name, {}).get("chunk_ids", [])}
+        dependents = []
+        while True:
+            found = [name for name, doc in documents.items()
+                     if name not in affected and removed.intersection(doc.get("aliases", {}).values())]
+            if not found:
+                return dependents
+            for name in found:
+                affected.add(name)
+                dependents.append(name)
+                removed.update(documents[name].get("chunk_ids", []))
+
+    def _needs_rebuild(self) -> bool:
+        """A new embedding model changes the vector space, and a collection that drifted from the manifest can't be patched."""
+        documents = self.manifest["documents"]
+        if not documents:
+            return self.vector_engine.count() > 0
+        settings = self.settings()
+        for doc in documents.values():
+            doc_settings = doc.get("settings", {})
+            # Dedup decisions depend on every document indexed before, so new dedup settings rebuild too.
+            if any(doc_settings.get(key) != settings[key] for key in ("embedding_model", "normalize_embeddings", "dedup")):
+                return True
+        expected = sum(len(doc.get("chunk_ids", [])) for doc in documents.values())
+        return self.vector_engine.count() != expected
+
+    def _sync_dedup(self):
+        """Re-creates the dedup index from the collection if it doesn't match the manifest (e.g. after a crash)."""
+        owners = {cid: name for name, doc in self.manifest["documents"].items() for cid in doc.get("chunk_ids", [])}
+        if self.dedup.ids() == set(owners):
+            return
+        print("Dedup index is out of date; rebuilding it from the collection.")
+        self.dedup.rebuild((doc_id, text, owners.get(doc_id)) for doc_id, text, _ in self.vector_engine.iter_documents())
+
+    def _forget(self, name: str, touched: set):
+        """Deletes a document's chunks; chunks it aliased lose it as a source."""
+        doc = self.manifest["documents"].pop(name)
+        self.vector_engine.delete_chunks(doc.get("chunk_ids", []))
+        if self.dedup is not None:
+            self.dedup.remove(doc.get("chunk_ids", []))
+        touched.update(doc.get("aliases", {}).values())
+
+    def _source_label(self, name: str) -> str:
+        return self.manifest["documents"].get(name, {}).get("metadata", {}).get("paper_id", name)
+
+    def _refresh_sources(self, chunk_ids: Iterable[str]):
+        """Rewrites the "source_papers" metadata of stored chunks whose set of aliasing documents changed."""
+        documents = self.manifest["documents"]
+        owners = {cid: name for name, doc in documents.items() for cid in doc.get("chunk_ids", [])}
+        sources = defaultdict(set)
+        for name, doc in documents.items():
+            for canonical in doc.get("aliases", {}).values():
+                sources[canonical].add(name)
+        updated = []
+        for chunk in self.vector_engine.get_chunks(sorted(cid for cid in set(chunk_ids) if cid in owners)):
+            names = sources[chunk["id"]] | {owners[chunk["id"]]}
+            metadata = {key: value for key, value in chunk["metadata"].items() if key != "source_papers"}
+            if len(names) > 1:
+                metadata["source_papers"] = "; ".join(sorted({self._source_label(name) for name in names}))
+            if metadata != chunk["metadata"]:
+                updated.append(dict(chunk, metadata=metadata))
+        if updated:
+            # Same text, so the embedding cache answers and nothing is re-embedded.
+            self.vector_engine.add_chunks(updated)
+
+    def dedup_stats(self) -> Dict:
+        """Chunks produced vs. stored over the whole index."""
+        documents = self.manifest["documents"].values()
+        stored = sum(len(doc.get("chunk_ids", [])) for doc in documents)
+        aliased = sum(len(doc.get("aliases", {})) for doc in documents)
+        total = stored + aliased
+        return {"chunks": total, "stored": stored, "aliased": aliased, "shrink": aliased / total if total else 0.0}
+
+    def run(self, papers_dir: str = Config.PAPERS_DIR, full: bool = False) -> Dict:
+        """
+        Brings the index up to date with papers_dir.
+        full=True drops the collection and re-embeds everything.
+        """
+        with span("index", full=full, workers=self.workers) as s:
+            summary = self._run(papers_dir, full)
+            s.add(added=summary["added"], updated=summary["updated"], removed=summary["removed"])
+            return summary
+
+    def _run(self, papers_dir: str, full: bool) -> Dict:
+        if full or self._needs_rebuild():
+            print("Performing full rebuild of the index.")
+            self.vector_engine.reset_collection()
+            self.manifest = {"version": MANIFEST_VERSION, "documents": {}}
+            if self.dedup is not None:
+                self.dedup.clear()
+        if self.dedup is not None:
+            self._sync_dedup()
+
+        self.catalog = PaperCatalog(self.catalog_path) # pick up papers ingested since construction
+        pdf_files = glob.glob(os.path.join(papers_dir, "*.pdf"))
+        plan = self.plan(pdf_files)
+        print(f"Found {len(pdf_files)} PDFs: {len(plan['add'])} new, {len(plan['update'])} changed, "
+              f"{len(plan['remove'])} removed, {len(plan['skip'])} unchanged.")
+        if plan["dependents"]:
+            print(f"Re-indexing {len(plan['dependents'])} PDFs whose duplicate chunks pointed at changed ones.")
+
+        documents = self.manifest["documents"]
+        touched = set() # stored chunks whose aliasing documents changed
+        for name in plan["remove"]:
+            print(f"Removing: {name}")
+            self._forget(name, touched)
+            self._save_manifest()
+        if self.dedup is not None:
+            # Drop every changed document before adding any: a chunk must not become an alias
+            # of a chunk that is about to be deleted.
+            for filepath in plan["update"]:
+                if os.path.basename(filepath) in documents:
+                    self._forget(os.path.basename(filepath), touched)
+            self._save_manifest()
+
+        settings = self.settings()
+        failed = []
+        duplicates = {"chunks": 0, "exact": 0, "near": 0}
+        metadata = {os.path.basename(fp): self._document_metadata(fp) for fp in plan["add"] + plan["update"]}
+        jobs = [(fp, metadata[os.path.basename(fp)]) for fp in plan["add"] + plan["update"]]
+        # Parsing and chunking run in worker processes while this process embeds finished documents.
+        pipeline = ParallelChunker(chunker=self.chunker, workers=self.workers)
+        for filepath, chunks, error in pipeline.iter_chunks(jobs):
+            name = os.path.basename(filepath)
+            try:
+                # Drop stale chunks first: a changed PDF may now produce fewer chunks.
+                if name in documents:
+                    self._forget(name, touched)
+                if error:
+                    raise RuntimeError(error)
+                print(f"Processing: {name}")
+                aliases = {}
+                if self.dedup is not None:
+                    with span("dedup") as s:
+                        chunks, aliases, counts = self.dedup.deduplicate(chunks, document=name)
+                        s.add(chunks=counts["chunks"], exact=counts["exact"], near=counts["near"])
+                    for key in duplicates:
+                        duplicates[key] += counts[key]
+                    touched.update(aliases.values())
+                self.vector_engine.add_chunks(chunks)
+                documents[name] = dict(plan["fingerprints"][name], settings=settings, metadata=metadata[name],
+                                       chunk_ids=[chunk["id"] for chunk in chunks], aliases=aliases)
+            except Exception as e:
+                print(f"Error processing {filepath}: {e}")
+                if self.dedup is not None:
+                    self.dedup.remove(chunk["id"] for chunk in chunks)
+                failed.append(filepath)
+            self._save_manifest()
+        if self.dedup is not None:
+            self._refresh_sources(touched)
+            self.dedup.save()
+        self.vector_engine.embedder.flush()
+
+        changed = plan["add"] or plan["update"] or plan["remove"]
+        if changed or not SparseIndex(self.sparse_index_dir).exists():
+            # BM25 statistics (idf, average length) are corpus-wide, so the sparse index is rebuilt
+            # from the collection; this re-tokenizes chunk text but never re-embeds.
+            print("Building BM25 index...")
+            with span("bm25_build"):
+                SparseIndex.build(
+                    ((doc_id, text, (meta or {}).get("paper_id", "")) for doc_id, text, meta in self.vector_engine.iter_documents()),
+                    self.sparse_index_dir
+                )
+
+        return {
+            "added": len(plan["add"]),
+            "updated": len(plan["update"]),
+            "removed": len(plan["remove"]),
+            "skipped": len(plan["skip"]),
+            "failed": failed,
+            "duplicates": duplicates,
+        }
+
+
+if __name__ == "__main__":
+    from src.embedding.vector_store import VectorEngine
+    summary = IncrementalIndexer(VectorEngine()).run()
+    print(summary)
@@ -0,0 +1,163 @@
+import json
+import os
+import re
+import sys
+import threading
+from collections.abc import Mapping
+from typing import Dict, Iterable, Iterator, Optional
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from config.config import Config
+
+VERSION_RE = re.compile(r"v\d+$")
+
+
+def normalize_arxiv_id(arxiv_id: str) -> str:
+    """'http://arxiv.org/abs/2101.00001v2' -> '2101.00001'; old-style IDs keep their archive ('hep-th/9901001')."""
+    arxiv_id = arxiv_id.strip()
+    if "/abs/" in arxiv_id:
+        arxiv_id = arxiv_id.split("/abs/", 1)[1]
+    return VERSION_RE.sub("", arxiv_id)
+
+
+def paper_filename(paper_id: str) -> str:
+    """One PDF per arXiv ID; '/' of old-style IDs is not allowed in file names."""
+    return paper_id.replace("/", "_") + ".pdf"
+
+
+class PaperCatalog:
+    """
+    On-disk record of every downloaded paper, keyed by arXiv ID (without version):
+    {"version": 1, "papers": {paper_id: {"paper_id", "title", "authors", "published", "year",
+                                         "summary", "url", "filename", "topics"}}}
+    Topics accumulate across ingest runs, so the papers folder holds the union of everything ingested.
+    """
+    VERSION = 1
+
+    def __init__(self, path: str = Config.CATALOG_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+        self.papers = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == self.VERSION:
+                self.papers = data.get("papers", {})
+
+    def __len__(self) -> int:
+        return len(self.papers)
+
+    def __contains__(self, paper_id: str) -> bool:
+        return paper_id in self.papers
+
+    def get(self, paper_id: str) -> Optional[Dict]:
+        return self.papers.get(paper_id)
+
+    def by_filename(self, filename: str) -> Optional[Dict]:
+        paper_id = os.path.splitext(os.path.basename(filename))[0]
+        record = self.papers.get(paper_id)
+        if record is None and "_" in paper_id:
+            record = self.papers.get(paper_id.replace("_", "/", 1))
+        return record
+
+    def __iter__(self) -> Iterator[Dict]:
+        return iter(list(self.papers.values()))
+
+    def add(self, record: Dict, topic: Optional[str] = None):
+        """Inserts or updates a paper; the topic is appended to the ones it was already found under."""
+        with self.lock:
+            existing = self.papers.get(record["paper_id"], {})
+            topics = list(existing.get("topics", []))
+            if topic and topic not in topics:
+                topics.append(topic)
+            self.papers[record["paper_id"]] = dict(existing, **record, topics=topics)
+
+    def save(self):
+        """Writes the catalog atomically."""
+        with self.lock:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"version": self.VERSION, "papers": self.papers}, f, indent=2)
+            os.replace(tmp_path, self.path)
+
+
+_shared = {} # path -> (mtime, PaperCatalog)
+_shared_lock = threading.Lock()
+
+
+def shared_catalog(path: str = Config.CATALOG_PATH) -> PaperCatalog:
+    """The catalog as last saved, loaded once per process and re-read when the file changes (e.g. after `ingest`)."""
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        mtime = None
+    with _shared_lock:
+        cached = _shared.get(path)
+        if cached is None or cached[0] != mtime:
+            cached = _shared[path] = (mtime, PaperCatalog(path))
+        return cached[1]
+
+
+class PaperMetadata(Mapping):
+    """
+    Read-only view of a stored chunk's metadata joined with its paper's catalog record.
+    The index only stores per-chunk fields (paper_id, year, page range, character offsets, section);
+    title, authors, url and filepath live once per paper in the catalog and are looked up on first access.
+    Papers the catalog doesn't know (PDFs added by hand) are titled by their file name.
+    """
+    PAPER_FIELDS = ("title", "authors", "year", "url", "filepath")
+
+    def __init__(self, chunk: Optional[Dict], catalog: PaperCatalog):
+        self.chunk = chunk or {}
+        self.catalog = catalog
+        self._paper = None
+
+    def paper(self) -> Dict:
+        """The paper-level fields, as they used to be copied into every chunk."""
+        if self._paper is None:
+            paper_id = self.chunk.get("paper_id", "")
+            record = self.catalog.get(paper_id) or {}
+            filename = record.get("filename") or (paper_filename(paper_id) if paper_id else "")
+            paper = {
+                "paper_id": paper_id,
+                "title": record.get("title") or filename,
+                "authors": "; ".join(record.get("authors", [])),
+                "year": record.get("year"),
+                "url": record.get("url"),
+                "filepath": os.path.join(Config.PAPERS_DIR, filename) if filename else None,
+            }
+            self._paper = {key: value for key, value in paper.items() if value not in (None, "")}
+        return self._paper
+
+    def compact(self) -> Dict:
+        """Only the fields stored with the chunk."""
+        return dict(self.chunk)
+
+    def __getitem__(self, key):
+        if key in self.chunk:
+            return self.chunk[key]
+        if key in self.PAPER_FIELDS:
+            return self.paper()[key]
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self.chunk
+        yield from (key for key in self.paper() if key in self.PAPER_FIELDS and key not in self.chunk)
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __repr__(self) -> str:
+        return f"PaperMetadata({self.chunk!r})"
+
+
+def paper_table(chunks: Iterable[Dict]) -> Dict[str, Dict]:
+    """{paper_id: paper fields} for the papers of joined chunks, e.g. sent once next to compact chunks."""
+    table = {}
+    for chunk in chunks:
+        metadata = chunk.get("metadata")
+        if isinstance(metadata, PaperMetadata) and metadata.get("paper_id"):
+            table.setdefault(metadata["paper_id"], metadata.paper())
+    return table
@@ -1,98 +1,165 @@
 import arxiv
 import os
 import sys
-import ssl
-import certifi
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Optional
+import requests
+from requests.adapters import HTTPAdapter
 
 # Add project root to sys.path to allow imports from config
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 from config.config import Config
+from src.ingestion.catalog import PaperCatalog, normalize_arxiv_id, paper_filename
+from src.tracing.tracer import span
 
 class ArxivIngestor:
-    def __init__(self, max_results=Config.MAX_PAPERS):
+    """
+    Searches arXiv and downloads the PDFs with a bounded pool of concurrent downloads.
+    Each PDF is streamed in chunks to a `.part` file (resumed with an HTTP Range request if a
+    previous run was interrupted) and renamed into place only once complete.
+    Papers are identified by arXiv ID: ones already in the catalog are not downloaded again, and
+    papers from earlier topics stay in the folder.
+    """
+    def __init__(self, max_results=Config.MAX_PAPERS, workers=Config.DOWNLOAD_WORKERS, catalog: PaperCatalog = None):
         self.max_results = max_results
+        self.workers = workers
         self.download_dir = Config.PAPERS_DIR
-        
-        # SSL Fix
-        self.ssl_context = ssl.create_default_context(cafile=certifi.where())
-        # Fallback if certifi doesn't help in some envs
-        if not os.environ.get("VERIFY_SSL", "True") == "True":
-             self.ssl_context = ssl._create_unverified_context()
-
-    def _clean_download_dir(self):
-        """Removes all files in the download directory."""
-        if os.path.exists(self.download_dir):
-            for file in os.listdir(self.download_dir):
-                file_path = os.path.join(self.download_dir, file)
-                try:
-                    if os.path.isfile(file_path):
-                        os.unlink(file_path)
-                except Exception as e:
-                    print(f"Error deleting {file_path}: {e}")
-        else:
-            os.makedirs(self.download_dir, exist_ok=True)
+        self.catalog = catalog if catalog is not None else PaperCatalog() # an empty catalog is falsy
 
-    def search_and_download(self, query: str):
-        """
-        Searches arXiv for papers and downloads them.
-        Clears existing papers first.
-        """
-        self._clean_download_dir()
-        
-        print(f"Searching arXiv for: {query}")
+        # SSL: requests verifies against certifi's bundle; VERIFY_SSL=False turns verification off in some envs
+        self.verify_ssl = os.environ.get("VERIFY_SSL", "True") == "True"
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = "Mozilla/5.0"
+        adapter = HTTPAdapter(pool_maxsize=max(1, workers))
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    @staticmethod
+    def _record(result) -> Dict:
+        paper_id = normalize_arxiv_id(result.entry_id)
+        return {
+            "paper_id": paper_id,
+            "title": result.title,
+            "authors": [a.name for a in result.authors],
+            "published": str(result.published),
+            "year": result.published.year if result.published else None,
+            "summary": result.summary,
+            "url": result.pdf_url,
+            "filename": paper_filename(paper_id)
+        }
+
+    def search(self, query: str) -> List[Dict]:
+        """Returns catalog records for the top arXiv results (deduplicated by ID)."""
         client = arxiv.Client()
+        client.query_url_format = Config.ARXIV_API_URL + "?{}"
         search = arxiv.Search(
             query=query,
             max_results=self.max_results,
             sort_by=arxiv.SortCriterion.Relevance
         )
-        
-        downloaded_papers = []
-        
-        # Create a list from results to handle generator safely
+        records = {}
+        for result in client.results(search):
+            record = self._record(result)
+            records.setdefault(record["paper_id"], record)
+        return list(records.values())
+
+    def _remote_size(self, response, url: str) -> Optional[int]:
+        """Size of the file on the server: from a 416's `Content-Range: bytes */<size>`, else from a HEAD request."""
+        content_range = response.headers.get("Content-Range", "")
+        if content_range.startswith("bytes */"):
+            size = content_range[len("bytes */"):]
+        else:
+            head = self.session.head(url, allow_redirects=True, timeout=Config.DOWNLOAD_TIMEOUT, verify=self.verify_ssl)
+            size = head.headers.get("Content-Length") if head.ok else None
+        return int(size) if size and size.isdigit() else None
+
+    def download(self, url: str, filepath: str) -> bool:
+        """
+        Streams url to filepath. Returns False if the file is too small to be a real PDF.
+        Raises on network errors, leaving the `.part` file for the next attempt to resume.
+        """
+        part_path = filepath + ".part"
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+
+        stale = False
+        with self.session.get(url, headers=headers, stream=True, timeout=Config.DOWNLOAD_TIMEOUT, verify=self.verify_ssl) as response:
+            if response.status_code == 416:
+                # The range starts at or past the end: the .part file is complete (only the rename
+                # was missing) if it has the size of the file on the server, and stale otherwise.
+                stale = self._remote_size(response, url) != offset
+            else:
+                response.raise_for_status()
+                # A server that ignores Range answers 200 with the whole file: start over.
+                mode = "ab" if offset and response.status_code == 206 else "wb"
+                with open(part_path, mode) as out_file:
+                    for chunk in response.iter_content(chunk_size=Config.DOWNLOAD_CHUNK_SIZE):
+                        out_file.write(chunk)
+        if stale:
+            print(f"Discarding {os.path.basename(part_path)}: it does not match the file on the server.")
+            os.remove(part_path)
+            return self.download(url, filepath)
+
+        # Verify download
+        size = os.path.getsize(part_path)
+        if size < 1000:
+            print(f"Warning: Downloaded file is too small ({size} bytes). Deleting.")
+            os.remove(part_path)
+            return False
+        os.replace(part_path, filepath)
+        return True
+
+    def _fetch(self, record: Dict, parent=None) -> Optional[str]:
+        filepath = os.path.join(self.download_dir, record["filename"])
+        if os.path.exists(filepath):
+            print(f"Already exists: {record['title']}")
+            return filepath
+        with span("download", parent=parent, paper_id=record["paper_id"]) as s:
+            try:
+                print(f"Downloading: {record['title']}")
+                ok = self.download(record["url"], filepath)
+                s.add(bytes=os.path.getsize(filepath) if ok else 0)
+                return filepath if ok else None
+            except Exception as e:
+                print(f"Failed to download {record['title']}: {e}")
+                s.add(errors=1)
+                return None
+
+    def search_and_download(self, query: str):
+        """
+        Searches arXiv for papers and downloads the ones not on disk yet.
+        Returns the papers of this search that are available locally.
+        """
+        with span("ingest", query=query) as s:
+            papers = self._search_and_download(query, s)
+            s.add(papers=len(papers))
+            return papers
+
+    def _search_and_download(self, query: str, ingest_span) -> List[Dict]:
+        os.makedirs(self.download_dir, exist_ok=True)
+
+        print(f"Searching arXiv for: {query}")
         try:
-            results = list(client.results(search))
+            with span("search") as s:
+                records = self.search(query)
+                s.add(results=len(records))
         except Exception as e:
             print(f"Error fetching results: {e}")
             return []
-            
-        for result in results:
-            try:
-                # Clean filename
-                safe_title = "".join([c for c in result.title if c.isalnum() or c in (' ', '-', '_')]).rstrip()
-                filename = f"{safe_title}.pdf"
-                filepath = os.path.join(self.download_dir, filename)
-                
-                if not os.path.exists(filepath):
-                    print(f"Downloading: {result.title}")
-                    # Custom download to handle SSL and User-Agent
-                    import urllib.request
-                    req = urllib.request.Request(
-                        result.pdf_url, 
-                        headers={'User-Agent': 'Mozilla/5.0'}
-                    )
-                    with urllib.request.urlopen(req, context=self.ssl_context) as response, open(filepath, 'wb') as out_file:
-                        data = response.read()
-                        out_file.write(data)
-                        
-                    # Verify download
-                    if os.path.getsize(filepath) < 1000:
-                        print(f"Warning: Downloaded file is too small ({os.path.getsize(filepath)} bytes). Deleting.")
-                        os.remove(filepath)
-                else:
-                    print(f"Already exists: {result.title}")
-                    
-                downloaded_papers.append({
-                    "title": result.title,
-                    "filepath": filepath,
-                    "summary": result.summary,
-                    "authors": [a.name for a in result.authors],
-                    "published": str(result.published),
-                    "url": result.pdf_url
-                })
-            except Exception as e:
-                print(f"Failed to download {result.title}: {e}")
-                
+
+        workers = max(1, min(self.workers, len(records)))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            filepaths = list(pool.map(lambda record: self._fetch(record, ingest_span), records))
+
+        downloaded_papers = []
+        for record, filepath in zip(records, filepaths):
+            if filepath is None:
+                continue
+            self.catalog.add(record, topic=query)
+            downloaded_papers.append(dict(record, filepath=filepath))
+        self.catalog.save()
+        print(f"Catalog: {len(self.catalog)} papers in total.")
+
         return downloaded_papers
 
 if __name__ == "__main__":
@@ -0,0 +1,102 @@
+import os
+import sys
+import threading
+import time
+from typing import Callable, Dict
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from config.config import Config
+
+
+class ModelRegistry:
+    """
+    Process-wide store of heavy shared objects (embedding model, cross-encoder, Chroma client).
+    Each is loaded on first use, timed, and then shared by every VectorEngine, HybridRetriever
+    and RerankEngine in the process. `register` installs a ready-made object instead, e.g. a
+    stub model for offline benchmarks.
+    """
+    _instances = {} # (kind, name) -> object
+    _load_times = {} # (kind, name) -> seconds
+    _settings = {} # (kind, name) -> settings it was loaded with; None for a registered object
+    _lock = threading.RLock() # held while loading, so concurrent first uses load once
+
+    @classmethod
+    def get(cls, kind: str, name: str, loader: Callable, **settings):
+        """
+        The shared (kind, name) object, loaded by `loader` on first use. `settings` are what the loader
+        applies (device, max_length, ...): asking again with other settings raises ValueError instead of
+        returning an object that ignores them. A registered object stands in for any settings.
+        """
+        key = (kind, name)
+        with cls._lock:
+            if key not in cls._instances:
+                start = time.perf_counter()
+                cls._instances[key] = loader()
+                cls._load_times[key] = time.perf_counter() - start
+                cls._settings[key] = settings
+                print(f"Loaded {kind} '{name}' in {cls._load_times[key]:.2f}s.")
+            elif cls._settings.get(key) is not None and cls._settings[key] != settings:
+                raise ValueError(f"{kind} '{name}' is already loaded with {cls._settings[key]}, not {settings}")
+            return cls._instances[key]
+
+    @classmethod
+    def register(cls, kind: str, name: str, instance):
+        with cls._lock:
+            cls._instances[(kind, name)] = instance
+            cls._load_times[(kind, name)] = 0.0
+            cls._settings[(kind, name)] = None
+
+    @classmethod
+    def clear(cls):
+        with cls._lock:
+            cls._instances.clear()
+            cls._load_times.clear()
+            cls._settings.clear()
+
+    @classmethod
+    def load_times(cls) -> Dict[str, float]:
+        return {f"{kind}:{name}": seconds for (kind, name), seconds in cls._load_times.items()}
+
+
+def embedding_model(name: str = Config.EMBEDDING_MODEL_NAME, device=Config.EMBEDDING_DEVICE,
+                    num_threads: int = Config.EMBEDDING_THREADS):
+    def load():
+        from sentence_transformers import SentenceTransformer
+        if num_threads:
+            import torch
+            torch.set_num_threads(num_threads)
+        return SentenceTransformer(name, device=device)
+    return ModelRegistry.get("embedding", name, load, device=device, num_threads=num_threads)
+
+
+def cross_encoder(name: str = Config.CROSS_ENCODER_MODEL, max_length: int = Config.RERANK_MAX_LENGTH):
+    def load():
+        from sentence_transformers import CrossEncoder
+        return CrossEncoder(name, max_length=max_length)
+    return ModelRegistry.get("cross_encoder", name, load, max_length=max_length)
+
+
+def tokenizer(name: str = Config.EMBEDDING_MODEL_NAME):
+    """The embedding model's tokenizer without the weights, e.g. for token-aware chunking in worker processes."""
+    def load():
+        from transformers import AutoTokenizer
+        # Bare sentence-transformers model names live under that organization on the Hub.
+        return AutoTokenizer.from_pretrained(name if "/" in name else f"sentence-transformers/{name}")
+    return ModelRegistry.get("tokenizer", name, load)
+
+
+def chroma_client(path: str = Config.DB_DIR):
+    def load():
+        import chromadb
+        return chromadb.PersistentClient(path=path)
+    return ModelRegistry.get("chroma", path, load)
+
+
+def warm_up(embedding: bool = True, reranker: bool = True) -> Dict[str, float]:
+    """Loads the models up front (e.g. before serving queries) and returns load seconds per model."""
+    if embedding:
+        embedding_model()
+    if reranker:
+        cross_encoder()
+    return ModelRegistry.load_times()
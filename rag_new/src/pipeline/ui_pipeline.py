@@ -0,0 +1,46 @@
+import os
+import sys
+from typing import Dict
+import requests
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from config.config import Config
+
+_local_service = None
+
+
+def _run_locally(query: str, strategy: str) -> Dict:
+    """Fallback when no service is running: a service object kept in this process for later calls."""
+    global _local_service
+    if _local_service is None:
+        from src.service.server import RAGService
+        _local_service = RAGService(batching=False)
+    return _local_service.generate(query, strategy=strategy)
+
+
+def run_rag_for_ui_pipeline(query: str, strategy: str = "hyde") -> Dict:
+    """
+    Backend of the Streamlit UI. Sends the question to the resident service (`python main.py serve`),
+    which already has the models and indexes loaded; without one, answers from the current index here.
+    Returns {"review", "strategy", "num_papers", "sources", "context", "papers"}, or {"error": message}
+    when the service rejects or fails the request.
+    """
+    try:
+        response = requests.post(
+            f"{Config.SERVICE_URL}/generate",
+            json={"query": query, "strategy": strategy},
+            timeout=(2, Config.LLM_READ_TIMEOUT * 2)
+        )
+        response.raise_for_status()
+        return response.json()
+    except requests.HTTPError as e:
+        try:
+            message = e.response.json()["error"]
+        except (ValueError, KeyError):
+            message = e.response.text or str(e)
+        print(f"RAG service error ({e.response.status_code}): {message}")
+        return {"error": message}
+    except requests.ConnectionError:
+        print(f"No RAG service at {Config.SERVICE_URL}; running locally.")
+        return _run_locally(query, strategy)
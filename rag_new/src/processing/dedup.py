@@ -0,0 +1,188 @@
+import hashlib
+import json
+import os
+import sys
+import zlib
+from collections import defaultdict
+from typing import List, Dict, Iterable, Optional, Tuple
+import numpy as np
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from config.config import Config
+
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+
+
+def normalize_text(text: str) -> str:
+    """Case and whitespace differences (re-extracted PDFs, reflowed lines) don't make a chunk new."""
+    return " ".join(text.lower().split())
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha1(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+class MinHasher:
+    """
+    MinHash signatures over word shingles: the fraction of equal positions in two signatures
+    estimates the Jaccard similarity of the chunks' shingle sets. Hashes are seeded, so
+    signatures are stable across processes and runs.
+    """
+    def __init__(self, num_perm: int = Config.DEDUP_NUM_PERM, shingle_words: int = Config.DEDUP_SHINGLE_WORDS, seed: int = 1):
+        self.num_perm = num_perm
+        self.shingle_words = shingle_words
+        rng = np.random.RandomState(seed)
+        self.a = rng.randint(1, 1 << 31, size=num_perm, dtype=np.uint64)
+        self.b = rng.randint(0, MAX_HASH, size=num_perm, dtype=np.uint64)
+
+    def shingles(self, text: str) -> set:
+        words = normalize_text(text).split()
+        n = self.shingle_words
+        if len(words) <= n:
+            return {" ".join(words)}
+        return {" ".join(words[i:i + n]) for i in range(len(words) - n + 1)}
+
+    def signature(self, text: str) -> np.ndarray:
+        hashes = np.array([zlib.crc32(s.encode("utf-8")) for s in self.shingles(text)], dtype=np.uint64)
+        # (a * h + b) mod p, one row per shingle; a < 2^31 and h, b < 2^32, so nothing overflows uint64
+        permuted = (hashes[:, None] * self.a[None, :] + self.b[None, :]) % np.uint64(MERSENNE_PRIME)
+        return (permuted & np.uint64(MAX_HASH)).min(axis=0)
+
+
+class ChunkDeduplicator:
+    """
+    Index of the chunks stored in the collection, used to drop exact and near-duplicate chunks
+    before they are embedded.
+
+    Exact duplicates are found by the hash of the normalized text. Near duplicates by MinHash with
+    LSH banding: signatures are cut into bands of `band_rows` values, chunks sharing any band are
+    candidates, and a candidate counts when its estimated Jaccard similarity reaches `threshold`.
+    Each stored (canonical) chunk remembers the document that owns it.
+
+    Persisted as dedup_index.json ({"version", "settings", "chunks": {id: [hash, document]}})
+    plus dedup_index.npy (the MinHash signatures, in the same order).
+    """
+    VERSION = 1
+
+    def __init__(self, path: str = Config.DEDUP_INDEX_PATH, threshold: float = Config.DEDUP_THRESHOLD,
+                 num_perm: int = Config.DEDUP_NUM_PERM, shingle_words: int = Config.DEDUP_SHINGLE_WORDS,
+                 band_rows: int = 8):
+        self.path = path
+        self.signatures_path = os.path.splitext(path)[0] + ".npy"
+        self.threshold = threshold
+        self.hasher = MinHasher(num_perm, shingle_words)
+        self.band_rows = min(band_rows, num_perm)
+        self.chunks = {}                  # chunk id -> (text hash, owning document)
+        self.hashes = {}                  # text hash -> chunk id
+        self.signatures = {}              # chunk id -> MinHash signature
+        self.buckets = defaultdict(set)   # (band, band values) -> chunk ids
+        self._load()
+
+    def settings(self) -> Dict:
+        return {"threshold": self.threshold, "num_perm": self.hasher.num_perm,
+                "shingle_words": self.hasher.shingle_words, "band_rows": self.band_rows}
+
+    def _load(self):
+        if not os.path.exists(self.path) or not os.path.exists(self.signatures_path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            signatures = np.load(self.signatures_path)
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable dedup index ({e}).")
+            return
+        if data.get("version") != self.VERSION or data.get("settings") != self.settings():
+            return
+        for (chunk_id, (digest, document)), signature in zip(data["chunks"].items(), signatures):
+            self._add(chunk_id, digest, signature, document)
+
+    def save(self):
+        """Writes the index atomically (the signatures first, the JSON that refers to them last)."""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        ids = list(self.chunks)
+        signatures = (np.stack([self.signatures[i] for i in ids]) if ids
+                      else np.empty((0, self.hasher.num_perm), dtype=np.uint64))
+        tmp_path = self.signatures_path + ".tmp.npy"
+        np.save(tmp_path, signatures)
+        os.replace(tmp_path, self.signatures_path)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": self.VERSION, "settings": self.settings(),
+                       "chunks": {i: list(self.chunks[i]) for i in ids}}, f)
+        os.replace(tmp_path, self.path)
+
+    def __len__(self) -> int:
+        return len(self.chunks)
+
+    def ids(self) -> set:
+        return set(self.chunks)
+
+    def _bands(self, signature: np.ndarray) -> List[Tuple[int, bytes]]:
+        r = self.band_rows
+        return [(band, signature[band * r:(band + 1) * r].tobytes()) for band in range(len(signature) // r)]
+
+    def _add(self, chunk_id: str, digest: str, signature: np.ndarray, document: Optional[str]):
+        self.chunks[chunk_id] = (digest, document)
+        self.hashes.setdefault(digest, chunk_id)
+        self.signatures[chunk_id] = signature
+        for key in self._bands(signature):
+            self.buckets[key].add(chunk_id)
+
+    def remove(self, chunk_ids: Iterable[str]):
+        for chunk_id in chunk_ids:
+            if chunk_id not in self.chunks:
+                continue
+            digest, _ = self.chunks.pop(chunk_id)
+            if self.hashes.get(digest) == chunk_id:
+                del self.hashes[digest]
+            for key in self._bands(self.signatures.pop(chunk_id)):
+                self.buckets[key].discard(chunk_id)
+                if not self.buckets[key]:
+                    del self.buckets[key]
+
+    def clear(self):
+        self.chunks, self.hashes, self.signatures = {}, {}, {}
+        self.buckets = defaultdict(set)
+
+    def rebuild(self, chunks: Iterable[Tuple[str, str, Optional[str]]]):
+        """Re-creates the index from stored (id, text, owning document) triples."""
+        self.clear()
+        for chunk_id, text, document in chunks:
+            self._add(chunk_id, text_hash(text), self.hasher.signature(text), document)
+
+    def match(self, text: str, signature: np.ndarray) -> Tuple[Optional[str], Optional[str]]:
+        """Returns (chunk id, "exact" | "near") of a stored chunk that `text` duplicates, or (None, None)."""
+        canonical = self.hashes.get(text_hash(text))
+        if canonical is not None:
+            return canonical, "exact"
+        candidates = set()
+        for key in self._bands(signature):
+            candidates |= self.buckets.get(key, set())
+        best, best_similarity = None, self.threshold
+        for chunk_id in candidates:
+            similarity = float(np.mean(self.signatures[chunk_id] == signature))
+            if similarity >= best_similarity:
+                best, best_similarity = chunk_id, similarity
+        return (best, "near") if best else (None, None)
+
+    def deduplicate(self, chunks: List[Dict], document: str) -> Tuple[List[Dict], Dict[str, str], Dict]:
+        """
+        Splits a document's chunks into the ones to store and aliases of chunks already stored
+        (including earlier chunks of the same document). Kept chunks are added to the index.
+        Returns (kept chunks, {alias chunk id: stored chunk id}, {"chunks", "exact", "near"} counts).
+        """
+        kept, aliases = [], {}
+        counts = {"chunks": len(chunks), "exact": 0, "near": 0}
+        for chunk in chunks:
+            signature = self.hasher.signature(chunk["text"])
+            canonical, kind = self.match(chunk["text"], signature)
+            if canonical is None:
+                self._add(chunk["id"], text_hash(chunk["text"]), signature, document)
+                kept.append(chunk)
+            else:
+                aliases[chunk["id"]] = canonical
+                counts[kind] += 1
+        return kept, aliases, counts
@@ -0,0 +1,145 @@
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Dict, Iterator, Optional, Tuple
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from config.config import Config
+from src.processing.processor import Chunker, CHUNKERS, make_chunker
+from src.tracing.tracer import TRACER
+
+
+def _init_worker(memory_limit_mb: int):
+    """Caps the worker's address space so one pathological PDF can't take the machine down."""
+    if not memory_limit_mb:
+        return
+    try:
+        import resource
+    except ImportError:  # Windows: no rlimits, run uncapped
+        return
+    limit = memory_limit_mb * 1024 * 1024
+    _, hard = resource.getrlimit(resource.RLIMIT_AS)
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+
+
+def _timed_pages(pages: Iterator, timings: Dict) -> Iterator:
+    """Passes pages through, adding the time spent extracting them to timings["parse"]."""
+    pages = iter(pages)
+    while True:
+        start = time.perf_counter()
+        try:
+            page = next(pages)
+        except StopIteration:
+            timings["parse"] += time.perf_counter() - start
+            return
+        timings["parse"] += time.perf_counter() - start
+        timings["pages"] += 1
+        yield page
+
+
+def parse_and_chunk(filepath: str, metadata: Dict, chunker_name: str, chunker_options: Dict) -> Tuple[List[Dict], Dict]:
+    """
+    The unit of work shared by the serial and the parallel path, so both give identical chunks.
+    Chunk IDs come from the file name, so metadata only needs the fields to store with each chunk.
+    Returns (chunks, {"parse", "chunk" seconds, "pages"}): extraction and chunking are interleaved
+    page by page, so they are timed here, in the worker, and traced by the parent process.
+    """
+    start = time.perf_counter()
+    timings = {"parse": 0.0, "chunk": 0.0, "pages": 0}
+    chunker = CHUNKERS[chunker_name](**chunker_options)
+    chunks = list(chunker.iter_chunks(_timed_pages(chunker.pages(filepath), timings), metadata, source=filepath))
+    timings["chunk"] = time.perf_counter() - start - timings["parse"]
+    return chunks, timings
+
+
+def _trace(filepath: str, chunks: List[Dict], timings: Dict):
+    name = os.path.basename(filepath)
+    TRACER.record("parse", timings["parse"], counts={"pages": timings["pages"]}, document=name)
+    TRACER.record("chunk", timings["chunk"], counts={"chunks": len(chunks)}, document=name)
+
+
+class ParallelChunker:
+    """
+    Spreads PDF extraction and chunking over a pool of worker processes and yields
+    (filepath, chunks, error) as each document finishes, so embedding can start right away.
+    """
+    def __init__(self, chunker: Optional[Chunker] = None, workers: int = Config.INGEST_WORKERS,
+                 memory_limit_mb: int = Config.WORKER_MEMORY_LIMIT_MB):
+        self.chunker = chunker or make_chunker()
+        self.workers = max(1, workers)
+        self.memory_limit_mb = memory_limit_mb
+
+    def _chunker_args(self) -> Tuple[str, Dict]:
+        """Name and constructor arguments that rebuild this chunker in a worker (cheaper to send than the instance)."""
+        options = {"chunk_size": self.chunker.chunk_size, "chunk_overlap": self.chunker.chunk_overlap}
+        if hasattr(self.chunker, "model_name"): # token chunkers count tokens of this model
+            options["model_name"] = self.chunker.model_name
+        return self.chunker.name, options
+
+    def _serial(self, jobs: List[Tuple[str, Dict]]) -> Iterator[Tuple[str, List[Dict], Optional[str]]]:
+        for filepath, metadata in jobs:
+            try:
+                chunks, timings = parse_and_chunk(filepath, metadata, *self._chunker_args())
+            except Exception as e:
+                yield filepath, [], str(e)
+                continue
+            _trace(filepath, chunks, timings)
+            yield filepath, chunks, None
+
+    def _run_pool(self, jobs: List[Tuple[str, Dict]], workers: int, broken: List[Tuple[str, Dict]]):
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(self.memory_limit_mb,)) as pool:
+            futures = {
+                pool.submit(parse_and_chunk, filepath, metadata, *self._chunker_args()): (filepath, metadata)
+                for filepath, metadata in jobs
+            }
+            while futures:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    filepath, metadata = futures.pop(future)
+                    try:
+                        chunks, timings = future.result()
+                    except BrokenProcessPool:
+                        broken.append((filepath, metadata))
+                        continue
+                    except MemoryError:
+                        yield filepath, [], f"exceeded worker memory limit ({self.memory_limit_mb} MB)"
+                        continue
+                    except Exception as e:
+                        yield filepath, [], str(e)
+                        continue
+                    _trace(filepath, chunks, timings)
+                    yield filepath, chunks, None
+
+    def iter_chunks(self, jobs: List[Tuple[str, Dict]]) -> Iterator[Tuple[str, List[Dict], Optional[str]]]:
+        """
+        jobs: (filepath, metadata) pairs.
+        Results arrive in completion order, not submission order.
+        """
+        if self.workers == 1 or len(jobs) <= 1:
+            yield from self._serial(jobs)
+            return
+
+        broken = []
+        yield from self._run_pool(jobs, min(self.workers, len(jobs)), broken)
+
+        # A worker killed by the OS (OOM, segfault in the PDF library) breaks the whole pool and
+        # fails every unfinished document. Retry those one at a time so only the culprit is lost.
+        for job in broken:
+            retry_broken = []
+            yield from self._run_pool([job], 1, retry_broken)
+            if retry_broken:
+                yield job[0], [], "worker process terminated abruptly"
+
+
+if __name__ == "__main__":
+    import glob
+    files = glob.glob(os.path.join(Config.PAPERS_DIR, "*.pdf"))
+    jobs = [(fp, {"filepath": fp, "title": os.path.basename(fp)}) for fp in files]
+    for filepath, chunks, error in ParallelChunker().iter_chunks(jobs):
+        print(f"{os.path.basename(filepath)}: {len(chunks)} chunks" + (f" (error: {error})" if error else ""))
@@ -1,57 +1,341 @@
 import fitz  # PyMuPDF
 import os
+import re
 import sys
-from typing import List, Dict
+import bisect
+from collections import Counter
+from typing import List, Dict, Iterable, Iterator, Optional, Tuple
+import numpy as np
 
 # Add project root to sys.path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 from config.config import Config
 
+SECTION_NUMBER_RE = re.compile(r"^(\d+(\.\d+)*\.?|[IVX]+\.)\s+[A-Za-z]")
+
 class PDFProcessor:
     def __init__(self):
         pass
         
+    def iter_pages(self, filepath: str) -> Iterator[Tuple[int, str]]:
+        """
+        Yields (page_number, text) one page at a time, 1-based.
+        The document is closed as soon as the generator finishes or is discarded.
+        """
+        if not os.path.exists(filepath):
+            raise FileNotFoundError(f"File not found: {filepath}")
+            
+        with fitz.open(filepath) as doc:
+            for page_number, page in enumerate(doc, start=1):
+                yield page_number, page.get_text()
+
     def parse_pdf(self, filepath: str) -> str:
         """Extracts text from a PDF file."""
+        return "".join(text for _, text in self.iter_pages(filepath))
+
+    def iter_layout_pages(self, filepath: str) -> Iterator[Tuple[int, str, List[Tuple[int, str]]]]:
+        """
+        Like iter_pages, plus the section headings that start on each page:
+        yields (page_number, text, [(offset in text, heading), ...]).
+        The text is rebuilt from PyMuPDF's layout, one line per line and a blank line between blocks.
+        A line is a heading when it is set noticeably larger than the page's body text, or in bold
+        and numbered ("2.1 Method"); consecutive heading lines (wrapped titles) form one heading.
+        """
         if not os.path.exists(filepath):
             raise FileNotFoundError(f"File not found: {filepath}")
-            
-        doc = fitz.open(filepath)
-        text = ""
-        for page in doc:
-            text += page.get_text()
-        return text
+
+        with fitz.open(filepath) as doc:
+            for page_number, page in enumerate(doc, start=1):
+                blocks = []
+                sizes = Counter()
+                for block in page.get_text("dict")["blocks"]:
+                    lines = []
+                    for line in block.get("lines", []):
+                        spans = [span for span in line["spans"] if span["text"].strip()]
+                        if not spans:
+                            continue
+                        text = "".join(span["text"] for span in line["spans"]).strip()
+                        size = max(span["size"] for span in spans)
+                        bold = all(span["flags"] & 16 for span in spans)
+                        lines.append((text, size, bold))
+                        for span in spans:
+                            sizes[round(span["size"], 1)] += len(span["text"])
+                    if lines:
+                        blocks.append(lines)
+                body_size = sizes.most_common(1)[0][0] if sizes else 0
+
+                parts, headings, offset, previous_heading = [], [], 0, False
+                for lines in blocks:
+                    for i, (text, size, bold) in enumerate(lines):
+                        is_heading = (len(text) < 100 and sum(c.isalpha() for c in text) >= 3 and text[0].isalnum()
+                                      and (size >= body_size * 1.15 or (bold and size >= body_size and SECTION_NUMBER_RE.match(text))))
+                        if is_heading and previous_heading:
+                            headings[-1] = (headings[-1][0], f"{headings[-1][1]} {text}"[:200])
+                        elif is_heading:
+                            headings.append((offset, text))
+                        previous_heading = is_heading
+                        line = text + ("\n" if i < len(lines) - 1 else "\n\n")
+                        parts.append(line)
+                        offset += len(line)
+                yield page_number, "".join(parts), headings
 
 class Chunker:
+    name = "recursive" # Config.CHUNKER value
+    strategy = "recursive-paged" # Recorded in the index manifest; change it when chunk output changes
+
     def __init__(self, chunk_size=Config.CHUNK_SIZE, chunk_overlap=Config.CHUNK_OVERLAP):
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
+        self._splitter_instance = None
         
-    def chunk_text(self, text: str, metadata: Dict) -> List[Dict]:
+    def _splitter(self):
+        if self._splitter_instance is None:
+            from langchain_text_splitters import RecursiveCharacterTextSplitter
+            
+            self._splitter_instance = RecursiveCharacterTextSplitter(
+                chunk_size=self.chunk_size,
+                chunk_overlap=self.chunk_overlap,
+                separators=["\n\n", "\n", ".", " ", ""]
+            )
+        return self._splitter_instance
+
+    def pages(self, filepath: str) -> Iterator[Tuple[int, str]]:
+        """The page stream iter_chunks expects for a PDF."""
+        return PDFProcessor().iter_pages(filepath)
+
+    def chunk_text(self, text: str, metadata: Dict, source: Optional[str] = None) -> List[Dict]:
         """
         Splits text into overlapping chunks.
         Returns a list of chunk dictionaries with metadata.
+        source: file the chunk IDs are derived from, defaults to metadata['filepath'].
         """
-        from langchain_text_splitters import RecursiveCharacterTextSplitter
-        
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=self.chunk_size,
-            chunk_overlap=self.chunk_overlap,
-            separators=["\n\n", "\n", ".", " ", ""]
-        )
-        
-        chunks = text_splitter.split_text(text)
+        chunks = self._splitter().split_text(text)
+        prefix = os.path.basename(source or metadata['filepath'])
         
         chunked_data = []
         for i, chunk in enumerate(chunks):
             chunked_data.append({
-                "id": f"{os.path.basename(metadata['filepath'])}_{i}",
+                "id": f"{prefix}_{i}",
                 "text": chunk,
                 "metadata": metadata
             })
             
         return chunked_data
 
+    def iter_chunks(self, pages: Iterable[Tuple[int, str]], metadata: Dict, buffer_chunks: int = 8,
+                    source: Optional[str] = None) -> Iterator[Dict]:
+        """
+        Streaming counterpart of chunk_text for PDFProcessor.iter_pages output.
+        Only a window of about buffer_chunks * chunk_size characters is held in memory: whenever it
+        fills up, every chunk but the last is emitted and the window restarts at the last chunk,
+        which may still grow with the next page. Each chunk records the page range and the
+        character offsets it covers in the whole document.
+        """
+        splitter = self._splitter()
+        prefix = os.path.basename(source or metadata['filepath'])
+        flush_at = self.chunk_size * buffer_chunks
+
+        buffer = ""
+        buffer_start = 0          # document offset of buffer[0]
+        page_offsets = []         # document offsets where the buffered pages begin
+        page_numbers = []
+        index = 0
+
+        def page_at(offset: int) -> int:
+            return page_numbers[max(0, bisect.bisect_right(page_offsets, offset) - 1)]
+
+        def split(final: bool):
+            nonlocal buffer, buffer_start, page_offsets, page_numbers, index
+            pieces = splitter.split_text(buffer)
+            keep = len(pieces) if final else len(pieces) - 1
+            search_from = 0
+            restart = len(buffer)
+            for i, piece in enumerate(pieces):
+                local = buffer.find(piece, search_from)
+                if local < 0:
+                    local = search_from
+                if i == keep:
+                    restart = local
+                    break
+                # The next piece overlaps this one by at most chunk_overlap characters.
+                search_from = max(local + 1, local + len(piece) - self.chunk_overlap)
+                start = buffer_start + local
+                end = start + len(piece)
+                yield {
+                    "id": f"{prefix}_{index}",
+                    "text": piece,
+                    "metadata": dict(metadata, page=page_at(start), page_end=page_at(end - 1),
+                                     start_char=start, end_char=end)
+                }
+                index += 1
+            # Slide the window: drop emitted text and pages that ended before the new start.
+            buffer = buffer[restart:]
+            buffer_start += restart
+            first = max(0, bisect.bisect_right(page_offsets, buffer_start) - 1)
+            page_offsets, page_numbers = page_offsets[first:], page_numbers[first:]
+
+        for page_number, text in pages:
+            page_offsets.append(buffer_start + len(buffer))
+            page_numbers.append(page_number)
+            buffer += text
+            if len(buffer) >= flush_at:
+                yield from split(final=False)
+        if buffer.strip():
+            yield from split(final=True)
+
+class TokenChunker:
+    """
+    Chunks sized in tokens of the embedding model, so every chunk is embedded whole: chunk_size
+    includes the model's special tokens ([CLS]/[SEP]) and should be its max_seq_length.
+
+    Each stretch of text is tokenized once (with character offsets), and the break priority of
+    every token boundary is read off the text between tokens: page break, then blank line, line
+    break, end of sentence, space, and inside a word as a last resort. A chunk ends at the best
+    boundary in the second half of its token window; the next one starts up to chunk_overlap tokens
+    earlier, on a word boundary. Chunks never span a section heading (see PDFProcessor.iter_layout_pages),
+    and record their section, page range and character offsets in the document.
+    """
+    name = "token"
+    strategy = "token-structured" # Recorded in the index manifest; change it when chunk output changes
+
+    def __init__(self, chunk_size=Config.CHUNK_TOKENS, chunk_overlap=Config.CHUNK_OVERLAP_TOKENS,
+                 model_name=Config.EMBEDDING_MODEL_NAME):
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.model_name = model_name
+
+    @property
+    def tokenizer(self):
+        from src.models.registry import tokenizer
+        return tokenizer(self.model_name)
+
+    def pages(self, filepath: str) -> Iterator[Tuple[int, str, List[Tuple[int, str]]]]:
+        return PDFProcessor().iter_layout_pages(filepath)
+
+    def chunk_text(self, text: str, metadata: Dict, source: Optional[str] = None) -> List[Dict]:
+        """Splits a single text (one page, no headings) into chunks with metadata."""
+        return list(self.iter_chunks([(1, text, [])], metadata, source=source))
+
+    def _offsets(self, text: str) -> List[Tuple[int, int]]:
+        encoding = self.tokenizer(text, add_special_tokens=False, return_offsets_mapping=True,
+                                  return_attention_mask=False, return_token_type_ids=False, verbose=False)
+        return [(start, end) for start, end in encoding["offset_mapping"] if end > start]
+
+    @staticmethod
+    def _priorities(text: str, offsets: List[Tuple[int, int]], page_starts: List[int]) -> np.ndarray:
+        """Break priority before each token, lower is better: 0 page, 1 paragraph, 2 line, 3 sentence, 4 word, 5 none."""
+        priorities = np.full(len(offsets) + 1, 5, dtype=np.int8)
+        priorities[0] = priorities[-1] = 0
+        for i in range(1, len(offsets)):
+            gap = text[offsets[i - 1][1]:offsets[i][0]]
+            if not gap:
+                continue
+            if "\n\n" in gap:
+                priorities[i] = 1
+            elif "\n" in gap:
+                priorities[i] = 2
+            elif text[offsets[i - 1][1] - 1] in ".!?":
+                priorities[i] = 3
+            else:
+                priorities[i] = 4
+        starts = [start for start, _ in offsets]
+        for page_start in page_starts:
+            i = bisect.bisect_left(starts, page_start)
+            if 0 < i < len(offsets):
+                priorities[i] = 0
+        return priorities
+
+    def _spans(self, text: str, page_starts: List[int], final: bool) -> Tuple[List[Tuple[int, int]], int]:
+        """
+        Character spans of the chunks of text, and where the unprocessed rest begins. Unless final,
+        a chunk is only cut once a full window of tokens follows its start, so cutting the text in
+        pieces gives the same chunks as a single pass.
+        """
+        offsets = self._offsets(text)
+        n = len(offsets)
+        limit = max(1, self.chunk_size - self.tokenizer.num_special_tokens_to_add(pair=False))
+        priorities = self._priorities(text, offsets, page_starts)
+        spans, start = [], 0
+        while start < n:
+            if start + limit >= n:
+                if not final:
+                    return spans, offsets[start][0]
+                end = n
+            else:
+                lo = start + max(1, limit // 2)
+                window = priorities[lo:start + limit + 1]
+                end = lo + int(np.flatnonzero(window == window.min())[-1])
+            spans.append((offsets[start][0], offsets[end - 1][1]))
+            if end >= n:
+                break
+            overlap_from = max(start + 1, end - self.chunk_overlap)
+            word_starts = np.flatnonzero(priorities[overlap_from:end] <= 4)
+            start = overlap_from + int(word_starts[0]) if len(word_starts) else end
+        return spans, len(text)
+
+    def iter_chunks(self, pages: Iterable[Tuple[int, str, List[Tuple[int, str]]]], metadata: Dict,
+                    buffer_chunks: int = 8, source: Optional[str] = None) -> Iterator[Dict]:
+        """
+        Streaming chunker over PDFProcessor.iter_layout_pages output ((page_number, text) pairs work
+        too). Text is buffered up to the next heading, or about buffer_chunks chunks' worth.
+        """
+        prefix = os.path.basename(source or metadata['filepath'])
+        flush_at = self.chunk_size * 4 * buffer_chunks # ~4 characters per token
+
+        buffer = ""
+        buffer_start = 0          # document offset of buffer[0]
+        page_offsets = []         # document offsets where the buffered pages begin
+        page_numbers = []
+        section = None
+        index = 0
+
+        def page_at(offset: int) -> int:
+            return page_numbers[max(0, bisect.bisect_right(page_offsets, offset) - 1)]
+
+        def split(final: bool):
+            nonlocal buffer, buffer_start, page_offsets, page_numbers, index
+            page_starts = [offset - buffer_start for offset in page_offsets if offset > buffer_start]
+            spans, restart = self._spans(buffer, page_starts, final) if buffer.strip() else ([], len(buffer))
+            for local_start, local_end in spans:
+                start, end = buffer_start + local_start, buffer_start + local_end
+                chunk_metadata = dict(metadata, page=page_at(start), page_end=page_at(end - 1),
+                                      start_char=start, end_char=end)
+                if section:
+                    chunk_metadata["section"] = section
+                yield {"id": f"{prefix}_{index}", "text": buffer[local_start:local_end], "metadata": chunk_metadata}
+                index += 1
+            buffer = buffer[restart:]
+            buffer_start += restart
+            first = max(0, bisect.bisect_right(page_offsets, buffer_start) - 1)
+            page_offsets, page_numbers = page_offsets[first:], page_numbers[first:]
+
+        for page in pages:
+            page_number, text = page[0], page[1]
+            headings = page[2] if len(page) > 2 else []
+            page_offsets.append(buffer_start + len(buffer))
+            page_numbers.append(page_number)
+            position = 0
+            for offset, heading in headings:
+                buffer += text[position:offset]
+                position = offset
+                yield from split(final=True)
+                section = heading
+            buffer += text[position:]
+            if len(buffer) >= flush_at:
+                yield from split(final=False)
+        yield from split(final=True)
+
+
+CHUNKERS = {Chunker.name: Chunker, TokenChunker.name: TokenChunker}
+
+
+def make_chunker(name: str = Config.CHUNKER, chunk_size: Optional[int] = None, chunk_overlap: Optional[int] = None):
+    """Chunker by Config.CHUNKER name; sizes default to that chunker's (characters or tokens)."""
+    if name not in CHUNKERS:
+        raise ValueError(f"Unknown chunker: {name} (choose from {', '.join(CHUNKERS)})")
+    sizes = {key: value for key, value in (("chunk_size", chunk_size), ("chunk_overlap", chunk_overlap)) if value is not None}
+    return CHUNKERS[name](**sizes)
+
 if __name__ == "__main__":
     # Test script
     processor = PDFProcessor()
@@ -0,0 +1,76 @@
+import os
+import sys
+from typing import Dict, Optional, Set
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from src.ingestion.catalog import PaperCatalog, normalize_arxiv_id, shared_catalog
+
+FILTER_KEYS = ("year_min", "year_max", "author", "paper_id")
+
+
+def normalize_filters(filters: Optional[Dict]) -> Dict:
+    """
+    Drops empty entries and unknown keys; paper_id becomes a list of unversioned arXiv IDs.
+    filters: {"year_min": int, "year_max": int, "author": str, "paper_id": str or list}
+    """
+    if not filters:
+        return {}
+    unknown = set(filters) - set(FILTER_KEYS)
+    if unknown:
+        raise ValueError(f"Unknown filter(s): {', '.join(sorted(unknown))}")
+    clean = {key: value for key, value in filters.items() if value not in (None, "", [])}
+    if "paper_id" in clean:
+        ids = [clean["paper_id"]] if isinstance(clean["paper_id"], str) else clean["paper_id"]
+        clean["paper_id"] = [normalize_arxiv_id(i) for i in ids]
+    for key in ("year_min", "year_max"):
+        if key in clean:
+            clean[key] = int(clean[key])
+    if "author" in clean and not isinstance(clean["author"], str):
+        raise ValueError("The author filter must be a string")
+    return clean
+
+
+def resolve_paper_ids(filters: Dict, catalog: Optional[PaperCatalog] = None, include_years: bool = False) -> Optional[Set[str]]:
+    """
+    Paper IDs allowed by the author / paper_id filters (and the year range if include_years),
+    using the catalog. None means the filters don't restrict papers; an empty set matches nothing.
+    """
+    filters = normalize_filters(filters)
+    restricts = "author" in filters or "paper_id" in filters
+    if include_years:
+        restricts = restricts or "year_min" in filters or "year_max" in filters
+    if not restricts:
+        return None
+
+    catalog = catalog if catalog is not None else shared_catalog()
+    allowed = set(filters["paper_id"]) if "paper_id" in filters else {record["paper_id"] for record in catalog}
+    if "author" in filters:
+        name = filters["author"].lower()
+        allowed = {pid for pid in allowed
+                   if any(name in author.lower() for author in (catalog.get(pid) or {}).get("authors", []))}
+    if include_years and ("year_min" in filters or "year_max" in filters):
+        lo, hi = filters.get("year_min", float("-inf")), filters.get("year_max", float("inf"))
+        allowed = {pid for pid in allowed
+                   if (catalog.get(pid) or {}).get("year") is not None and lo <= catalog.get(pid)["year"] <= hi}
+    return allowed
+
+
+def chroma_where(filters: Dict, paper_ids: Optional[Set[str]] = None) -> Optional[Dict]:
+    """
+    Chroma `where` clause for the filters, so the vector search only scans matching chunks.
+    Years are matched on chunk metadata; authors must already be resolved to paper_ids
+    (a non-empty set; callers short-circuit when nothing can match).
+    """
+    filters = normalize_filters(filters)
+    clauses = []
+    if "year_min" in filters:
+        clauses.append({"year": {"$gte": filters["year_min"]}})
+    if "year_max" in filters:
+        clauses.append({"year": {"$lte": filters["year_max"]}})
+    if paper_ids is not None:
+        ids = sorted(paper_ids)
+        clauses.append({"paper_id": ids[0]} if len(ids) == 1 else {"paper_id": {"$in": ids}})
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
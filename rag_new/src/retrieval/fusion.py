@@ -0,0 +1,34 @@
+from typing import List, Dict
+
+
+def reciprocal_rank_fusion(ranked_lists: List[List[str]], k: int = 60) -> Dict[str, float]:
+    """
+    Reciprocal Rank Fusion: score(d) = sum over lists of 1 / (k + rank of d), ranks starting at 1.
+    Only ranks are used, so lists with incomparable scores (distances, BM25) can be merged.
+    """
+    scores = {}
+    for ranked in ranked_lists:
+        for rank, doc_id in enumerate(ranked, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return scores
+
+
+def _min_max(scores: Dict[str, float]) -> Dict[str, float]:
+    if not scores:
+        return {}
+    lo, hi = min(scores.values()), max(scores.values())
+    if hi == lo:
+        return {doc_id: 1.0 for doc_id in scores}
+    return {doc_id: (s - lo) / (hi - lo) for doc_id, s in scores.items()}
+
+
+def weighted_fusion(score_maps: List[Dict[str, float]], weights: List[float]) -> Dict[str, float]:
+    """
+    Convex combination of min-max normalized scores (higher = better).
+    A document missing from a list contributes 0 for that list.
+    """
+    fused = {}
+    for scores, weight in zip(score_maps, weights):
+        for doc_id, s in _min_max(scores).items():
+            fused[doc_id] = fused.get(doc_id, 0.0) + weight * s
+    return fused
@@ -0,0 +1,113 @@
+import hashlib
+import heapq
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import List, Dict
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from config.config import Config
+from src.models.registry import cross_encoder
+from src.tracing.tracer import span
+
+
+def first_stage_rank_key(candidate: Dict) -> float:
+    """Sort key (ascending = better) from the retrieval stage: fused score if present, else vector distance."""
+    if candidate.get('fused_score') is not None:
+        return -candidate['fused_score']
+    if candidate.get('score') is not None:
+        return candidate['score']
+    return float("inf")
+
+
+class RerankEngine:
+    """
+    Cross-encoder reranking with explicit batch size and max sequence length, an LRU cache of
+    (query, chunk text hash) scores, and partial top-k selection.
+    With cascade_keep > 0, only the cascade_keep best candidates by first-stage score reach the
+    cross-encoder, which bounds its cost independently of the retrieval window.
+    """
+    def __init__(self, model_name=Config.CROSS_ENCODER_MODEL, batch_size=Config.RERANK_BATCH_SIZE,
+                 max_length=Config.RERANK_MAX_LENGTH, cache_size=Config.RERANK_CACHE_SIZE,
+                 cascade_keep=Config.RERANK_CASCADE_KEEP):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.cache_size = cache_size
+        self.cascade_keep = cascade_keep
+        self.cache = OrderedDict()
+        self.lock = threading.Lock() # the cache is shared by concurrent requests in the service
+        self.latencies = deque(maxlen=Config.SERVICE_LATENCY_WINDOW) # seconds per recent rerank call
+
+    @property
+    def model(self):
+        return cross_encoder(self.model_name, max_length=self.max_length)
+
+    def _cache_get(self, key):
+        with self.lock:
+            score = self.cache.get(key)
+            if score is not None:
+                self.cache.move_to_end(key)
+            return score
+
+    def _cache_put(self, key, score: float):
+        with self.lock:
+            self.cache[key] = score
+            self.cache.move_to_end(key)
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+    def score(self, query: str, candidates: List[Dict]) -> int:
+        """Sets candidate['rerank_score'] on every candidate. Returns how many came from the cache."""
+        # Keyed on the text, not the chunk ID: a re-indexed chunk keeps its ID but may change text.
+        keys = [(query, hashlib.sha1(c['text'].encode("utf-8")).digest()) for c in candidates]
+        missing = []
+        for i, key in enumerate(keys):
+            cached = self._cache_get(key)
+            if cached is None:
+                missing.append(i)
+            else:
+                candidates[i]['rerank_score'] = cached
+
+        if missing:
+            pairs = [[query, candidates[i]['text']] for i in missing]
+            with span("cross_encoder") as s:
+                s.add(pairs=len(pairs))
+                scores = self.model.predict(pairs, batch_size=self.batch_size, show_progress_bar=False)
+            for i, s in zip(missing, scores):
+                candidates[i]['rerank_score'] = float(s)
+                self._cache_put(keys[i], float(s))
+        return len(candidates) - len(missing)
+
+    def rerank(self, query: str, candidates: List[Dict], top_k: int = None) -> List[Dict]:
+        """Returns the top_k candidates (all if None) by cross-encoder score, best first."""
+        if not candidates:
+            return []
+        start = time.perf_counter()
+        with span("rerank", model=self.model_name) as s:
+            if self.cascade_keep and len(candidates) > self.cascade_keep:
+                candidates = heapq.nsmallest(self.cascade_keep, candidates, key=first_stage_rank_key)
+
+            cached = self.score(query, candidates)
+            k = len(candidates) if top_k is None else top_k
+            ranked = heapq.nlargest(k, candidates, key=lambda c: c['rerank_score'])
+            s.add(candidates=len(candidates), cache_hits=cached, scored=len(candidates) - cached)
+
+        elapsed = time.perf_counter() - start
+        self.latencies.append(elapsed)
+        print(f"Reranked {len(candidates)} candidates in {elapsed * 1000:.1f} ms ({cached} cached).")
+        return ranked
+
+    def latency_stats(self) -> Dict:
+        if not self.latencies:
+            return {"calls": 0}
+        ordered = sorted(self.latencies)
+        return {
+            "calls": len(ordered),
+            "mean_ms": 1000 * sum(ordered) / len(ordered),
+            "p50_ms": 1000 * ordered[len(ordered) // 2],
+            "max_ms": 1000 * ordered[-1],
+        }
@@ -1,37 +1,110 @@
 import sys
 import os
-from typing import List, Dict
-from rank_bm25 import BM25Okapi
+from typing import List, Dict, Optional
 import numpy as np
-from sentence_transformers import CrossEncoder
 
 # Add project root to sys.path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 from config.config import Config
 from src.embedding.vector_store import VectorEngine
-# Import LLMClient locally to avoid circular imports if generator imports retriever
+from src.retrieval.sparse_index import SparseIndex
+from src.retrieval.fusion import reciprocal_rank_fusion, weighted_fusion
+from src.retrieval.filters import resolve_paper_ids, chroma_where
+from src.ingestion.catalog import PaperMetadata, shared_catalog
+from src.tracing.tracer import span
+from src.retrieval.reranker import RerankEngine
+# Import LLMClient from its own module to avoid circular imports if generator imports retriever
 # But here we need it for query expansion.
-from src.generation.generator import LLMClient
+from src.generation.llm_client import LLMClient
+from src.generation.response_cache import SemanticCache
+
+STRATEGIES = ("hyde", "complex", "naive", "hybrid")
 
 class HybridRetriever:
     def __init__(self, vector_engine: VectorEngine):
         self.vector_engine = vector_engine
-        self.bm25 = None
-        self.documents = [] # List of text chunks for BM25
-        self.doc_metadatas = [] # Parallel list of metadatas
-        self.cross_encoder = CrossEncoder(Config.CROSS_ENCODER_MODEL)
+        self.sparse_index = SparseIndex() # Persisted by `index`, memory-mapped on first hybrid query
+        self.documents = {} # id -> chunk, only for indexes fitted in memory via fit_bm25
+        self.reranker = RerankEngine()
         self.llm_client = LLMClient()
+        self.semantic_cache = SemanticCache() if Config.HYDE_SEMANTIC_CACHE else None
         
     def fit_bm25(self, chunks: List[Dict]):
         """
-        Initialize/Fit BM25 on the current set of chunks.
+        Fits an in-memory BM25 index on the given chunks instead of the persisted one.
         """
-        self.documents = [chunk['text'] for chunk in chunks]
-        self.doc_metadatas = [chunk['metadata'] for chunk in chunks]
-        tokenized_corpus = [doc.split(" ") for doc in self.documents]
-        self.bm25 = BM25Okapi(tokenized_corpus)
+        self.documents = {chunk['id']: chunk for chunk in chunks}
+        self.sparse_index = SparseIndex.build(
+            ((chunk['id'], chunk['text'], chunk['metadata'].get('paper_id', '')) for chunk in chunks), path=None
+        )
         print("BM25 index fitted.")
 
+    @staticmethod
+    def _join(metadatas: List[Dict]) -> List[PaperMetadata]:
+        """Stored chunk metadata only carries paper_id; title, authors etc. are read from the catalog on access."""
+        catalog = shared_catalog()
+        return [meta if isinstance(meta, PaperMetadata) else PaperMetadata(meta, catalog) for meta in metadatas]
+
+    def _to_candidates(self, results: Dict) -> List[Dict]:
+        """Flattens a single-query Chroma result into candidate dicts."""
+        return [
+            {"id": doc_id, "text": text, "metadata": meta, "score": dist, "source": "vector"}
+            for doc_id, text, meta, dist in zip(results['ids'][0], results['documents'][0],
+                                                self._join(results['metadatas'][0]), results['distances'][0])
+        ]
+
+    def _fuse_sub_questions(self, results: Dict, n_queries: int) -> List[Dict]:
+        """
+        Merges per-sub-question result lists with reciprocal rank fusion, so chunks that rank well
+        for several sub-questions come first. Each candidate keeps its rank per sub-question
+        ('sub_ranks') and its best vector distance ('score').
+        """
+        if not results:
+            return []
+        ranked_lists = []
+        candidate_map = {}
+        for q in range(n_queries):
+            single = {key: [results[key][q]] for key in ('ids', 'documents', 'metadatas', 'distances')}
+            ranked = self._to_candidates(single)
+            ranked_lists.append([c['id'] for c in ranked])
+            for rank, candidate in enumerate(ranked, start=1):
+                merged = candidate_map.setdefault(candidate['id'], dict(candidate, sub_ranks={}))
+                merged['sub_ranks'][q] = rank
+                merged['score'] = min(merged['score'], candidate['score'])
+
+        fused = reciprocal_rank_fusion(ranked_lists, k=Config.RRF_K)
+        for doc_id, candidate in candidate_map.items():
+            candidate['fused_score'] = fused[doc_id]
+        return sorted(candidate_map.values(), key=lambda c: c['fused_score'], reverse=True)
+
+    def _lookup_chunks(self, ids: List[str]) -> List[Dict]:
+        if self.documents:
+            return [self.documents[i] for i in ids if i in self.documents]
+        return self.vector_engine.get_chunks(ids)
+
+    def _fuse(self, vector_candidates: List[Dict], sparse_hits: List[Dict], alpha: float, limit: int) -> List[Dict]:
+        """
+        Merges the vector and BM25 legs into one candidate list, best fused score first.
+        'rrf' uses ranks only; 'weighted' mixes min-max normalized scores as alpha * vector + (1 - alpha) * bm25.
+        """
+        if Config.HYBRID_FUSION == "weighted":
+            vector_scores = {c['id']: -c['score'] for c in vector_candidates} # distance: lower is better
+            sparse_scores = {h['id']: h['score'] for h in sparse_hits}
+            fused = weighted_fusion([vector_scores, sparse_scores], [alpha, 1 - alpha])
+        else:
+            fused = reciprocal_rank_fusion(
+                [[c['id'] for c in vector_candidates], [h['id'] for h in sparse_hits]], k=Config.RRF_K
+            )
+
+        top_ids = sorted(fused, key=fused.get, reverse=True)[:limit]
+        by_id = {c['id']: c for c in vector_candidates}
+        sparse_only = [doc_id for doc_id in top_ids if doc_id not in by_id]
+        sparse_chunks = self._lookup_chunks(sparse_only)
+        for chunk, meta in zip(sparse_chunks, self._join([chunk['metadata'] for chunk in sparse_chunks])):
+            by_id[chunk['id']] = {"id": chunk['id'], "text": chunk['text'], "metadata": meta,
+                                  "score": None, "source": "bm25"}
+        return [dict(by_id[doc_id], fused_score=fused[doc_id]) for doc_id in top_ids if doc_id in by_id]
+
     def generate_hypothetical_answer(self, query: str) -> str:
         """
         HyDE (Hypothetical Document Embeddings): Generates a fake answer to the query.
@@ -47,8 +120,22 @@ class HybridRetriever:
         
         HYPOTHETICAL ANSWER:
         """
-        response = self.llm_client.generate(prompt).strip()
-        return response
+        with span("hyde") as s:
+            if self.semantic_cache is None:
+                return self.llm_client.generate(prompt).strip()
+
+            # Near-duplicate queries (same model, same embedder) reuse an earlier hypothetical answer.
+            namespace = f"hyde|{self.llm_client.provider}|{self.llm_client.model}|{self.vector_engine.embedder.signature()}"
+            query_vector = self.vector_engine.embedder.embed([query])[0]
+            cached = self.semantic_cache.lookup(namespace, query_vector)
+            if cached is not None:
+                print("Reusing the HyDE answer of a near-duplicate query.")
+                s.add(semantic_cache_hits=1)
+                return cached
+            response = self.llm_client.generate(prompt).strip()
+            if response and not response.startswith("Error calling"):
+                self.semantic_cache.put(namespace, query_vector, response)
+            return response
 
     def generate_sub_questions(self, query: str) -> List[str]:
         """
@@ -67,42 +154,43 @@ class HybridRetriever:
         
         SUB-QUESTIONS (one per line):
         """
-        response = self.llm_client.generate(prompt)
-        sub_questions = [q.strip().strip('- 123.') for q in response.split('\n') if q.strip()]
+        with span("decompose") as s:
+            response = self.llm_client.generate(prompt)
+            sub_questions = [q.strip().strip('- 123.') for q in response.split('\n') if q.strip()]
+            s.add(sub_questions=len(sub_questions[:3]))
         return sub_questions[:3]
 
-    def retrieve(self, query: str, top_k=Config.TOP_K, alpha=0.5, strategy="hyde") -> List[Dict]:
+    def retrieve(self, query: str, top_k=Config.TOP_K, alpha=0.5, strategy="hyde", filters: Optional[Dict] = None) -> List[Dict]:
         """
         Retrieval Strategy Dispatcher.
         strategies: 'hyde' (default), 'complex' (decomposition), 'naive' (simple vector), 'hybrid' (vector+bm25)
+        alpha: weight of the vector leg when HYBRID_FUSION is 'weighted'.
+        filters: {"year_min", "year_max", "author", "paper_id"}; every strategy only searches matching papers.
         """
+        with span("retrieve", strategy=strategy, top_k=top_k) as s:
+            results = self._retrieve(query, top_k, alpha, strategy, filters)
+            s.add(results=len(results))
+            return results
+
+    def _retrieve(self, query: str, top_k: int, alpha: float, strategy: str, filters: Optional[Dict]) -> List[Dict]:
         candidates = []
+        # Filters are resolved against the catalog once; the vector store only sees the `where` clause.
+        where = None
+        if filters:
+            paper_ids = resolve_paper_ids(filters)
+            if paper_ids is not None and not paper_ids:
+                print("No indexed paper matches the filters.")
+                return []
+            where = chroma_where(filters, paper_ids)
         
         if strategy == "complex":
             print(f"Strategy: Sub-Question Decomposition for '{query}'")
             sub_qs = self.generate_sub_questions(query)
             print(f"Sub-questions: {sub_qs}")
             
-            # Retrieve for each sub-question
-            candidate_map = {}
-            for sub_q in sub_qs:
-                # Recursive call with simple strategy for sub-questions
-                sub_results = self.vector_engine.query(sub_q, n_results=top_k * 2)
-                v_docs = sub_results['documents'][0]
-                v_metas = sub_results['metadatas'][0]
-                v_dists = sub_results['distances'][0]
-                v_ids = sub_results['ids'][0]
-                
-                for i in range(len(v_docs)):
-                    doc_id = v_ids[i]
-                    if doc_id not in candidate_map:
-                        candidate_map[doc_id] = {
-                            "text": v_docs[i],
-                            "metadata": v_metas[i],
-                            "score": v_dists[i],
-                            "source": "vector"
-                        }
-            candidates = list(candidate_map.values())
+            # All sub-questions are embedded together and searched in a single round trip.
+            sub_results = self.vector_engine.query_many(sub_qs, n_results=top_k * 2, where=where) if sub_qs else None
+            candidates = self._fuse_sub_questions(sub_results, len(sub_qs))
             print(f"Found {len(candidates)} unique candidates from sub-questions.")
             
         elif strategy == "hyde":
@@ -113,56 +201,38 @@ class HybridRetriever:
             
             # 2. Vector Search 
             window_size = Config.RETRIEVAL_WINDOW_SIZE
-            results = self.vector_engine.query(hyde_vector_query, n_results=window_size)
-            
-            v_docs = results['documents'][0]
-            v_metas = results['metadatas'][0]
-            v_dists = results['distances'][0]
-            
-            for i in range(len(v_docs)):
-                candidates.append({
-                    "text": v_docs[i],
-                    "metadata": v_metas[i],
-                    "score": v_dists[i],
-                    "source": "vector"
-                })
+            results = self.vector_engine.query(hyde_vector_query, n_results=window_size, where=where)
+            candidates = self._to_candidates(results)
+
+        elif strategy == "hybrid":
+            window_size = Config.RETRIEVAL_WINDOW_SIZE
+            vector_candidates = self._to_candidates(self.vector_engine.query(query, n_results=window_size, where=where))
+            if not self.sparse_index.exists():
+                print("No BM25 index found (run `index`); using vector results only.")
+                candidates = vector_candidates
+            else:
+                paper_ids = resolve_paper_ids(filters, include_years=True) if filters else None
+                with span("bm25_search") as s:
+                    sparse_hits = self.sparse_index.search(query, n_results=window_size, paper_ids=paper_ids)
+                    s.add(results=len(sparse_hits))
+                with span("fuse", method=Config.HYBRID_FUSION):
+                    candidates = self._fuse(vector_candidates, sparse_hits, alpha, window_size)
+                print(f"Hybrid: {len(vector_candidates)} vector + {len(sparse_hits)} BM25 hits "
+                      f"fused ({Config.HYBRID_FUSION}) into {len(candidates)} candidates.")
         
         else: # Standard/Naive
-             results = self.vector_engine.query(query, n_results=Config.RETRIEVAL_WINDOW_SIZE)
-             v_docs = results['documents'][0]
-             v_metas = results['metadatas'][0]
-             v_dists = results['distances'][0]
-             for i in range(len(v_docs)):
-                 candidates.append({
-                    "text": v_docs[i],
-                    "metadata": v_metas[i],
-                    "score": v_dists[i],
-                    "source": "vector"
-                 })
+             results = self.vector_engine.query(query, n_results=Config.RETRIEVAL_WINDOW_SIZE, where=where)
+             candidates = self._to_candidates(results)
 
         # Common Re-ranking Step
         print(f"Re-ranking {len(candidates)} candidates against original query...")
-        reranked = self._rerank(query, candidates)
-            
-        return reranked[:top_k]
+        return self._rerank(query, candidates, top_k)
 
-    def _rerank(self, query: str, candidates: List[Dict]) -> List[Dict]:
+    def _rerank(self, query: str, candidates: List[Dict], top_k: int = None) -> List[Dict]:
         """
-        Uses Cross-Encoder to re-score query-document pairs.
+        Uses Cross-Encoder to re-score query-document pairs and keeps the top_k.
         """
-        if not candidates:
-            return []
-            
-        pairs = [[query, doc['text']] for doc in candidates]
-        scores = self.cross_encoder.predict(pairs)
-        
-        # Attach new scores
-        for i, doc in enumerate(candidates):
-            doc['rerank_score'] = float(scores[i])
-            
-        # Sort by rerank score descending
-        sorted_candidates = sorted(candidates, key=lambda x: x['rerank_score'], reverse=True)
-        return sorted_candidates
+        return self.reranker.rerank(query, candidates, top_k)
 
 if __name__ == "__main__":
     # Test
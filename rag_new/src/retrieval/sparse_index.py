@@ -0,0 +1,243 @@
+import json
+import math
+import os
+import re
+import shutil
+import sys
+import time
+import unicodedata
+from collections import Counter
+from typing import List, Dict, Iterable, Optional, Set, Tuple
+import numpy as np
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from config.config import Config
+
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:[-_][a-z0-9]+)*")
+STOPWORDS = frozenset("""
+a about above after again against all also am an and any are as at be because been before being below
+between both but by can could did do does doing down during each few for from further had has have having
+he her here hers him his how i if in into is it its itself just me more most my no nor not of off on once
+only or other our ours out over own same she should so some such than that the their theirs them then there
+these they this those through to too under until up very was we were what when where which while who whom
+why will with would you your yours
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word/number tokens without stopwords; hyphenated terms ("self-healing") stay whole."""
+    text = unicodedata.normalize("NFKC", text).lower()
+    return [t for t in TOKEN_RE.findall(text) if t not in STOPWORDS and (len(t) > 1 or t.isdigit())]
+
+
+class SparseIndex:
+    """
+    BM25 over a compact on-disk inverted index.
+
+    Postings are stored as flat .npy arrays (term offsets, doc indices, term frequencies) next to a
+    JSON file with the vocabulary and chunk IDs, and are memory-mapped on first use. Every build
+    goes into its own version directory, published by rewriting the CURRENT pointer file. A query only
+    touches the posting lists of its own terms, so latency grows with their length, not the corpus.
+    Each chunk also records the paper it belongs to, so searches can be restricted to some papers.
+    """
+    def __init__(self, path: Optional[str] = Config.SPARSE_INDEX_DIR, k1: float = 1.5, b: float = 0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.loaded = False
+        self.vocab = {}
+        self.ids = []
+        self.papers = [] # paper IDs; doc_paper[i] indexes into this list (-1 = unknown paper)
+        self.doc_len = self.idf = self.offsets = self.postings = self.tfs = self.doc_paper = None
+        self.avgdl = 0.0
+        self.version = None # version directory loaded from (None = in memory)
+        self._current_mtime = None
+
+    @classmethod
+    def build(cls, docs: Iterable[Tuple[str, str, str]], path: Optional[str] = Config.SPARSE_INDEX_DIR,
+              k1: float = 1.5, b: float = 0.75) -> "SparseIndex":
+        """
+        docs: (chunk_id, text, paper_id) triples; paper_id may be empty.
+        Writes the index to path (or keeps it in memory if path is None) and returns it loaded.
+        """
+        index = cls(path, k1=k1, b=b)
+        term_postings = {}
+        ids, lengths, doc_paper = [], [], []
+        paper_index = {}
+        for doc_index, (doc_id, text, paper_id) in enumerate(docs):
+            tokens = tokenize(text)
+            ids.append(doc_id)
+            lengths.append(len(tokens))
+            doc_paper.append(paper_index.setdefault(paper_id, len(paper_index)) if paper_id else -1)
+            for term, tf in Counter(tokens).items():
+                term_postings.setdefault(term, []).append((doc_index, tf))
+
+        terms = sorted(term_postings)
+        counts = np.array([len(term_postings[t]) for t in terms], dtype=np.int64)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        postings = np.empty(offsets[-1], dtype=np.int32)
+        tfs = np.empty(offsets[-1], dtype=np.float32)
+        for i, term in enumerate(terms):
+            entries = term_postings[term]
+            postings[offsets[i]:offsets[i + 1]] = [d for d, _ in entries]
+            tfs[offsets[i]:offsets[i + 1]] = [tf for _, tf in entries]
+
+        n_docs = len(ids)
+        # Lucene-style idf stays positive even for terms present in most documents.
+        idf = np.log1p((n_docs - counts + 0.5) / (counts + 0.5)).astype(np.float32)
+
+        index.vocab = {term: i for i, term in enumerate(terms)}
+        index.ids = ids
+        index.papers = list(paper_index)
+        index.doc_paper = np.array(doc_paper, dtype=np.int32)
+        index.doc_len = np.array(lengths, dtype=np.float32)
+        index.avgdl = float(index.doc_len.mean()) if n_docs else 0.0
+        index.idf, index.offsets, index.postings, index.tfs = idf, offsets, postings, tfs
+        index.loaded = True
+        if path:
+            index._save()
+        return index
+
+    def _save(self):
+        """
+        Writes a new version directory and then switches CURRENT to it with one atomic rename.
+        Files of a published version are never rewritten, so a running reader keeps using its
+        memory-mapped arrays until it notices the new version (see load).
+        """
+        os.makedirs(self.path, exist_ok=True)
+        version = f"{time.time_ns():x}"
+        tmp_dir = os.path.join(self.path, f"v{version}.tmp")
+        os.makedirs(tmp_dir)
+        for name in ("offsets", "postings", "tfs", "doc_len", "idf", "doc_paper"):
+            np.save(os.path.join(tmp_dir, f"{name}.npy"), getattr(self, name))
+        with open(os.path.join(tmp_dir, "index.json"), "w", encoding="utf-8") as f:
+            json.dump({"version": version, "k1": self.k1, "b": self.b, "avgdl": self.avgdl, "ids": self.ids,
+                       "papers": self.papers, "vocab": self.vocab}, f)
+        os.rename(tmp_dir, os.path.join(self.path, f"v{version}"))
+
+        current_tmp = os.path.join(self.path, "CURRENT.tmp")
+        with open(current_tmp, "w", encoding="utf-8") as f:
+            f.write(version)
+        previous = self._current_version()
+        os.replace(current_tmp, os.path.join(self.path, "CURRENT"))
+        self.version = version
+        self._prune(keep={version, previous})
+        print(f"BM25 index saved: {len(self.ids)} chunks, {len(self.vocab)} terms.")
+
+    def _prune(self, keep: Set[str]):
+        """
+        Deletes older versions, keeping the previous one for readers that read CURRENT just before
+        the switch. Readers that still map deleted files keep them alive (POSIX); where the OS
+        refuses (Windows), the directory is left for the next build.
+        """
+        for name in os.listdir(self.path):
+            path = os.path.join(self.path, name)
+            if name.startswith("v") and name[1:] not in keep:
+                shutil.rmtree(path, ignore_errors=True)
+
+    def _current_version(self) -> Optional[str]:
+        try:
+            with open(os.path.join(self.path, "CURRENT"), "r", encoding="utf-8") as f:
+                return f.read().strip() or None
+        except OSError:
+            return None
+
+    def exists(self) -> bool:
+        return self.loaded or bool(self.path and os.path.exists(os.path.join(self.path, "CURRENT")))
+
+    def _changed_on_disk(self) -> bool:
+        """True when `index` has published a new version since this one was loaded (one stat() per call)."""
+        if not self.path:
+            return False
+        try:
+            mtime = os.stat(os.path.join(self.path, "CURRENT")).st_mtime_ns
+        except OSError:
+            return False
+        if mtime == self._current_mtime:
+            return False
+        self._current_mtime = mtime
+        return self._current_version() != self.version
+
+    def load(self) -> bool:
+        """
+        Memory-maps the current version on first use, and again whenever a re-index has published
+        a newer one, so a long-running process (the service) picks it up. Returns False if no
+        index has been built yet.
+        """
+        if self.loaded and not self._changed_on_disk():
+            return True
+        if not (self.path and self.exists()):
+            return self.loaded
+        version = self._current_version()
+        directory = os.path.join(self.path, f"v{version}")
+        try:
+            with open(os.path.join(directory, "index.json"), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            arrays = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r")
+                      for name in ("offsets", "postings", "tfs", "doc_len", "idf")}
+            doc_paper_path = os.path.join(directory, "doc_paper.npy")
+            # Indexes built before paper tracking know no papers: filtered searches find nothing in them.
+            arrays["doc_paper"] = (np.load(doc_paper_path, mmap_mode="r") if os.path.exists(doc_paper_path)
+                                   else np.full(len(meta["ids"]), -1, dtype=np.int32))
+        except FileNotFoundError:
+            # Pruned between reading CURRENT and opening it: a newer version is already current.
+            return self.load() if self._current_version() != version else self.loaded
+        self.k1, self.b, self.avgdl = meta["k1"], meta["b"], meta["avgdl"]
+        self.ids, self.vocab = meta["ids"], meta["vocab"]
+        self.papers = meta.get("papers", [])
+        for name, array in arrays.items():
+            setattr(self, name, array)
+        self.version = version
+        self.loaded = True
+        return True
+
+    def __len__(self) -> int:
+        return len(self.ids) if self.load() else 0
+
+    def search(self, query: str, n_results: int = Config.TOP_K, paper_ids: Optional[Set[str]] = None) -> List[Dict]:
+        """
+        Returns [{"id", "score"}] for the n_results best BM25 matches, best first.
+        With paper_ids, only chunks of those papers are scored.
+        """
+        if not self.load() or not self.ids:
+            return []
+        term_ids = [self.vocab[t] for t in dict.fromkeys(tokenize(query)) if t in self.vocab]
+        if not term_ids:
+            return []
+        allowed = None
+        if paper_ids is not None:
+            allowed = np.zeros(len(self.papers) + 1, dtype=bool) # last slot: doc_paper == -1
+            allowed[[i for i, pid in enumerate(self.papers) if pid in paper_ids]] = True
+
+        docs, contributions = [], []
+        for t in term_ids:
+            start, end = self.offsets[t], self.offsets[t + 1]
+            d = np.asarray(self.postings[start:end])
+            tf = np.asarray(self.tfs[start:end])
+            if allowed is not None:
+                keep = allowed[self.doc_paper[d]]
+                d, tf = d[keep], tf[keep]
+            norm = self.k1 * (1 - self.b + self.b * self.doc_len[d] / (self.avgdl or 1.0))
+            docs.append(d)
+            contributions.append(self.idf[t] * tf * (self.k1 + 1) / (tf + norm))
+
+        if not sum(len(d) for d in docs):
+            return []
+        unique_docs, inverse = np.unique(np.concatenate(docs), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(contributions))
+        n = min(n_results, len(unique_docs))
+        top = np.argpartition(-scores, n - 1)[:n]
+        top = top[np.argsort(-scores[top])]
+        return [{"id": self.ids[unique_docs[i]], "score": float(scores[i])} for i in top]
+
+
+if __name__ == "__main__":
+    index = SparseIndex()
+    if not index.load():
+        print("No BM25 index yet; run `python main.py index` first.")
+    else:
+        print(f"Loaded BM25 index with {len(index)} chunks.")
+        for hit in index.search("retrieval augmented generation"):
+            print(hit)
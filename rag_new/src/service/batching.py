@@ -0,0 +1,95 @@
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, List
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from config.config import Config
+
+
+class MicroBatcher:
+    """
+    Collects inputs submitted concurrently by many threads and runs them as one call.
+    A batch closes when it holds max_batch inputs or max_wait_ms after its first input arrived.
+    Submissions with different keyword arguments are never merged into the same call.
+    """
+    def __init__(self, fn: Callable, max_batch: int = Config.SERVICE_MAX_BATCH,
+                 max_wait_ms: float = Config.SERVICE_BATCH_WAIT_MS):
+        self.fn = fn # fn(inputs, kwargs) -> sequence with one result per input
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.queue = queue.Queue()
+        self.calls = 0
+        self.inputs = 0
+        self.worker = threading.Thread(target=self._run, daemon=True)
+        self.worker.start()
+
+    def submit(self, inputs: List, **kwargs):
+        """Blocks until the batch containing these inputs has run; returns their slice of the results."""
+        future = Future()
+        self.queue.put((tuple(sorted(kwargs.items())), list(inputs), future))
+        return future.result()
+
+    def _collect(self) -> List:
+        batch = [self.queue.get()]
+        size = len(batch[0][1])
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self.queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(item)
+            size += len(item[1])
+        return batch
+
+    def _run(self):
+        while True:
+            groups = {}
+            for key, inputs, future in self._collect():
+                groups.setdefault(key, []).append((inputs, future))
+            for key, items in groups.items():
+                merged = [x for inputs, _ in items for x in inputs]
+                try:
+                    results = self.fn(merged, dict(key))
+                except Exception as e:
+                    for _, future in items:
+                        future.set_exception(e)
+                    continue
+                self.calls += 1
+                self.inputs += len(merged)
+                offset = 0
+                for inputs, future in items:
+                    future.set_result(results[offset:offset + len(inputs)])
+                    offset += len(inputs)
+
+    def stats(self) -> Dict:
+        return {"calls": self.calls, "inputs": self.inputs,
+                "mean_batch": self.inputs / self.calls if self.calls else 0.0}
+
+
+class BatchedModel:
+    """
+    Wraps a model so that concurrent calls to one method (e.g. SentenceTransformer.encode,
+    CrossEncoder.predict) share a single forward pass. Every other attribute is the model's own.
+    """
+    def __init__(self, model, method: str, max_batch: int = Config.SERVICE_MAX_BATCH,
+                 max_wait_ms: float = Config.SERVICE_BATCH_WAIT_MS):
+        self.model = model
+        self.method = method
+        self.batcher = MicroBatcher(self._call, max_batch=max_batch, max_wait_ms=max_wait_ms)
+
+    def _call(self, inputs: List, kwargs: Dict):
+        return getattr(self.model, self.method)(inputs, **kwargs)
+
+    def __getattr__(self, name):
+        if name == self.method:
+            return self.batcher.submit
+        return getattr(self.model, name)
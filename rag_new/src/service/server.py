@@ -0,0 +1,218 @@
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Dict, Optional
+import numpy as np
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from config.config import Config
+from src.models.registry import ModelRegistry, warm_up, embedding_model, cross_encoder
+from src.service.batching import BatchedModel
+from src.embedding.vector_store import VectorEngine
+from src.retrieval.retriever import HybridRetriever, STRATEGIES
+from src.retrieval.filters import normalize_filters
+from src.generation.generator import RAGGenerator
+from src.ingestion.catalog import PaperMetadata, paper_table
+from src.tracing.tracer import span
+
+
+def percentiles(seconds: List[float]) -> Dict:
+    if not seconds:
+        return {"count": 0}
+    p50, p95, p99 = np.percentile(np.asarray(seconds) * 1000, [50, 95, 99])
+    return {"count": len(seconds), "p50_ms": float(p50), "p95_ms": float(p95), "p99_ms": float(p99)}
+
+
+def _json_default(obj):
+    # Chunks are sent with their stored fields only; the paper fields go once into the "papers" table.
+    if isinstance(obj, PaperMetadata):
+        return obj.compact()
+    # numpy scalars and arrays end up in chunk scores
+    if hasattr(obj, "tolist"):
+        return obj.tolist()
+    return str(obj)
+
+
+class RAGService:
+    """
+    Keeps one VectorEngine, HybridRetriever and RAGGenerator (and their models, Chroma client and
+    BM25 index) warm across requests. With batching on, concurrent requests share embedding and
+    cross-encoder forward passes through micro-batching wrappers installed in the ModelRegistry.
+    An `index` run in another process is picked up on the next request: the vector store is
+    re-opened when the index manifest changes, and the BM25 index when its version does. Chroma
+    keeps its HNSW segments cached per process, so with that backend restart the service instead.
+    """
+    def __init__(self, batching: bool = True):
+        Config.ensure_dirs()
+        self.load_times = warm_up()
+        self.batched = {}
+        if batching:
+            self.batched = {
+                "embedding": BatchedModel(embedding_model(), "encode"),
+                "cross_encoder": BatchedModel(cross_encoder(), "predict"),
+            }
+            ModelRegistry.register("embedding", Config.EMBEDDING_MODEL_NAME, self.batched["embedding"])
+            ModelRegistry.register("cross_encoder", Config.CROSS_ENCODER_MODEL, self.batched["cross_encoder"])
+        self.generation = self._index_generation()
+        self.vector_engine = VectorEngine()
+        self.retriever = HybridRetriever(self.vector_engine)
+        self.retriever.sparse_index.load()
+        self.generator = RAGGenerator()
+        self.latencies = {} # endpoint -> recent request durations in seconds
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def _index_generation():
+        """mtime of the index manifest, which every `index` run rewrites after storing chunks."""
+        try:
+            return os.stat(Config.INDEX_MANIFEST_PATH).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def refresh(self) -> bool:
+        """Re-opens the vector store if the index changed on disk since it was opened."""
+        generation = self._index_generation()
+        if generation == self.generation:
+            return False
+        with self.lock:
+            if generation != self.generation:
+                # Requests in flight keep the old engine; the embedder and its cache carry over.
+                self.vector_engine = VectorEngine(embedder=self.vector_engine.embedder)
+                self.retriever.vector_engine = self.vector_engine
+                self.generation = generation
+                print("Index changed on disk, vector store re-opened.")
+        return True
+
+    def record(self, endpoint: str, seconds: float):
+        with self.lock:
+            self.latencies.setdefault(endpoint, deque(maxlen=Config.SERVICE_LATENCY_WINDOW)).append(seconds)
+
+    def retrieve(self, query: str, top_k: int = Config.TOP_K, strategy: str = "hyde", alpha: float = 0.5,
+                 filters: Optional[Dict] = None) -> List[Dict]:
+        self.refresh()
+        return self.retriever.retrieve(query, top_k=top_k, alpha=alpha, strategy=strategy, filters=filters)
+
+    def generate(self, query: str, strategy: str = "hyde", top_k: int = 5, filters: Optional[Dict] = None) -> Dict:
+        context = self.retrieve(query, top_k=top_k, strategy=strategy, filters=filters)
+        review = self.generator.generate_review(query, context)
+        sources = list(dict.fromkeys(c['metadata'].get('title', 'Unknown') for c in context))
+        return {"review": review, "strategy": strategy, "num_papers": len(sources), "sources": sources,
+                "context": context, "papers": paper_table(context)}
+
+    def stats(self) -> Dict:
+        with self.lock:
+            endpoints = {name: percentiles(list(values)) for name, values in self.latencies.items()}
+        return {
+            "endpoints": endpoints,
+            "batching": {kind: model.batcher.stats() for kind, model in self.batched.items()},
+            "model_load_seconds": self.load_times,
+            "embedding_cache": self.vector_engine.embedder.cache_stats(),
+            "rerank": self.retriever.reranker.latency_stats(),
+            "llm": {
+                "retriever": self.retriever.llm_client.latency_summary(),
+                "generator": self.generator.llm.latency_summary(),
+            },
+        }
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    """
+    JSON over HTTP: POST /retrieve, POST /generate, GET /stats, GET /health.
+    POST bodies: {"query", "strategy", "top_k", "filters": {"year_min", "year_max", "author", "paper_id"}}.
+    Chunk metadata is sent compact (paper_id, page, offsets); "papers" maps each paper_id to its
+    title, authors, year, url and filepath once per response.
+    """
+    server_version = "NexusRAG/1.0"
+
+    def _send(self, status: int, body: Dict):
+        data = json.dumps(body, default=_json_default).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send(200, {"status": "ok"})
+        elif self.path == "/stats":
+            self._send(200, self.server.service.stats())
+        else:
+            self._send(404, {"error": f"Unknown endpoint: {self.path}"})
+
+    @staticmethod
+    def _arguments(path: str, payload) -> Dict:
+        """Checked keyword arguments for the endpoint's RAGService method; raises ValueError / TypeError for a bad request."""
+        if not isinstance(payload, dict):
+            raise ValueError("The request body must be a JSON object")
+        query = payload.get("query")
+        if not isinstance(query, str) or not query.strip():
+            raise ValueError("'query' is required")
+        strategy = payload.get("strategy", "hyde")
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown strategy: {strategy} (choose from {', '.join(STRATEGIES)})")
+        top_k = int(payload.get("top_k", Config.TOP_K if path == "/retrieve" else 5))
+        if top_k < 1:
+            raise ValueError("'top_k' must be at least 1")
+        filters = payload.get("filters")
+        if filters is not None and not isinstance(filters, dict):
+            raise ValueError("'filters' must be an object")
+        arguments = {"query": query.strip(), "strategy": strategy, "top_k": top_k, "filters": normalize_filters(filters)}
+        if path == "/retrieve":
+            arguments["alpha"] = float(payload.get("alpha", 0.5))
+        return arguments
+
+    def do_POST(self):
+        if self.path not in ("/retrieve", "/generate"):
+            self._send(404, {"error": f"Unknown endpoint: {self.path}"})
+            return
+        start = time.perf_counter()
+        # Only a malformed request is the client's fault (400); anything failing after it is checked is a 500.
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            arguments = self._arguments(self.path, json.loads(self.rfile.read(length) or b"{}"))
+        except (ValueError, TypeError) as e: # malformed JSON, numbers, strategy or filters
+            self._send(400, {"error": str(e)})
+            return
+        service = self.server.service
+        try:
+            with span("request", endpoint=self.path):
+                if self.path == "/retrieve":
+                    results = service.retrieve(**arguments)
+                    body = {"results": results, "papers": paper_table(results)}
+                else:
+                    body = service.generate(**arguments)
+        except Exception as e:
+            self._send(500, {"error": str(e)})
+            return
+        elapsed = time.perf_counter() - start
+        service.record(self.path.lstrip("/"), elapsed)
+        body["latency_ms"] = elapsed * 1000
+        self._send(200, body)
+
+    def log_message(self, format, *args):
+        pass # one access-log line per request would flood the console under load
+
+
+def serve(host: str = Config.SERVICE_HOST, port: int = Config.SERVICE_PORT, service: RAGService = None):
+    service = service or RAGService()
+    server = ThreadingHTTPServer((host, port), ServiceHandler)
+    server.daemon_threads = True
+    server.service = service
+    print(f"RAG service listening on http://{host}:{port} (POST /retrieve, POST /generate, GET /stats)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nShutting down...")
+    finally:
+        server.server_close()
+        service.vector_engine.embedder.flush()
+
+
+if __name__ == "__main__":
+    serve()
@@ -0,0 +1,226 @@
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import List, Dict, Optional
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from config.config import Config
+
+
+class Span:
+    """One timed stage: wall-clock start/end, counters (items, tokens, cache hits) and nested child spans."""
+    __slots__ = ("name", "start", "end", "counts", "attrs", "children", "thread")
+
+    def __init__(self, name: str, attrs: Dict, start: Optional[float] = None):
+        self.name = name
+        self.start = time.perf_counter() if start is None else start
+        self.end = None
+        self.counts = {}
+        self.attrs = attrs
+        self.children = []
+        self.thread = threading.current_thread().name
+
+    def add(self, **counts):
+        """Adds to the span's counters, e.g. span.add(chunks=len(batch), completion_tokens=n); None is ignored."""
+        for key, value in counts.items():
+            if value is not None:
+                self.counts[key] = self.counts.get(key, 0) + value
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    @property
+    def seconds(self) -> float:
+        return (self.end if self.end is not None else time.perf_counter()) - self.start
+
+    def to_dict(self, origin: float) -> Dict:
+        return {
+            "name": self.name,
+            "start_ms": (self.start - origin) * 1000,
+            "duration_ms": self.seconds * 1000,
+            "thread": self.thread,
+            "counts": self.counts,
+            "attrs": self.attrs,
+            "children": [child.to_dict(origin) for child in list(self.children)],
+        }
+
+
+class _NullSpan:
+    """Stands in for a span while tracing is off, so instrumented code needs no checks."""
+    def add(self, **counts):
+        pass
+
+    def set(self, **attrs):
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Tracer:
+    """
+    Collects nested spans per thread. Off by default (spans then cost one context manager and
+    record nothing); `enable()` turns it on, e.g. for `main.py <command> --profile`.
+
+    A span opened inside another one on the same thread becomes its child. Work handed to a
+    thread pool passes `parent=` explicitly, and stages that ran in worker processes (PDF parsing
+    and chunking) are added afterwards with `record`.
+    """
+    def __init__(self, max_roots: int = Config.TRACE_MAX_ROOTS):
+        self.enabled = False
+        self.roots = deque(maxlen=max_roots) # a long-running service keeps only the latest traces
+        self.origin = time.perf_counter()
+        self.started = time.time()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def enable(self):
+        self.enabled = True
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.roots.clear()
+            self.origin = time.perf_counter()
+            self.started = time.time()
+
+    def _stack(self) -> List[Span]:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def current(self):
+        """The innermost open span of this thread (a no-op span when there is none or tracing is off)."""
+        stack = self._stack() if self.enabled else None
+        return stack[-1] if stack else NULL_SPAN
+
+    def _attach(self, span: Span, parent: Optional[Span]):
+        with self._lock:
+            (parent.children if isinstance(parent, Span) else self.roots).append(span)
+
+    @contextmanager
+    def span(self, name: str, parent: Optional[Span] = None, **attrs):
+        """
+        with tracer.span("rerank", candidates=50) as s: ... s.add(cached=12)
+        parent: the span to nest under when running on another thread than the parent's.
+        """
+        if not self.enabled:
+            yield NULL_SPAN
+            return
+        stack = self._stack()
+        span = Span(name, attrs)
+        self._attach(span, parent if parent is not None else (stack[-1] if stack else None))
+        stack.append(span)
+        try:
+            yield span
+        finally:
+            span.end = time.perf_counter()
+            stack.pop()
+
+    def record(self, name: str, seconds: float, parent: Optional[Span] = None, counts: Optional[Dict] = None, **attrs):
+        """Adds a span that ended just now after `seconds`, measured elsewhere (e.g. in a worker process)."""
+        if not self.enabled:
+            return
+        stack = self._stack()
+        end = time.perf_counter()
+        span = Span(name, attrs, start=end - seconds)
+        span.end = end
+        span.add(**(counts or {}))
+        self._attach(span, parent if parent is not None else (stack[-1] if stack else None))
+
+    def summary(self) -> List[Dict]:
+        """
+        Aggregates spans by their path of names (e.g. "generate/refine/llm"), in first-seen order:
+        calls, total / self / percentile milliseconds and summed counters.
+        Self time is the span's time not covered by its children (children running in parallel
+        can cover more than the parent, so it is clipped at zero).
+        """
+        groups = {}
+
+        def visit(span: Span, path: str, depth: int):
+            group = groups.setdefault(path, {"span": path, "name": span.name, "depth": depth,
+                                             "durations": [], "self_ms": 0.0, "counts": {}})
+            children = list(span.children)
+            total = span.seconds * 1000
+            group["durations"].append(total)
+            group["self_ms"] += max(0.0, total - sum(child.seconds * 1000 for child in children))
+            for key, value in span.counts.items():
+                group["counts"][key] = group["counts"].get(key, 0) + value
+            for child in children:
+                visit(child, f"{path}/{child.name}", depth + 1)
+
+        with self._lock:
+            roots = list(self.roots)
+        for root in roots:
+            visit(root, root.name, 0)
+
+        rows = []
+        for group in groups.values():
+            durations = sorted(group.pop("durations"))
+            n = len(durations)
+            group.update(calls=n, total_ms=sum(durations), mean_ms=sum(durations) / n,
+                         p50_ms=durations[(n - 1) // 2], p95_ms=durations[min(n - 1, int(0.95 * n))],
+                         max_ms=durations[-1])
+            rows.append(group)
+        return rows
+
+    def format_summary(self) -> str:
+        lines = [f"{'span':<36} {'calls':>6} {'total ms':>10} {'self ms':>10} {'p50 ms':>9} {'p95 ms':>9}  counts"]
+        for row in self.summary():
+            label = "  " * row["depth"] + row["name"]
+            counts = " ".join(f"{key}={value:g}" for key, value in row["counts"].items())
+            lines.append(f"{label:<36} {row['calls']:>6} {row['total_ms']:>10.1f} {row['self_ms']:>10.1f} "
+                         f"{row['p50_ms']:>9.1f} {row['p95_ms']:>9.1f}  {counts}")
+        return "\n".join(lines)
+
+    def _trace_events(self) -> List[Dict]:
+        """Chrome trace-event ("X" complete events), so the file also opens in Perfetto / chrome://tracing."""
+        threads = {}
+        events = []
+
+        def visit(span: Span):
+            events.append({
+                "name": span.name, "ph": "X", "pid": os.getpid(),
+                "tid": threads.setdefault(span.thread, len(threads) + 1),
+                "ts": (span.start - self.origin) * 1e6, "dur": span.seconds * 1e6,
+                "args": dict(span.attrs, **span.counts),
+            })
+            for child in list(span.children):
+                visit(child)
+
+        for root in list(self.roots):
+            visit(root)
+        return events
+
+    def export(self, path: str, **info) -> str:
+        """Writes {"started", "info", "spans" (tree), "summary", "traceEvents"} as JSON and returns the path."""
+        with self._lock:
+            roots = list(self.roots)
+        trace = {
+            "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)),
+            "info": info,
+            "spans": [root.to_dict(self.origin) for root in roots],
+            "summary": self.summary(),
+            "traceEvents": self._trace_events(),
+        }
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(trace, f, indent=1, default=str)
+        return path
+
+
+TRACER = Tracer() # process-wide; every instrumented module records into this one
+
+
+def span(name: str, parent: Optional[Span] = None, **attrs):
+    return TRACER.span(name, parent=parent, **attrs)
+
+
+def current_span():
+    return TRACER.current()
@@ -0,0 +1,13 @@
+import os
+import sys
+import tempfile
+
+# Tests import the project as the scripts do (from config.config ..., from src ...), plus the
+# offline stand-ins in benchmarks/stubs.py.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+# Every data/output path goes to a scratch folder, before any src module binds them as defaults.
+from bench_pipeline import isolate
+isolate(tempfile.mkdtemp(prefix="nexusrag_tests_"))
@@ -0,0 +1,121 @@
+import numpy as np
+import pytest
+
+from src.embedding.backends import LocalBackend, faiss_available, where_sql
+
+needs_faiss = pytest.mark.skipif(not faiss_available(), reason="faiss-cpu is not installed")
+
+
+def corpus(n: int = 3000, dim: int = 64, seed: int = 0):
+    """Seeded unit vectors around 30 topic centres, like embeddings of papers on a few subjects."""
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(30, dim))
+    x = centres[rng.integers(0, 30, n)] + 0.6 * rng.normal(size=(n, dim))
+    x /= np.linalg.norm(x, axis=1, keepdims=True)
+    picks = rng.choice(n, min(n, 50), replace=False)
+    queries = x[picks] + 0.1 * rng.normal(size=(len(picks), dim))
+    return x.astype(np.float32), queries.astype(np.float32)
+
+
+def fill(backend: LocalBackend, x: np.ndarray):
+    ids = [f"c{i}" for i in range(len(x))]
+    metadatas = [{"paper_id": f"p{i % 10}", "year": 2015 + i % 10} for i in range(len(x))]
+    backend.upsert(ids, x, [f"chunk {i}" for i in range(len(x))], metadatas)
+    return ids
+
+
+def exact_top_k(x: np.ndarray, queries: np.ndarray, k: int, rows=None):
+    rows = np.arange(len(x)) if rows is None else np.asarray(rows)
+    dist = ((queries[:, None, :] - x[rows][None, :, :]) ** 2).sum(axis=2)
+    return rows[np.argsort(dist, axis=1)[:, :k]]
+
+
+def recall(results, truth) -> float:
+    found = [{int(doc_id[1:]) for doc_id in ids} for ids in results["ids"]]
+    return float(np.mean([len(f & set(t)) / len(t) for f, t in zip(found, truth)]))
+
+
+def test_flat_search_is_exact(tmp_path):
+    x, queries = corpus()
+    backend = LocalBackend("test", path=str(tmp_path), index_type="flat")
+    fill(backend, x)
+    results = backend.query(queries, n_results=10)
+    assert recall(results, exact_top_k(x, queries, 10)) == 1.0
+    expected = ((queries[0] - x[int(results["ids"][0][0][1:])]) ** 2).sum()
+    assert results["distances"][0][0] == pytest.approx(expected, abs=1e-5)
+    assert results["distances"][0] == sorted(results["distances"][0])
+
+
+@needs_faiss
+@pytest.mark.parametrize("index_type", ["hnsw", "ivf"])
+def test_ann_search_finds_the_exact_neighbours(tmp_path, index_type):
+    x, queries = corpus()
+    backend = LocalBackend("test", path=str(tmp_path), index_type=index_type, nlist=32, nprobe=8, min_ann_rows=0)
+    fill(backend, x)
+    assert recall(backend.query(queries, n_results=10), exact_top_k(x, queries, 10)) >= 0.9
+    # saved with the data version, and loaded by the next process instead of being rebuilt
+    reopened = LocalBackend("test", path=str(tmp_path), index_type=index_type, nlist=32, nprobe=8, min_ann_rows=0)
+    assert reopened.query(queries, n_results=10)["ids"] == backend.query(queries, n_results=10)["ids"]
+
+
+def test_where_clause_restricts_the_search(tmp_path):
+    x, queries = corpus(n=500)
+    backend = LocalBackend("test", path=str(tmp_path), index_type="flat")
+    fill(backend, x)
+    where = {"$and": [{"year": {"$gte": 2020}}, {"paper_id": {"$in": ["p5", "p7"]}}]}
+    results = backend.query(queries, n_results=5, where=where)
+    matching = [i for i in range(len(x)) if i % 10 in (5, 7)]
+    assert recall(results, exact_top_k(x, queries, 5, matching)) == 1.0
+    assert all(m["year"] >= 2020 and m["paper_id"] in ("p5", "p7") for ms in results["metadatas"] for m in ms)
+    assert backend.query(queries[:1], n_results=5, where={"paper_id": "p99"})["ids"] == [[]]
+
+
+def test_where_sql_translates_operators():
+    sql, params = where_sql({"$or": [{"year": {"$lt": 2000}}, {"paper_id": "p1"}]})
+    assert sql == "(json_extract(metadata, ?) < ? OR json_extract(metadata, ?) = ?)"
+    assert params == ['$."year"', 2000, '$."paper_id"', "p1"]
+    with pytest.raises(ValueError):
+        where_sql({"year": {"$regex": "19.."}})
+
+
+def test_deleted_chunks_are_never_returned_and_their_rows_reused(tmp_path):
+    x, queries = corpus(n=200)
+    backend = LocalBackend("test", path=str(tmp_path), index_type="flat")
+    ids = fill(backend, x)
+    backend.delete(ids[:100])
+    assert backend.count() == 100
+    assert backend.get(ids[:100])["ids"] == []
+    results = backend.query(queries, n_results=10)
+    assert recall(results, exact_top_k(x, queries, 10, range(100, 200))) == 1.0
+
+    backend.upsert(["new"], x[:1], ["new chunk"], [{}])
+    assert backend.next_row == 200 # took a freed row
+    assert backend.query(x[:1], n_results=1)["ids"] == [["new"]]
+
+
+def test_an_id_repeated_in_one_upsert_keeps_its_last_entry_in_one_row(tmp_path):
+    x, _ = corpus(n=3)
+    backend = LocalBackend("test", path=str(tmp_path), index_type="flat")
+    backend.upsert(["a", "b", "a"], x, ["first", "b", "last"], [{"v": 1}, {}, {"v": 3}])
+    assert backend.count() == 2
+    assert backend.next_row == 2 and not backend.free
+    assert backend.get(["a"]) == {"ids": ["a"], "documents": ["last"], "metadatas": [{"v": 3}]}
+    found = backend.query(x[2:3], n_results=2)
+    assert found["ids"] == [["a", "b"]] and found["distances"][0][0] == pytest.approx(0, abs=1e-6)
+
+
+# Sign bits rank much more coarsely than int8 codes: binary needs a longer shortlist to rescore.
+@pytest.mark.parametrize("quantization, rescore", [("int8", 4), ("binary", 10)])
+@pytest.mark.parametrize("index_type", ["flat", pytest.param("hnsw", marks=needs_faiss), pytest.param("ivf", marks=needs_faiss)])
+def test_quantized_search_with_rescoring_keeps_the_float32_recall(tmp_path, quantization, rescore, index_type):
+    x, queries = corpus(dim=128)
+    truth = LocalBackend("float", path=str(tmp_path), index_type="flat")
+    fill(truth, x)
+    exact = truth.query(queries, n_results=10)
+    backend = LocalBackend("quantized", path=str(tmp_path), index_type=index_type, nlist=32, nprobe=8,
+                           quantization=quantization, rescore=rescore, min_ann_rows=0)
+    fill(backend, x)
+    results = backend.query(queries, n_results=10)
+    assert recall(results, [[int(i[1:]) for i in ids] for ids in exact["ids"]]) >= 0.95
+    # rescored on the float vectors: the distances of what is found are the exact ones
+    assert results["distances"][0][0] == pytest.approx(exact["distances"][0][0], abs=1e-5)
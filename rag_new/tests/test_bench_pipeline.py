@@ -0,0 +1,16 @@
+from bench_pipeline import compare
+
+
+def result(commit: str, docs_per_s: float, p95: float, mrr: float) -> dict:
+    return {"meta": {"commit": commit},
+            "indexing": {"docs_per_s": docs_per_s, "chunks_per_s": 100.0, "noop_s": 0.5},
+            "strategies": {"naive": {"latency_ms": {"p50": 10.0, "p95": p95, "p99": 30.0},
+                                     "rerank": {"ms_per_call": 5.0}, "hit_rate": 1.0, "mrr": mrr}}}
+
+
+def test_compare_flags_slowdowns_beyond_tolerance_and_any_quality_drop(capsys):
+    base = result("base", docs_per_s=10.0, p95=20.0, mrr=0.8)
+    assert compare(base, result("same", docs_per_s=9.0, p95=22.0, mrr=0.8), tolerance=0.15) == []
+    regressions = compare(base, result("slow", docs_per_s=8.0, p95=30.0, mrr=0.79), tolerance=0.15)
+    assert regressions == ["indexing.docs_per_s", "strategies.naive.latency_ms.p95", "strategies.naive.mrr"]
+    assert "<-- regression" in capsys.readouterr().out
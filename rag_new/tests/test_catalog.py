@@ -0,0 +1,65 @@
+import json
+import os
+
+import pytest
+
+from config.config import Config
+from src.indexing.indexer import IncrementalIndexer
+from src.ingestion.catalog import PaperCatalog, PaperMetadata, paper_table
+
+RECORD = {"paper_id": "2401.00001", "title": "Sparse Retrieval Revisited", "authors": ["Ada Lovelace", "Alan Turing"],
+          "year": 2024, "url": "http://arxiv.org/abs/2401.00001v2", "filename": "2401.00001.pdf",
+          "summary": "A long abstract that is never copied into chunks."}
+CHUNK = {"paper_id": "2401.00001", "year": 2024, "page_start": 3, "page_end": 3, "char_start": 120, "char_end": 980}
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    catalog = PaperCatalog(str(tmp_path / "catalog.json"))
+    catalog.add(RECORD, topic="retrieval")
+    return catalog
+
+
+def test_chunks_store_only_compact_fields(tmp_path, catalog):
+    catalog.save()
+    indexer = IncrementalIndexer(None, manifest_path=str(tmp_path / "manifest.json"), catalog_path=catalog.path, dedup=False)
+    assert indexer._document_metadata(os.path.join(tmp_path, "2401.00001.pdf")) == {"paper_id": "2401.00001", "year": 2024}
+
+    metadata = PaperMetadata(CHUNK, catalog)
+    assert metadata.compact() == CHUNK
+    from src.service.server import _json_default # what the service sends for a joined chunk
+    assert json.loads(json.dumps({"metadata": metadata}, default=_json_default)) == {"metadata": CHUNK}
+
+
+def test_paper_fields_are_joined_from_the_catalog(catalog):
+    metadata = PaperMetadata(CHUNK, catalog)
+    assert metadata["title"] == "Sparse Retrieval Revisited"
+    assert metadata["authors"] == "Ada Lovelace; Alan Turing"
+    assert metadata["url"] == RECORD["url"]
+    assert metadata["filepath"] == os.path.join(Config.PAPERS_DIR, "2401.00001.pdf")
+    assert metadata["page_start"] == 3
+    assert dict(metadata) == dict(CHUNK, title=RECORD["title"], authors="Ada Lovelace; Alan Turing",
+                                  url=RECORD["url"], filepath=metadata["filepath"])
+    with pytest.raises(KeyError):
+        metadata["summary"]
+
+
+def test_papers_missing_from_the_catalog_are_titled_by_file_name(tmp_path, catalog):
+    metadata = PaperMetadata({"paper_id": "my_notes", "page_start": 1}, catalog)
+    assert metadata["title"] == "my_notes.pdf"
+    assert metadata["filepath"] == os.path.join(Config.PAPERS_DIR, "my_notes.pdf")
+    assert metadata.get("authors") is None and metadata.get("year") is None
+    indexer = IncrementalIndexer(None, manifest_path=str(tmp_path / "manifest.json"),
+                                 catalog_path=str(tmp_path / "none.json"), dedup=False)
+    assert indexer._document_metadata(os.path.join(tmp_path, "my_notes.pdf")) == {"paper_id": "my_notes"}
+
+
+def test_paper_table_lists_each_paper_once(catalog):
+    catalog.add(dict(RECORD, paper_id="2401.00002", title="Dense Retrieval", filename="2401.00002.pdf"))
+    chunks = [{"id": f"c{i}", "metadata": PaperMetadata(dict(CHUNK, paper_id=paper_id), catalog)}
+              for i, paper_id in enumerate(["2401.00001", "2401.00002", "2401.00001"])]
+    chunks.append({"id": "raw", "metadata": {"paper_id": "2401.00003"}}) # not joined: not listed
+    table = paper_table(chunks)
+    assert list(table) == ["2401.00001", "2401.00002"]
+    assert table["2401.00002"]["title"] == "Dense Retrieval"
+    assert table["2401.00001"] == chunks[0]["metadata"].paper()
@@ -0,0 +1,59 @@
+import numpy as np
+
+from src.processing.dedup import ChunkDeduplicator
+
+BASE = ("Retrieval augmented generation grounds a language model in documents fetched at query time, "
+        "so answers cite sources that can be checked and updated without retraining the model.")
+OTHER = ("Product quantization splits each vector into sub-vectors and encodes every one of them "
+         "with a small codebook, trading a little recall for a much smaller index in memory.")
+
+
+def chunks(document: str, *texts: str):
+    return [{"id": f"{document}_{i}", "text": text} for i, text in enumerate(texts)]
+
+
+def state(index: ChunkDeduplicator):
+    return (dict(index.chunks), dict(index.hashes), {key: set(ids) for key, ids in index.buckets.items()},
+            {chunk_id: signature.tobytes() for chunk_id, signature in index.signatures.items()})
+
+
+def test_duplicates_are_aliased_to_the_stored_chunk(tmp_path):
+    index = ChunkDeduplicator(str(tmp_path / "dedup.json"))
+    kept, aliases, counts = index.deduplicate(chunks("a", BASE, OTHER), document="a.pdf")
+    assert len(kept) == 2 and not aliases
+
+    near = BASE + " It helps." # shingle Jaccard 0.92, above the 0.9 default threshold
+    kept, aliases, counts = index.deduplicate(chunks("b", BASE.upper(), near, "A chunk of its own."), document="b.pdf")
+    assert [c["id"] for c in kept] == ["b_2"]
+    assert aliases == {"b_0": "a_0", "b_1": "a_0"}
+    assert (counts["exact"], counts["near"]) == (1, 1)
+
+
+def test_remove_then_add_again_restores_the_same_index(tmp_path):
+    fresh = ChunkDeduplicator(str(tmp_path / "fresh.json"))
+    fresh.deduplicate(chunks("a", BASE, OTHER), document="a.pdf")
+
+    index = ChunkDeduplicator(str(tmp_path / "dedup.json"))
+    index.deduplicate(chunks("a", BASE, OTHER), document="a.pdf")
+    kept, _, _ = index.deduplicate(chunks("b", "A chunk of its own.", BASE), document="b.pdf")
+    index.remove(c["id"] for c in kept)
+    assert state(index) == state(fresh)
+
+    # Re-indexing a document: its chunks are removed, then deduplicated again.
+    index.remove(["a_0", "a_1"])
+    assert state(index) == ({}, {}, {}, {})
+    kept, aliases, _ = index.deduplicate(chunks("a", BASE, OTHER), document="a.pdf")
+    assert len(kept) == 2 and not aliases
+    assert state(index) == state(fresh)
+
+
+def test_saved_index_loads_back(tmp_path):
+    path = str(tmp_path / "dedup.json")
+    index = ChunkDeduplicator(path)
+    index.deduplicate(chunks("a", BASE, OTHER), document="a.pdf")
+    index.save()
+
+    loaded = ChunkDeduplicator(path)
+    assert state(loaded) == state(index)
+    assert loaded.match(BASE, loaded.hasher.signature(BASE)) == ("a_0", "exact")
+    assert ChunkDeduplicator(path, threshold=0.5).ids() == set() # other settings: not reused
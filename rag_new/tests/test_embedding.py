@@ -0,0 +1,49 @@
+import sys
+import types
+
+import numpy as np
+import pytest
+
+pytest.importorskip("chromadb")
+from config.config import Config
+from src.embedding.vector_store import EmbeddingPipeline, VectorEngine
+
+
+class FakeSentenceTransformer:
+    """Embeds a text as (length, 1); records the size and settings of every encode call."""
+    calls = []
+
+    def __init__(self, name, **settings):
+        self.name = name
+
+    def encode(self, texts, batch_size, normalize_embeddings, convert_to_numpy, show_progress_bar):
+        FakeSentenceTransformer.calls.append((len(texts), batch_size, normalize_embeddings))
+        return np.array([[len(text), 1.0] for text in texts], dtype=np.float64)
+
+
+@pytest.fixture
+def embedder(request, monkeypatch):
+    monkeypatch.setitem(sys.modules, "sentence_transformers",
+                        types.SimpleNamespace(SentenceTransformer=FakeSentenceTransformer))
+    FakeSentenceTransformer.calls = []
+    # A model name of its own per test, so no model loaded elsewhere is reused.
+    return EmbeddingPipeline(model_name=f"fake/{request.node.name}", batch_size=16, num_threads=0,
+                             device="cpu", normalize=False, use_cache=False)
+
+
+def test_embed_passes_the_batch_settings_and_returns_float32(embedder):
+    vectors = embedder.embed(["a", "abc"])
+    assert vectors.dtype == np.float32
+    np.testing.assert_array_equal(vectors, [[1, 1], [3, 1]])
+    assert FakeSentenceTransformer.calls == [(2, 16, False)]
+    assert embedder.embedded == 2
+
+
+def test_chunks_are_embedded_and_upserted_in_batches(embedder, tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "DB_DIR", str(tmp_path / "vector_db"))
+    engine = VectorEngine(collection_name=f"test_{tmp_path.name}", embedder=embedder)
+    chunks = [{"id": f"x.pdf_{i}", "text": "w" * (i + 1), "metadata": {"filepath": "x.pdf"}} for i in range(5)]
+    engine.add_chunks(chunks, batch_size=2)
+    assert [size for size, _, _ in FakeSentenceTransformer.calls] == [2, 2, 1]
+    assert engine.count() == 5
+    assert engine.query("www", n_results=1)["ids"] == [["x.pdf_2"]]
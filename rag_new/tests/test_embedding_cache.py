@@ -0,0 +1,58 @@
+import numpy as np
+
+from src.embedding.cache import EmbeddingCache
+
+
+def vectors(n: int, dim: int = 8, seed: int = 0) -> np.ndarray:
+    return np.random.default_rng(seed).normal(size=(n, dim)).astype(np.float32)
+
+
+def test_a_hit_returns_the_stored_vector(tmp_path):
+    cache = EmbeddingCache("model-a", cache_dir=str(tmp_path))
+    x = vectors(2)
+    assert cache.get_many(["first chunk", "second chunk"]) == [None, None]
+    cache.put_many(["first chunk", "second chunk"], x)
+    found = cache.get_many(["second chunk", "first  chunk\n", "third chunk"]) # whitespace is normalized
+    np.testing.assert_array_equal(found[0], x[1])
+    np.testing.assert_array_equal(found[1], x[0])
+    assert found[2] is None
+    assert cache.stats()["hits"] == 2 and cache.stats()["misses"] == 3
+
+
+def test_models_do_not_share_entries(tmp_path):
+    a = EmbeddingCache("model-a", cache_dir=str(tmp_path))
+    b = EmbeddingCache("model-b", cache_dir=str(tmp_path))
+    x = vectors(2)
+    a.put_many(["same text"], x[:1])
+    assert b.get_many(["same text"]) == [None]
+    b.put_many(["same text"], x[1:])
+    np.testing.assert_array_equal(a.get_many(["same text"])[0], x[0])
+    np.testing.assert_array_equal(b.get_many(["same text"])[0], x[1])
+
+
+def test_least_recently_used_entry_is_evicted_at_capacity(tmp_path):
+    cache = EmbeddingCache("model-a", cache_dir=str(tmp_path), max_entries=3)
+    x = vectors(4)
+    cache.put_many(["a", "b", "c"], x[:3])
+    cache.get_many(["a"]) # now b is the least recently used
+    cache.put_many(["d"], x[3:])
+    found = cache.get_many(["a", "b", "c", "d"])
+    assert found[1] is None
+    for vector, expected in zip((found[0], found[2], found[3]), (x[0], x[2], x[3])):
+        np.testing.assert_array_equal(vector, expected)
+    assert cache.capacity == 3 and cache.stats()["entries"] == 3
+
+
+def test_entries_survive_a_reopen(tmp_path):
+    cache = EmbeddingCache("model-a", cache_dir=str(tmp_path), max_entries=2)
+    x = vectors(3)
+    cache.put_many(["a", "b", "c"], x) # a is evicted
+    cache.flush()
+
+    reopened = EmbeddingCache("model-a", cache_dir=str(tmp_path), max_entries=2)
+    found = reopened.get_many(["a", "b", "c"])
+    assert found[0] is None
+    np.testing.assert_array_equal(found[1], x[1])
+    np.testing.assert_array_equal(found[2], x[2])
+    reopened.put_many(["d"], vectors(1, seed=1)) # LRU order was kept too: b goes
+    assert reopened.get_many(["b"]) == [None]
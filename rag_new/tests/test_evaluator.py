@@ -0,0 +1,37 @@
+import random
+from src.evaluation.evaluator import CHARS_PER_TOKEN, Evaluator
+
+
+def test_hit_rate_and_mrr_match_chunk_ids_or_a_metadata_key():
+    retrieved = [[{"id": "p1_3", "metadata": {"paper_id": "p1"}}, {"id": "p2_0", "metadata": {"paper_id": "p2"}}],
+                 [{"id": "p3_1", "metadata": {"paper_id": "p3"}}]]
+    assert Evaluator.hit_rate(retrieved, [["p2_0"], ["p9_9"]]) == 0.5
+    assert Evaluator.mrr(retrieved, [["p2_0"], ["p9_9"]]) == 0.25
+    assert Evaluator.hit_rate(retrieved, [["p1"], ["p3"]], key="paper_id") == 1.0
+    assert Evaluator.mrr(retrieved, [["p2"], ["p3"]], key="paper_id") == 0.75
+
+
+def test_fit_context_keeps_everything_within_budget():
+    context = [{"text": "Dense retrieval works."}, "Sparse retrieval too."]
+    assert Evaluator.fit_context(context, "retrieval", max_tokens=100) == "Dense retrieval works.\nSparse retrieval too."
+    assert Evaluator.fit_context(context, "retrieval", max_tokens=0) == "Dense retrieval works.\nSparse retrieval too."
+
+
+def test_fit_context_never_exceeds_the_budget():
+    assert len(Evaluator.fit_context([f"chunk number {i}." for i in range(12)], "chunk", max_tokens=1)) <= CHARS_PER_TOKEN
+
+    rng = random.Random(0)
+    words = ["graph", "neural", "retrieval", "ranking", "sparse", "dense", "index", "query", "model", "token"]
+    for _ in range(200):
+        context = [" ".join(rng.choice(words) + ("." if rng.random() < 0.2 else "") for _ in range(rng.randint(1, 80)))
+                   for _ in range(rng.randint(1, 15))]
+        max_tokens = rng.randint(1, 120)
+        fitted = Evaluator.fit_context(context, "sparse retrieval index", max_tokens=max_tokens)
+        assert len(fitted) <= max_tokens * CHARS_PER_TOKEN
+
+
+def test_fit_context_prefers_sentences_sharing_words_with_the_answer():
+    chunk = "The weather was pleasant. BM25 scores terms by frequency. Lunch was served at noon."
+    fitted = Evaluator.fit_context([chunk, chunk.upper()], "BM25 scores terms", max_tokens=20)
+    assert "BM25 scores terms by frequency." in fitted
+    assert "weather" not in fitted
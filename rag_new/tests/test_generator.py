@@ -0,0 +1,32 @@
+import re
+
+from src.generation.generator import RAGGenerator
+
+
+class FlakyLLM:
+    """Echoes the text it is asked to refine, except that the first call about `failing` errors out."""
+    def __init__(self, failing: str):
+        self.failing = failing
+        self.prompts = []
+
+    def generate(self, prompt, parent=None):
+        self.prompts.append(prompt)
+        if self.failing in prompt and sum(self.failing in p for p in self.prompts) == 1:
+            return "Error calling Ollama: connection refused"
+        return re.search(r"TEXT:\s*(.*?)\s*RELEVANT SENTENCES:", prompt, re.S).group(1)
+
+
+def test_a_failed_refinement_keeps_the_chunk_and_is_retried():
+    generator = RAGGenerator()
+    generator.llm = FlakyLLM("sparse retrieval")
+    chunks = [{"text": "Dense retrievers embed queries and passages.", "metadata": {}},
+              {"text": "BM25 is a strong sparse retrieval baseline.", "metadata": {}}]
+
+    first = generator.refine_contexts("retrieval", chunks)
+    assert first[0]["refined"] and first[0]["text"] == chunks[0]["text"]
+    assert first[1] == chunks[1] # original text, not the error message, and not marked refined
+
+    second = generator.refine_contexts("retrieval", first)
+    assert len(generator.llm.prompts) == 3 # only the failed chunk was sent again
+    assert [c["text"] for c in second] == [c["text"] for c in chunks]
+    assert all(c["refined"] for c in second)
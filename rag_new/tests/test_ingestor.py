@@ -0,0 +1,77 @@
+import os
+import pytest
+
+pytest.importorskip("arxiv")
+from config.config import Config
+from src.ingestion.catalog import PaperCatalog
+from src.ingestion.ingestor import ArxivIngestor
+from stubs import StubArxiv
+
+
+def pdf_bytes(seed: int, size: int = 5000) -> bytes:
+    body = bytes((seed * 31 + i * 7) % 251 for i in range(size))
+    return b"%PDF-1.4\n" + body
+
+
+@pytest.fixture
+def ingestor(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "DOWNLOAD_CHUNK_SIZE", 1024)
+    monkeypatch.setattr(Config, "PAPERS_DIR", str(tmp_path / "papers"))
+    return ArxivIngestor(max_results=10, workers=2, catalog=PaperCatalog(str(tmp_path / "catalog.json")))
+
+
+def use(stub_url: str, monkeypatch):
+    monkeypatch.setattr(Config, "ARXIV_API_URL", stub_url + "/api/query")
+
+
+def test_interrupted_download_resumes_with_a_range_request(ingestor, monkeypatch):
+    pdf = pdf_bytes(1)
+    stub = StubArxiv({"2401.00001": pdf}, cut_after={"2401.00001": 3000})
+    with stub as url:
+        use(url, monkeypatch)
+        assert ingestor.search_and_download("stub") == [] # the transfer broke off
+        part_path = os.path.join(ingestor.download_dir, "2401.00001.pdf.part")
+        kept = os.path.getsize(part_path)
+        assert 0 < kept <= 3000
+
+        papers = ingestor.search_and_download("stub")
+    assert [p["paper_id"] for p in papers] == ["2401.00001"]
+    with open(papers[0]["filepath"], "rb") as f:
+        assert f.read() == pdf
+    assert not os.path.exists(part_path)
+    assert stub.requests == [("2401.00001", None), ("2401.00001", f"bytes={kept}-")]
+
+
+def test_complete_part_file_is_renamed_and_stale_one_downloaded_again(ingestor, monkeypatch):
+    complete, stale = pdf_bytes(2), pdf_bytes(3)
+    os.makedirs(ingestor.download_dir)
+    with open(os.path.join(ingestor.download_dir, "2401.00002.pdf.part"), "wb") as f:
+        f.write(complete)
+    with open(os.path.join(ingestor.download_dir, "2401.00003.pdf.part"), "wb") as f:
+        f.write(stale + b"trailing bytes of another version")
+
+    stub = StubArxiv({"2401.00002": complete, "2401.00003": stale})
+    with stub as url:
+        use(url, monkeypatch)
+        papers = ingestor.search_and_download("stub")
+    for paper, expected in zip(sorted(papers, key=lambda p: p["paper_id"]), (complete, stale)):
+        with open(paper["filepath"], "rb") as f:
+            assert f.read() == expected
+    # 416 for both; only the stale part is fetched again, from the start
+    assert sorted(stub.requests, key=str) == sorted([("2401.00002", f"bytes={len(complete)}-"),
+                                                     ("2401.00003", f"bytes={len(stale) + 33}-"),
+                                                     ("2401.00003", None)], key=str)
+
+
+def test_papers_are_deduplicated_by_arxiv_id(ingestor, monkeypatch):
+    stub = StubArxiv({"2401.00004": pdf_bytes(4), "2401.00005": pdf_bytes(5)},
+                     entries=["2401.00004v1", "2401.00004v2", "2401.00005v1"])
+    with stub as url:
+        use(url, monkeypatch)
+        first = ingestor.search_and_download("first topic")
+        second = ingestor.search_and_download("second topic")
+    assert sorted(p["paper_id"] for p in first) == ["2401.00004", "2401.00005"]
+    assert sorted(p["paper_id"] for p in second) == ["2401.00004", "2401.00005"]
+    assert len(stub.requests) == 2 # the second search finds both on disk
+    assert len(ingestor.catalog) == 2
+    assert sorted(os.listdir(ingestor.download_dir)) == ["2401.00004.pdf", "2401.00005.pdf"]
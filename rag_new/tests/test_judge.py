@@ -0,0 +1,37 @@
+import json
+
+from config.config import Config
+from src.evaluation.judge import JudgeRunner, load_triples
+from src.generation.llm_client import LLMClient
+from stubs import StubOllama
+
+
+def triples(n: int):
+    return [{"id": str(i), "query": f"question {i}", "answer": f"Answer {i} about sparse retrieval.",
+             "context": [{"text": f"Sparse retrieval scores terms, finding {i}."}]} for i in range(n)]
+
+
+def test_combined_verdicts_are_cached_and_keep_the_input_order(tmp_path, monkeypatch):
+    with StubOllama() as url:
+        monkeypatch.setattr(Config, "OLLAMA_URL", url)
+        llm = LLMClient(provider="ollama", use_cache=False)
+        judge = JudgeRunner(llm, workers=4, cache_path=str(tmp_path / "judge.sqlite3"))
+        verdicts = judge.judge_many(triples(6))
+        again = JudgeRunner(llm, workers=4, cache_path=str(tmp_path / "judge.sqlite3")).judge_many(triples(7))
+        first = triples(1)[0]
+        separate = JudgeRunner(llm, combined=False, use_cache=False).judge(first["query"], first["answer"], first["context"])
+
+    scores = [(v["faithfulness"]["score"], v["relevance"]["score"], v["ok"], v["cached"]) for v in verdicts]
+    assert scores == [(4, 4, True, False)] * 6
+    assert judge.stats()["llm_calls"] == 6 # one combined call per triple
+    assert [v["cached"] for v in again] == [True] * 6 + [False]
+    assert JudgeRunner.summarize(verdicts) == {"scored": 6, "faithfulness": 4.0, "relevance": 4.0, "accuracy": 0.8}
+    assert (separate["faithfulness"]["score"], separate["relevance"]["score"], separate["ok"]) == (4, 4, True)
+
+
+def test_triples_load_from_jsonl_with_default_ids(tmp_path):
+    path = tmp_path / "answers.jsonl"
+    path.write_text("\n".join(json.dumps({k: v for k, v in t.items() if k != "id"}) for t in triples(2)), encoding="utf-8")
+    loaded = load_triples(str(path))
+    assert [t["id"] for t in loaded] == ["0", "1"]
+    assert loaded[0]["context"] == [{"text": "Sparse retrieval scores terms, finding 0."}]
@@ -0,0 +1,41 @@
+from src.generation.llm_client import LLMClient
+from stubs import StubOllama, stub_answer
+
+PROMPT = "QUERY: sparse attention for long documents CONTEXT: ..."
+
+
+def client(url: str) -> LLMClient:
+    return LLMClient(provider="ollama", base_url=url, use_cache=False)
+
+
+def test_generate_returns_the_answer_and_records_the_call():
+    with StubOllama(latency_ms=20) as url:
+        llm = client(url)
+        assert llm.generate(PROMPT) == stub_answer(PROMPT)
+    call = llm.calls[-1]
+    assert call["total"] >= 0.02
+    assert call["ttft"] == call["total"] # no tokens before the whole reply without streaming
+    assert call["prompt_tokens"] > 0 and call["completion_tokens"] > 0
+
+
+def test_stream_yields_pieces_and_measures_time_to_first_token():
+    with StubOllama(latency_ms=20, piece_ms=10) as url:
+        llm = client(url)
+        pieces = list(llm.stream(PROMPT))
+    assert len(pieces) > 1
+    assert "".join(pieces).strip() == stub_answer(PROMPT)
+    call = llm.calls[-1]
+    assert 0.02 <= call["ttft"] < call["total"]
+    assert call["total"] - call["ttft"] >= 0.01 * (len(pieces) - 1)
+    assert llm.latency_summary()["calls"] == 1
+
+
+def test_read_timeout_is_not_retried():
+    stub = StubOllama(latency_ms=500)
+    with stub as url:
+        llm = client(url)
+        llm.timeout = (1, 0.1)
+        response = llm.generate(PROMPT)
+        assert LLMClient._is_error(response)
+        assert stub.requests == 1
+    assert not llm.calls
@@ -0,0 +1,89 @@
+import math
+import threading
+import time
+import pytest
+
+from config.config import Config
+from src.evaluation.batch import BatchEvaluator
+from src.evaluation.metrics import evaluate_rankings
+from src.models.registry import ModelRegistry
+from stubs import install_stub_models
+
+# q1: binary judgments, relevant b (rank 2) and d (rank 4), plus e, which is never retrieved.
+# q2: graded, x = 2 at rank 1 and z = 1 at rank 3.
+RETRIEVED = [["a", "b", "c", "d"], ["x", "y", "z", "w"]]
+QRELS = [{"b": 1, "d": 1, "e": 1}, {"x": 2, "z": 1}]
+L3, L5 = math.log2(3), math.log2(5)
+
+
+def mean(q1: float, q2: float) -> float:
+    return (q1 + q2) / 2
+
+
+EXPECTED = {
+    "hit@1": mean(0, 1), "hit@2": mean(1, 1), "hit@4": mean(1, 1),
+    "recall@1": mean(0, 1 / 2), "recall@2": mean(1 / 3, 1 / 2), "recall@4": mean(2 / 3, 1),
+    "precision@1": mean(0, 1), "precision@2": mean(1 / 2, 1 / 2), "precision@4": mean(2 / 4, 2 / 4),
+    "mrr@1": mean(0, 1), "mrr@2": mean(1 / 2, 1), "mrr@4": mean(1 / 2, 1),
+    # AP@k: precision at each relevant rank within k, over min(relevant, k)
+    "map@1": mean(0, 1 / 1), "map@2": mean((1 / 2) / 2, 1 / 2), "map@4": mean((1 / 2 + 2 / 4) / 3, (1 + 2 / 3) / 2),
+    # gains 2^grade - 1, discounted by log2(rank + 1)
+    "ndcg@1": mean(0, 3 / 3),
+    "ndcg@2": mean((1 / L3) / (1 + 1 / L3), 3 / (3 + 1 / L3)),
+    "ndcg@4": mean((1 / L3 + 1 / L5) / (1 + 1 / L3 + 1 / 2), (3 + 1 / 2) / (3 + 1 / L3)),
+}
+
+
+def test_metrics_match_hand_computed_values():
+    metrics = evaluate_rankings(RETRIEVED, QRELS, ks=(4, 1, 2, 2))
+    assert set(metrics) == set(EXPECTED)
+    for name, value in EXPECTED.items():
+        assert metrics[name] == pytest.approx(value), name
+
+
+def test_lists_of_ids_count_as_grade_one():
+    assert evaluate_rankings(RETRIEVED[:1], [["b", "d", "e"]], ks=(4,)) == evaluate_rankings(RETRIEVED[:1], QRELS[:1], ks=(4,))
+
+
+def test_short_and_empty_rankings_score_zero_beyond_their_length():
+    metrics = evaluate_rankings([["b"], []], [{"b": 1}, {"q": 1}], ks=(1, 5))
+    assert metrics["hit@5"] == pytest.approx(0.5)
+    assert metrics["precision@5"] == pytest.approx(mean(1 / 5, 0))
+    assert metrics["ndcg@5"] == pytest.approx(0.5)
+
+
+@pytest.mark.parametrize("ks", [(0, 5), (-1,), (2.5,), ()])
+def test_cutoffs_must_be_positive_integers(ks):
+    with pytest.raises(ValueError):
+        evaluate_rankings(RETRIEVED, QRELS, ks=ks)
+    with pytest.raises(ValueError):
+        BatchEvaluator(retriever=None, ks=ks, workers=1)
+
+
+class SlowRetriever:
+    """Returns the query's relevant chunk after a pause, recording how many calls overlap."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.active = self.peak = 0
+
+    def retrieve(self, query, top_k, strategy, filters=None):
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(0.05)
+        with self.lock:
+            self.active -= 1
+        return [{"id": query, "metadata": {}}]
+
+
+def test_batch_evaluation_runs_queries_concurrently_by_default(monkeypatch):
+    for attr in ("_instances", "_load_times", "_settings"): # keep the batched stubs to this test
+        monkeypatch.setattr(ModelRegistry, attr, dict(getattr(ModelRegistry, attr)))
+    install_stub_models()
+    retriever = SlowRetriever()
+    evaluator = BatchEvaluator(retriever, ks=(1,))
+    assert evaluator.workers == Config.EVAL_WORKERS > 1
+    queries = [{"id": str(i), "query": f"q{i}", "qrels": {f"q{i}": 1.0}, "filters": None} for i in range(8)]
+    result = evaluator.run_strategy(queries, "naive")
+    assert retriever.peak > 1
+    assert result["metrics"]["hit@1"] == 1.0 and result["errors"] == 0
@@ -0,0 +1,50 @@
+import os
+import pytest
+
+fitz = pytest.importorskip("fitz")
+from src.processing.parallel import CHUNKERS, ParallelChunker
+from src.processing.processor import Chunker, TokenChunker
+
+
+def write_pdfs(folder, count: int = 3):
+    paths = []
+    for n in range(count):
+        doc = fitz.open()
+        for p in range(3):
+            page = doc.new_page()
+            body = " ".join(f"Paper {n} page {p} sentence {i} about retrieval and ranking." for i in range(30))
+            page.insert_textbox(fitz.Rect(72, 72, 540, 770), body, fontsize=10)
+        path = os.path.join(folder, f"2401.{n:05d}.pdf")
+        doc.save(path)
+        doc.close()
+        paths.append(path)
+    return paths
+
+
+def test_worker_chunker_is_rebuilt_with_all_settings():
+    chunker = TokenChunker(chunk_size=128, chunk_overlap=16, model_name="sentence-transformers/all-mpnet-base-v2")
+    name, options = ParallelChunker(chunker=chunker, workers=2)._chunker_args()
+    rebuilt = CHUNKERS[name](**options)
+    assert type(rebuilt) is TokenChunker
+    assert (rebuilt.chunk_size, rebuilt.chunk_overlap, rebuilt.model_name) == (128, 16, chunker.model_name)
+
+
+def test_worker_processes_produce_the_serial_chunks(tmp_path):
+    jobs = [(path, {"paper_id": os.path.basename(path)[:-4]}) for path in write_pdfs(str(tmp_path))]
+    chunker = Chunker(chunk_size=300, chunk_overlap=50)
+    serial = {fp: (chunks, error) for fp, chunks, error in ParallelChunker(chunker=chunker, workers=1).iter_chunks(jobs)}
+    parallel = {fp: (chunks, error) for fp, chunks, error in ParallelChunker(chunker=chunker, workers=2).iter_chunks(jobs)}
+    assert all(error is None and chunks for chunks, error in serial.values())
+    assert parallel == serial
+
+
+def test_a_pdf_that_fails_is_reported_and_the_others_kept(tmp_path):
+    paths = write_pdfs(str(tmp_path), count=2)
+    broken = str(tmp_path / "broken.pdf")
+    with open(broken, "wb") as f:
+        f.write(b"%PDF-1.4 not really a pdf")
+    jobs = [(path, {"paper_id": os.path.basename(path)[:-4]}) for path in paths + [broken, str(tmp_path / "missing.pdf")]]
+    results = {fp: (chunks, error) for fp, chunks, error in ParallelChunker(workers=2).iter_chunks(jobs)}
+    assert set(results) == {fp for fp, _ in jobs}
+    assert all(results[path][0] and results[path][1] is None for path in paths)
+    assert all(results[fp][0] == [] and results[fp][1] for fp in (broken, jobs[-1][0]))
@@ -0,0 +1,31 @@
+import pytest
+
+pytest.importorskip("langchain_text_splitters")
+from src.processing.processor import Chunker
+
+
+def synthetic_pages(count: int = 6):
+    return [(p, " ".join(f"Page {p} sentence {i} on dense and sparse retrieval." for i in range(40)) + "\n\n")
+            for p in range(1, count + 1)]
+
+
+def test_streamed_chunks_point_back_into_the_document():
+    pages = synthetic_pages()
+    document = "".join(text for _, text in pages)
+    starts = [sum(len(text) for _, text in pages[:n]) for n in range(len(pages))]
+    chunks = list(Chunker(chunk_size=300, chunk_overlap=50).iter_chunks(pages, {"filepath": "/papers/x.pdf"}, buffer_chunks=2))
+    assert [chunk["id"] for chunk in chunks] == [f"x.pdf_{i}" for i in range(len(chunks))]
+    page_of = lambda offset: max(p for (p, _), start in zip(pages, starts) if start <= offset)
+    for chunk in chunks:
+        meta = chunk["metadata"]
+        assert document[meta["start_char"]:meta["end_char"]] == chunk["text"]
+        assert (meta["page"], meta["page_end"]) == (page_of(meta["start_char"]), page_of(meta["end_char"] - 1))
+    assert chunks[-1]["metadata"]["page_end"] == len(pages)
+
+
+def test_a_document_that_fits_the_window_matches_chunk_text():
+    pages = synthetic_pages(2)
+    chunker = Chunker(chunk_size=300, chunk_overlap=50)
+    streamed = list(chunker.iter_chunks(pages, {"filepath": "x.pdf"}, buffer_chunks=100))
+    whole = chunker.chunk_text("".join(text for _, text in pages), {"filepath": "x.pdf"})
+    assert [(c["id"], c["text"]) for c in streamed] == [(c["id"], c["text"]) for c in whole]
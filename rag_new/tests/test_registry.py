@@ -0,0 +1,53 @@
+import sys
+import types
+
+import pytest
+
+from src.models.registry import ModelRegistry, cross_encoder, embedding_model
+
+
+class FakeModel:
+    loads = 0
+
+    def __init__(self, name, **settings):
+        FakeModel.loads += 1
+        self.name, self.settings = name, settings
+
+
+@pytest.fixture(autouse=True)
+def empty_registry(monkeypatch):
+    """A registry of its own, with sentence-transformers replaced by FakeModel."""
+    for attr in ("_instances", "_load_times", "_settings"):
+        monkeypatch.setattr(ModelRegistry, attr, {})
+    monkeypatch.setitem(sys.modules, "sentence_transformers",
+                        types.SimpleNamespace(SentenceTransformer=FakeModel, CrossEncoder=FakeModel))
+    FakeModel.loads = 0
+
+
+def test_a_model_is_loaded_once_and_shared():
+    first = embedding_model("m", device="cpu", num_threads=0)
+    assert embedding_model("m", device="cpu", num_threads=0) is first
+    assert FakeModel.loads == 1
+    assert first.settings == {"device": "cpu"}
+    assert set(ModelRegistry.load_times()) == {"embedding:m"}
+
+
+def test_other_settings_for_a_loaded_model_are_refused():
+    embedding_model("m", device="cpu", num_threads=0)
+    with pytest.raises(ValueError, match="already loaded"):
+        embedding_model("m", device="cuda", num_threads=0)
+    with pytest.raises(ValueError):
+        embedding_model("m", device="cpu", num_threads=2)
+    cross_encoder("ce", max_length=512)
+    with pytest.raises(ValueError):
+        cross_encoder("ce", max_length=128)
+    assert embedding_model("other", device="cuda", num_threads=0).settings == {"device": "cuda"}
+    assert FakeModel.loads == 3
+
+
+def test_a_registered_object_serves_any_settings():
+    stub = object()
+    ModelRegistry.register("cross_encoder", "ce", stub)
+    assert cross_encoder("ce", max_length=128) is stub
+    assert cross_encoder("ce", max_length=512) is stub
+    assert FakeModel.loads == 0
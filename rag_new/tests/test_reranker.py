@@ -0,0 +1,49 @@
+import sys
+import types
+
+import pytest
+
+from src.retrieval.reranker import RerankEngine
+
+
+class FakeCrossEncoder:
+    """Scores a pair by how often the query's first word occurs in the text; records every predict call."""
+    calls = []
+
+    def __init__(self, name, **settings):
+        self.settings = settings
+
+    def predict(self, pairs, batch_size, show_progress_bar):
+        FakeCrossEncoder.calls.append((len(pairs), batch_size))
+        return [text.count(query.split()[0]) for query, text in pairs]
+
+
+@pytest.fixture
+def make_engine(request, monkeypatch):
+    monkeypatch.setitem(sys.modules, "sentence_transformers", types.SimpleNamespace(CrossEncoder=FakeCrossEncoder))
+    FakeCrossEncoder.calls = []
+    # A model name of its own per test, so no model loaded elsewhere is reused.
+    return lambda **options: RerankEngine(model_name=f"fake/{request.node.name}", batch_size=4, max_length=64, **options)
+
+
+def candidates():
+    texts = ["rag", "rag rag rag", "bm25", "rag rag", "rag rag rag rag"]
+    return [{"id": str(i), "text": text, "score": float(i)} for i, text in enumerate(texts)]
+
+
+def test_top_k_are_returned_best_first_and_cached_scores_skip_the_model(make_engine):
+    engine = make_engine(cascade_keep=0)
+    assert [c["id"] for c in engine.rerank("rag query", candidates(), top_k=3)] == ["4", "1", "3"]
+    assert FakeCrossEncoder.calls == [(5, 4)]
+
+    again = candidates() + [{"id": "5", "text": "new rag chunk", "score": 5.0}]
+    assert [c["id"] for c in engine.rerank("rag query", again, top_k=2)] == ["4", "1"]
+    assert FakeCrossEncoder.calls == [(5, 4), (1, 4)] # only the unseen text was scored
+    assert engine.latency_stats()["calls"] == 2
+
+
+def test_the_cascade_only_scores_the_best_first_stage_candidates(make_engine):
+    engine = make_engine(cascade_keep=3)
+    ranked = engine.rerank("rag query", candidates())
+    assert [c["id"] for c in ranked] == ["1", "0", "2"] # 3 and 4 have the worst vector distances
+    assert FakeCrossEncoder.calls == [(3, 4)]
@@ -0,0 +1,52 @@
+from src.generation.response_cache import ResponseCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_responses_expire_after_the_ttl(tmp_path):
+    clock = Clock()
+    cache = ResponseCache(str(tmp_path / "cache.sqlite3"), max_entries=10, ttl_seconds=60, clock=clock)
+    cache.put("old", "first answer")
+    clock.now += 30
+    cache.put("new", "second answer")
+    assert cache.get("old") == "first answer" # a hit does not extend the TTL
+
+    clock.now += 31 # old is 61s old, new 31s
+    assert cache.get("old") is None
+    assert cache.get("new") == "second answer"
+    assert cache.conn.execute("SELECT key FROM responses").fetchall() == [("new",)] # purged, not just hidden
+
+    clock.now += 30
+    cache.put("newest", "third answer") # a write purges everything past the TTL
+    assert [key for (key,) in cache.conn.execute("SELECT key FROM responses ORDER BY key")] == ["newest"]
+    assert cache.stats()["hits"] == 2 and cache.stats()["misses"] == 1
+
+
+def test_least_recently_used_responses_are_evicted(tmp_path):
+    clock = Clock()
+    cache = ResponseCache(str(tmp_path / "cache.sqlite3"), max_entries=3, ttl_seconds=0, clock=clock)
+    for key in ("a", "b", "c"):
+        clock.now += 1
+        cache.put(key, key.upper())
+    clock.now += 1
+    assert cache.get("a") == "A" # b is now the least recently used
+    clock.now += 1
+    cache.put("d", "D")
+    assert [cache.get(key) for key in ("a", "b", "c", "d")] == ["A", None, "C", "D"]
+
+    clock.now += 10 ** 9 # ttl_seconds=0 never expires
+    assert cache.get("c") == "C"
+
+
+def test_entries_persist_across_instances(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    key = ResponseCache.key("ollama", "llama3", "prompt", {"temperature": 0})
+    assert key != ResponseCache.key("ollama", "llama3", "prompt", {"temperature": 0.7})
+    ResponseCache(path).put(key, "answer")
+    assert ResponseCache(path).get(key) == "answer"
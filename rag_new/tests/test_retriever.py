@@ -0,0 +1,46 @@
+from src.retrieval.retriever import HybridRetriever
+
+
+class SubQuestionLLM:
+    def generate(self, prompt, **options):
+        return "1. What is dense retrieval?\n2. What is BM25?\n"
+
+
+class ListEngine:
+    """Answers each query text with a fixed ranked list of (chunk id, distance); records every query_many call."""
+    def __init__(self, ranked):
+        self.ranked = ranked
+        self.calls = []
+
+    def query_many(self, query_texts, n_results, **options):
+        self.calls.append(list(query_texts))
+        lists = [self.ranked[text][:n_results] for text in query_texts]
+        return {
+            "ids": [[doc_id for doc_id, _ in hits] for hits in lists],
+            "documents": [[f"text of {doc_id}" for doc_id, _ in hits] for hits in lists],
+            "metadatas": [[{"paper_id": doc_id.split("_")[0]} for doc_id, _ in hits] for hits in lists],
+            "distances": [[dist for _, dist in hits] for hits in lists],
+        }
+
+
+class KeepOrder:
+    def rerank(self, query, candidates, top_k=None):
+        return candidates[:top_k]
+
+
+def test_sub_questions_are_searched_together_and_fused_by_rank():
+    engine = ListEngine({
+        "What is dense retrieval?": [("a_0", 0.1), ("b_0", 0.2), ("c_0", 0.3)],
+        "What is BM25?": [("d_0", 0.15), ("b_0", 0.25), ("a_0", 0.4)],
+    })
+    retriever = HybridRetriever(engine)
+    retriever.llm_client = SubQuestionLLM()
+    retriever.reranker = KeepOrder()
+    results = retriever.retrieve("dense retrieval versus BM25", top_k=10, strategy="complex")
+
+    assert engine.calls == [["What is dense retrieval?", "What is BM25?"]] # one round trip
+    assert [c["id"] for c in results] == ["a_0", "b_0", "d_0", "c_0"]
+    by_id = {c["id"]: c for c in results}
+    assert by_id["a_0"]["sub_ranks"] == {0: 1, 1: 3} and by_id["a_0"]["score"] == 0.1
+    assert by_id["b_0"]["sub_ranks"] == {0: 2, 1: 2} and by_id["b_0"]["score"] == 0.2
+    assert by_id["d_0"]["fused_score"] > by_id["c_0"]["fused_score"]
@@ -0,0 +1,39 @@
+import os
+import sys
+import pytest
+
+fitz = pytest.importorskip("fitz")
+pytest.importorskip("arxiv")
+from config.config import Config
+from stubs import StubArxiv, StubOllama, install_stub_models
+
+
+def pdf(paper: int) -> bytes:
+    doc = fitz.open()
+    for p in range(2):
+        page = doc.new_page()
+        body = " ".join(f"Self-healing language models repair their own errors, finding {paper}.{p}.{i}." for i in range(25))
+        page.insert_textbox(fitz.Rect(72, 72, 540, 770), body, fontsize=10)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def test_run_all_ingests_indexes_generates_and_judges(monkeypatch, capsys):
+    install_stub_models()
+    monkeypatch.setattr(Config, "VECTOR_BACKEND", "local")
+    monkeypatch.setattr(sys, "argv", ["main.py", "run_all", "--query", "self-healing models", "--max", "2",
+                                      "--strategy", "naive"])
+    import main
+    with StubArxiv({"2401.00001": pdf(1), "2401.00002": pdf(2)}) as arxiv_url, StubOllama() as ollama_url:
+        monkeypatch.setattr(Config, "ARXIV_API_URL", arxiv_url + "/api/query")
+        monkeypatch.setattr(Config, "OLLAMA_URL", ollama_url)
+        main.run_cli()
+
+    out = capsys.readouterr().out
+    for step in ("[1/4]", "[2/4]", "[3/4]", "[4/4]"):
+        assert step in out
+    assert "Faithfulness: 4/5" in out and "Relevance:    4/5" in out
+    assert sorted(os.listdir(Config.PAPERS_DIR)) == ["2401.00001.pdf", "2401.00002.pdf"]
+    with open(os.path.join(Config.OUTPUT_DIR, "review_self-healing_models.md"), encoding="utf-8") as f:
+        assert "Stub review" in f.read()
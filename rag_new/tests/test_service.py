@@ -0,0 +1,147 @@
+import ast
+import os
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+import requests
+
+from config.config import Config
+from main import MENU_STRATEGIES
+from stubs import StubOllama, install_stub_models
+
+
+@pytest.fixture(scope="module")
+def service_url():
+    with pytest.MonkeyPatch.context() as mp, StubOllama() as ollama_url:
+        mp.setattr(Config, "VECTOR_BACKEND", "local")
+        mp.setattr(Config, "OLLAMA_URL", ollama_url)
+        install_stub_models()
+        from src.service.server import RAGService, ServiceHandler
+        server = ThreadingHTTPServer(("127.0.0.1", 0), ServiceHandler)
+        server.daemon_threads = True
+        server.service = RAGService(batching=False)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        yield f"http://127.0.0.1:{server.server_address[1]}", server.service
+        server.shutdown()
+        server.server_close()
+
+
+def ui_strategies():
+    """The options of the Streamlit strategy selectbox, read from ui.py (importing it needs Streamlit)."""
+    with open(os.path.join(os.path.dirname(Config.BASE_DIR), "ui.py"), encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Call) and getattr(node.func, "attr", None) == "selectbox" \
+                and ast.literal_eval(node.args[0]) == "Retrieval Strategy":
+            return ast.literal_eval(node.args[1])
+    raise AssertionError("ui.py has no strategy selectbox")
+
+
+def test_requests_are_answered_and_timed(service_url):
+    url, _ = service_url
+    response = requests.post(url + "/retrieve", json={"query": "sparse retrieval", "strategy": "naive"})
+    assert response.status_code == 200, response.text
+    assert isinstance(response.json()["results"], list)
+    response = requests.post(url + "/generate", json={"query": "sparse retrieval", "strategy": "naive"})
+    assert response.status_code == 200, response.text
+    assert response.json()["review"].startswith("Stub review: sparse retrieval")
+    assert requests.post(url + "/retrieve", json={"query": "  "}).status_code == 400
+    stats = requests.get(url + "/stats").json()
+    assert stats["endpoints"]["retrieve"]["count"] == 1 and stats["endpoints"]["generate"]["count"] == 1
+
+
+@pytest.mark.parametrize("strategy", sorted(set(ui_strategies()) | set(MENU_STRATEGIES.values())))
+def test_every_strategy_offered_by_the_ui_and_menu_is_served(service_url, strategy):
+    url, _ = service_url
+    response = requests.post(url + "/generate", json={"query": "sparse retrieval", "strategy": strategy})
+    assert response.status_code == 200, response.text
+    assert response.json()["strategy"] == strategy
+
+
+@pytest.mark.parametrize("body", [
+    {"query": "  "},
+    {"query": "sparse retrieval", "strategy": "bogus"},
+    {"query": "sparse retrieval", "top_k": "ten"},
+    {"query": "sparse retrieval", "top_k": 0},
+    {"query": "sparse retrieval", "filters": {"venue": "ACL"}},
+    {"query": "sparse retrieval", "filters": {"year_min": "recent"}},
+    {"query": "sparse retrieval", "filters": ["2401.00001"]},
+    ["sparse retrieval"],
+])
+def test_malformed_requests_are_rejected(service_url, body):
+    url, _ = service_url
+    response = requests.post(url + "/retrieve", json=body)
+    assert response.status_code == 400
+    assert response.json()["error"]
+
+
+def test_invalid_json_is_rejected(service_url):
+    url, _ = service_url
+    assert requests.post(url + "/retrieve", data=b"{not json").status_code == 400
+
+
+def test_valid_request_is_answered(service_url):
+    url, _ = service_url
+    response = requests.post(url + "/retrieve", json={"query": "sparse retrieval", "strategy": "naive",
+                                                      "filters": {"year_min": 2020, "paper_id": "2401.00001v2"}})
+    assert response.status_code == 200
+    body = response.json()
+    assert all(r["metadata"]["paper_id"] == "2401.00001" and r["metadata"]["year"] >= 2020 for r in body["results"])
+    assert set(body["papers"]) <= {"2401.00001"}
+
+
+def test_failures_after_validation_are_server_errors(service_url, monkeypatch):
+    url, service = service_url
+
+    def fail(*args, **kwargs):
+        raise ValueError("index is corrupt")
+    monkeypatch.setattr(service.retriever, "retrieve", fail)
+    response = requests.post(url + "/retrieve", json={"query": "sparse retrieval"})
+    assert response.status_code == 500
+    assert response.json()["error"] == "index is corrupt"
+
+
+def test_filters_reach_the_store_as_a_where_clause(service_url, monkeypatch):
+    _, service = service_url
+    seen = []
+    real_query = service.vector_engine.store.query
+
+    def query(embeddings, n_results, where=None):
+        seen.append(where)
+        return real_query(embeddings, n_results, where=where)
+    monkeypatch.setattr(service.vector_engine.store, "query", query)
+    service.retrieve("sparse retrieval", strategy="naive", filters={"year_min": 2020, "paper_id": "2401.00001v2"})
+    assert seen == [{"$and": [{"year": {"$gte": 2020}}, {"paper_id": "2401.00001"}]}]
+
+    seen.clear()
+    assert service.retrieve("sparse retrieval", strategy="naive", filters={"paper_id": []}) is not None
+    assert seen == [None]
+
+    seen.clear() # no paper in the (empty) catalog has this author: nothing is searched
+    assert service.retrieve("sparse retrieval", strategy="naive", filters={"author": "Nobody"}) == []
+    assert seen == []
+
+
+def test_a_new_index_is_picked_up_on_the_next_request(service_url):
+    _, service = service_url
+    engine = service.vector_engine
+    assert not service.refresh()
+    with open(Config.INDEX_MANIFEST_PATH, "w") as f: # what an `index` run in another process rewrites
+        f.write("{}")
+    os.utime(Config.INDEX_MANIFEST_PATH, ns=(1, 1))
+    service.retrieve("sparse retrieval", strategy="naive")
+    assert service.vector_engine is not engine and service.retriever.vector_engine is service.vector_engine
+    assert service.vector_engine.embedder is engine.embedder
+    assert not service.refresh()
+
+
+def test_ui_backend_reports_service_errors(service_url, monkeypatch):
+    url, service = service_url
+    from src.pipeline.ui_pipeline import run_rag_for_ui_pipeline
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("LLM is unreachable")
+    monkeypatch.setattr(service, "generate", fail)
+    monkeypatch.setattr(Config, "SERVICE_URL", url)
+    assert run_rag_for_ui_pipeline("sparse retrieval", "naive") == {"error": "LLM is unreachable"}
@@ -0,0 +1,89 @@
+import os
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from src.retrieval.sparse_index import SparseIndex
+
+DOCS = [
+    ("c1", "Sparse retrieval with BM25 remains a strong baseline.", "2401.00001"),
+    ("c2", "Dense retrievers embed queries and passages.", "2401.00001"),
+    ("c3", "Hybrid retrieval fuses sparse and dense rankings.", "2401.00002"),
+    ("c4", "Self-healing language models repair their own errors.", ""),
+]
+
+
+def generation(gen: int, n: int = 50):
+    """A corpus whose chunk IDs all carry its build number."""
+    return [(f"g{gen}-{i}", f"shared term document {i} build{gen}", f"p{i % 3}") for i in range(n)]
+
+
+def test_a_saved_index_loads_and_searches_like_the_built_one(tmp_path):
+    built = SparseIndex.build(DOCS, path=str(tmp_path))
+    loaded = SparseIndex(str(tmp_path))
+    assert loaded.load() and len(loaded) == 4
+    for query in ("sparse retrieval", "dense", "self-healing models"):
+        assert loaded.search(query) == built.search(query) == SparseIndex.build(DOCS, path=None).search(query)
+    assert [hit["id"] for hit in loaded.search("retrieval", paper_ids={"2401.00002"})] == ["c3"]
+    assert loaded.search("retrieval", paper_ids=set()) == []
+    assert os.listdir(tmp_path / f"v{loaded.version}")
+
+
+def test_an_interrupted_build_is_never_seen(tmp_path, monkeypatch):
+    SparseIndex.build(generation(1), path=str(tmp_path))
+    reader = SparseIndex(str(tmp_path))
+    assert reader.search("build1")
+    first = reader.version
+
+    real_save, calls = np.save, []
+    def failing_save(path, array):
+        calls.append(path)
+        if len(calls) == 3:
+            raise OSError("disk full")
+        real_save(path, array)
+    monkeypatch.setattr(np, "save", failing_save)
+    with pytest.raises(OSError):
+        SparseIndex.build(generation(2), path=str(tmp_path))
+    monkeypatch.undo()
+
+    for index in (reader, SparseIndex(str(tmp_path))):
+        assert index.search("build2") == []
+        assert {hit["id"].split("-")[0] for hit in index.search("shared", n_results=100)} == {"g1"}
+
+    SparseIndex.build(generation(3), path=str(tmp_path))
+    assert {hit["id"].split("-")[0] for hit in reader.search("shared", n_results=100)} == {"g3"} # picked up
+    # the half-written directory is cleaned up by the next build, which keeps the previous version
+    assert sorted(os.listdir(tmp_path)) == sorted(["CURRENT", f"v{first}", f"v{reader.version}"])
+
+
+def test_readers_only_see_complete_versions_while_rebuilding(tmp_path):
+    SparseIndex.build(generation(0), path=str(tmp_path))
+    stop, seen, errors = threading.Event(), [], []
+
+    def read():
+        try:
+            while not stop.is_set():
+                hits = SparseIndex(str(tmp_path)).search("shared", n_results=100)
+                builds = {hit["id"].split("-")[0] for hit in hits}
+                if len(hits) != 50 or len(builds) != 1:
+                    errors.append((len(hits), builds))
+                seen.append(builds.pop() if len(builds) == 1 else None)
+        except Exception as e: # surfaced by the assertion below
+            errors.append(e)
+
+    readers = [threading.Thread(target=read) for _ in range(2)]
+    for thread in readers:
+        thread.start()
+    for gen in range(1, 8):
+        SparseIndex.build(generation(gen), path=str(tmp_path))
+        searched = len(seen)
+        deadline = time.monotonic() + 5
+        while len(seen) < searched + 2 and time.monotonic() < deadline: # let the readers run against it
+            time.sleep(0.001)
+    stop.set()
+    for thread in readers:
+        thread.join()
+    assert not errors
+    assert len(set(seen)) > 1 # readers did run across several builds
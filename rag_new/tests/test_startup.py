@@ -0,0 +1,29 @@
+import json
+import subprocess
+import sys
+
+from bench_startup import COMMAND_IMPORTS, PROJECT_ROOT, measure
+
+PROBE = """
+import json, os
+made = []
+os.makedirs = lambda path, *args, **kwargs: made.append(path)
+os.mkdir = lambda path, *args, **kwargs: made.append(path)
+import main
+for name in {modules!r}:
+    __import__(name)
+print(json.dumps(made))
+"""
+
+
+def test_light_commands_import_no_heavy_library():
+    for command in ("--help", "warmup"):
+        assert measure(COMMAND_IMPORTS[command], repeat=1)[1] == []
+    assert set(measure(COMMAND_IMPORTS["ingest"], repeat=1)[1]) <= {"arxiv"}
+
+
+def test_importing_the_pipeline_creates_no_folders():
+    modules = sorted({name for names in COMMAND_IMPORTS.values() for name in names})
+    out = subprocess.run([sys.executable, "-c", PROBE.format(modules=modules)], cwd=PROJECT_ROOT,
+                         capture_output=True, text=True, check=True)
+    assert json.loads(out.stdout.strip().splitlines()[-1]) == []
@@ -0,0 +1,54 @@
+import json
+import threading
+import time
+
+from src.tracing.tracer import NULL_SPAN, Tracer
+
+
+def test_a_disabled_tracer_records_nothing():
+    tracer = Tracer()
+    with tracer.span("request") as s:
+        s.add(results=3)
+    tracer.record("parse", 0.1)
+    assert s is NULL_SPAN and tracer.current() is NULL_SPAN
+    assert tracer.summary() == []
+
+
+def test_spans_nest_per_thread_and_across_an_explicit_parent():
+    tracer = Tracer()
+    tracer.enable()
+    with tracer.span("retrieve") as root:
+        with tracer.span("search") as s:
+            s.add(results=5)
+            assert tracer.current() is s
+
+        def rerank(): # work on another thread nests under the span it is handed
+            with tracer.span("rerank", parent=root):
+                pass
+        worker = threading.Thread(target=rerank)
+        worker.start()
+        worker.join()
+        tracer.record("parse", 0.01, counts={"pages": 2}) # timed in a worker process
+        time.sleep(0.02)
+
+    rows = {row["span"]: row for row in tracer.summary()}
+    assert list(rows) == ["retrieve", "retrieve/search", "retrieve/rerank", "retrieve/parse"]
+    assert rows["retrieve/search"]["depth"] == 1 and rows["retrieve/search"]["counts"] == {"results": 5}
+    assert rows["retrieve/parse"]["counts"] == {"pages": 2}
+    assert rows["retrieve"]["self_ms"] < rows["retrieve"]["total_ms"]
+
+
+def test_export_writes_the_tree_summary_and_trace_events(tmp_path):
+    tracer = Tracer()
+    tracer.enable()
+    for _ in range(3):
+        with tracer.span("request", endpoint="/retrieve"):
+            with tracer.span("llm"):
+                pass
+    path = tracer.export(str(tmp_path / "traces" / "trace.json"), command="serve")
+    with open(path, encoding="utf-8") as f:
+        trace = json.load(f)
+    assert trace["info"] == {"command": "serve"}
+    assert [span["name"] for span in trace["spans"]] == ["request"] * 3
+    assert [(row["span"], row["calls"]) for row in trace["summary"]] == [("request", 3), ("request/llm", 3)]
+    assert len(trace["traceEvents"]) == 6 and {event["ph"] for event in trace["traceEvents"]} == {"X"}
@@ -1,8 +1,10 @@
 import streamlit as st
 import base64
+import os
+import sys
 
-# Import your RAG backend
-# Adjust this import based on your project structure
+# Import your RAG backend (it lives in rag_new/; start `python rag_new/main.py serve` to keep it warm)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "rag_new"))
 from src.pipeline.ui_pipeline import run_rag_for_ui_pipeline
 
 st.set_page_config(page_title="ResearchGPT", page_icon="📄", layout="centered")
@@ -84,7 +86,7 @@ query = st.text_area(
 
 strategy = st.selectbox(
     "Retrieval Strategy",
-    ["hyde", "complex", "standard"]
+    ["hyde", "complex", "naive", "hybrid"]
 )
 
 if st.button("Analyze Papers", use_container_width=True):
@@ -94,13 +96,16 @@ if st.button("Analyze Papers", use_container_width=True):
         with st.spinner("Running RAG pipeline..."):
             result = run_rag_for_ui_pipeline(query, strategy)
 
-        st.subheader("Generated Answer")
-        st.write(result['review'])
+        if "error" in result:
+            st.error(f"The RAG service could not answer: {result['error']}")
+        else:
+            st.subheader("Generated Answer")
+            st.write(result['review'])
 
-        st.info(
-            f"Strategy: {result['strategy']} | "
-            f"Papers processed: {result['num_papers']}"
-        )
+            st.info(
+                f"Strategy: {result['strategy']} | "
+                f"Papers processed: {result['num_papers']}"
+            )
 
 st.divider()
 